@@ -0,0 +1,194 @@
+import re
+
+# Spoken number words by kind: units and teens/tens add up, "hundred"
+# multiplies the group in progress, scales close it off into the total
+UNITS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+}
+TEENS = {
+    "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16,
+    "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+TENS = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90}
+SCALES = {
+    "thousand": 1e3, "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5,
+    "million": 1e6, "crore": 1e7, "crores": 1e7,
+}
+CURRENCY_WORDS = {"dollar", "dollars", "bucks", "usd", "rupee", "rupees", "rs", "inr", "euro", "euros"}
+CENT_WORDS = {"cent", "cents", "paise", "paisa"}
+# Words that can sit inside a spoken number ("one hundred and five", "a thousand")
+JOIN_WORDS = {"and", "a"}
+
+# One alternation for the whole utterance: digits (with thousands or lakh
+# grouping, decimals and a "k" suffix), currency symbols before or after
+# a number, and words
+TOKEN_PATTERN = re.compile(
+    r"(?P<number>(?:\d{1,3}(?:,\d{2,3})+|\d+)(?:\.\d+)?|\.\d+)(?P<k>k\b)?"
+    r"|(?P<prefix>[$₹€£])(?=\s*[\d.])"
+    r"|(?P<suffix>[$₹€£])"
+    r"|(?P<word>[a-z]+)"
+)
+# The most common reply, a bare figure like "50" or "$12.50", skips the grammar
+PLAIN_AMOUNT = re.compile(r"\s*(?:[$₹€£]|rs\.?)?\s*(\d+(?:\.\d+)?)\s*(?:[$₹€£]|dollars?|rupees?|bucks)?\s*")
+
+
+# ---------------------------------------------------------
+# Spoken amount parser
+# ---------------------------------------------------------
+class AmountParser:
+    """Extracts a payment amount from a transcribed utterance.
+
+    The text is tokenized by one precompiled regex and the tokens are fed
+    through a small grammar in a single pass: "two hundred fifty" is 250,
+    "one lakh twenty five thousand" is 125000, "twelve point five" and
+    "$1,250.50" keep their decimals, and "fifty dollars and five cents" is
+    50.05. An utterance can contain several numbers; the first one tied to
+    a currency symbol or word wins, otherwise the first one.
+    """
+
+    def __init__(self):
+        self._words = {}
+        for kind, table in (("unit", UNITS), ("teen", TEENS), ("tens", TENS), ("scale", SCALES)):
+            for word, value in table.items():
+                self._words[word] = (kind, value)
+        self._words["hundred"] = ("hundred", 100)
+        self._words["point"] = ("point", None)
+        for word in CURRENCY_WORDS:
+            self._words[word] = ("currency", None)
+        for word in CENT_WORDS:
+            self._words[word] = ("cents", None)
+        for word in JOIN_WORDS:
+            self._words[word] = ("join", None)
+
+    def parse(self, text):
+        """The amount in `text` as a float rounded to cents, or None"""
+        if not text:
+            return None
+        text = text.lower()
+        plain = PLAIN_AMOUNT.fullmatch(text)
+        if plain:
+            value = float(plain.group(1))
+            return round(value, 2) if value > 0 else None
+
+        phrases = []        # [value, tied to a currency]
+        total = current = 0.0
+        fraction = None     # digits heard after "point"
+        active = False      # a number is in progress
+        last = None         # kind of the previous number token
+        marked = False      # the number in progress is tied to a currency
+        pending = False     # a currency came before the next number
+
+        def flush():
+            nonlocal total, current, fraction, active, last, marked
+            if active:
+                value = total + current + (float("0." + fraction) if fraction else 0.0)
+                phrases.append([value, marked])
+            total = current = 0.0
+            fraction = None
+            active = marked = False
+            last = None
+
+        for number, k, prefix, suffix, word in TOKEN_PATTERN.findall(text):
+            if number:
+                if fraction is not None and number.isdigit():
+                    fraction += number
+                    continue
+                # Digits only continue a number right after a scale ("5 thousand 500")
+                if active and not (last == "scale" and current == 0):
+                    flush()
+                if not active:
+                    active, marked, pending = True, pending, False
+                value = float(number.replace(",", ""))
+                if k:
+                    total += value * 1e3
+                    last = "scale"
+                else:
+                    current = value
+                    last = "digits"
+                continue
+
+            if prefix:
+                flush()
+                pending = True
+                continue
+            if suffix:
+                if active:
+                    marked = True
+                    flush()
+                else:
+                    pending = True
+                continue
+
+            kind, value = self._words.get(word, (None, None))
+            if fraction is not None:
+                if kind == "unit" or word == "oh":
+                    fraction += str(value or 0)
+                    continue
+                if kind not in ("currency", "cents"):
+                    flush()
+            if kind is None:
+                flush()
+                continue
+
+            if kind in ("unit", "teen", "tens"):
+                joins = active and (
+                    (last == "tens" and kind == "unit") or last == "hundred" or (last == "scale" and current == 0)
+                )
+                if active and not joins:
+                    flush()
+                if not active:
+                    active, marked, pending = True, pending, False
+                current += value
+                last = kind
+            elif kind == "hundred":
+                if active and current >= 100:
+                    flush()
+                if not active:
+                    active, marked, pending = True, pending, False
+                current = (current or 1) * 100
+                last = "hundred"
+            elif kind == "scale":
+                if not active:
+                    active, marked, pending = True, pending, False
+                total += (current or 1) * value
+                current = 0.0
+                last = "scale"
+            elif kind == "point":
+                if not active:
+                    active, marked, pending = True, pending, False
+                fraction = ""
+                last = "point"
+            elif kind == "currency":
+                if active:
+                    marked = True
+                    flush()
+                else:
+                    pending = True
+            elif kind == "cents":
+                if active:
+                    cents = (total + current) / 100
+                    active = False
+                    flush()
+                    # "fifty dollars and five cents": fold into the dollar amount
+                    if phrases and phrases[-1][1] and phrases[-1][0] == int(phrases[-1][0]):
+                        phrases[-1][0] += cents
+                    else:
+                        phrases.append([cents, True])
+            elif kind == "join":
+                continue
+        flush()
+
+        values = [value for value, tied in phrases if tied and value > 0] or \
+                 [value for value, _ in phrases if value > 0]
+        return round(values[0], 2) if values else None
+
+    def parse_many(self, texts):
+        """Parse a batch of utterances"""
+        return [self.parse(text) for text in texts]
+
+
+default_parser = AmountParser()
+
+
+def parse_amount(text):
+    return default_parser.parse(text)
@@ -0,0 +1,240 @@
+"""
+Async serving mode for the Voice Banking Assistant.
+
+/api/chat and the Teller-backed REST endpoints run on the event loop with
+httpx.AsyncClient and Gemini's async API; endpoints that touch local state
+only (payees, spending, payments, direct payments) run in a worker thread.
+Session, ledger and cache calls, which block with STATE_BACKEND=sqlite, are
+kept off the loop too (a thread, or the stores' async methods). Anything
+not routed here falls through to the Flask app, so both servers expose the
+same API.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import contextlib
+from datetime import datetime
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+
+import metrics
+from banking_assistant import (
+    PAYMENT_BULK_MAX, BalanceUnavailableError, InvalidQueryError, app as flask_app, get_assistant_service, logger,
+    query_int, request_profiler, services_ready, spending_query, start_warm_up, transactions_query
+)
+from profiling import ProfilingASGIMiddleware
+
+
+async def _json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def health_check(request):
+    # Cache sizes are SQLite queries with STATE_BACKEND=sqlite
+    caches = await asyncio.to_thread(get_assistant_service().cache_stats) if services_ready() else None
+    return JSONResponse({
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "caches": caches
+    })
+
+
+async def get_metrics(request):
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+async def chat(request):
+    """Main chat endpoint for processing user messages"""
+    try:
+        data = await _json_body(request)
+
+        if not data:
+            return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+        user_id = data.get('user_id', 'default_user')
+        message = data.get('message', '').strip()
+
+        if not message:
+            return JSONResponse({"error": "No message provided"}, status_code=400)
+
+        response = await get_assistant_service().process_message_async(user_id, message)
+        return JSONResponse(response)
+
+    except Exception:
+        logger.exception("error in /api/chat")
+        return JSONResponse({
+            "error": "Internal server error",
+            "response": "Sorry, I encountered an error processing your request."
+        }, status_code=500)
+
+
+async def get_accounts(request):
+    try:
+        refresh = request.query_params.get('refresh', '').lower() in ('1', 'true', 'yes')
+        accounts, age = await get_assistant_service().bank.get_accounts_with_age_async(refresh=refresh)
+        return JSONResponse({"accounts": accounts, "age_seconds": round(age, 1)})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def get_balance(request):
+    try:
+        bank = get_assistant_service().bank
+        account_id = request.query_params.get('account_id')
+        if not account_id:
+            account_id = await bank.get_default_account_id_async()
+
+        if not account_id:
+            return JSONResponse({"error": "No account found"}, status_code=404)
+
+        balance_info = await bank.get_balance_async(account_id)
+        return JSONResponse({"balance": balance_info})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def get_transactions(request):
+    try:
+        account_id = request.query_params.get('account_id')
+        count = query_int(request.query_params, 'count', 5)
+        filters = transactions_query(request.query_params)
+        bank = get_assistant_service().bank
+
+        if not account_id:
+            account_id = await bank.get_default_account_id_async()
+
+        if not account_id:
+            return JSONResponse({"error": "No account found"}, status_code=404)
+
+        transactions = await bank.get_transactions_async(account_id, count, **filters)
+        age = await asyncio.to_thread(bank.transactions_age, account_id)
+        return JSONResponse({"transactions": transactions, "age_seconds": None if age is None else round(age, 1)})
+    except InvalidQueryError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def get_spending(request):
+    try:
+        bank = get_assistant_service().bank
+        account_id = request.query_params.get('account_id') or await bank.get_default_account_id_async()
+        if not account_id:
+            return JSONResponse({"error": "No account found"}, status_code=404)
+
+        spending = await asyncio.to_thread(bank.get_spending, account_id, **spending_query(request.query_params))
+        return JSONResponse({"spending": spending})
+    except InvalidQueryError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def get_payees(request):
+    try:
+        payees = await asyncio.to_thread(get_assistant_service().bank.get_payees)
+        return JSONResponse({"payees": payees})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def get_payments(request):
+    try:
+        payments = await asyncio.to_thread(get_assistant_service().bank.get_payment_history)
+        return JSONResponse({"payments": payments})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def direct_payment(request):
+    try:
+        data = await _json_body(request)
+
+        if not data:
+            return JSONResponse({"error": "No JSON data provided"}, status_code=400)
+
+        payee = data.get('payee')
+        amount = data.get('amount')
+        account_id = data.get('account_id')
+
+        if not payee or not amount:
+            return JSONResponse({"error": "Payee and amount are required"}, status_code=400)
+
+        success, result = await asyncio.to_thread(
+            get_assistant_service().bank.make_payment, payee, amount, account_id
+        )
+
+        if success:
+            return JSONResponse({
+                "success": True,
+                "message": result['message'],
+                "new_balance": result['new_balance']
+            })
+        return JSONResponse({"success": False, "error": result}, status_code=400)
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def direct_payment_bulk(request):
+    try:
+        data = await _json_body(request)
+        payments = data.get('payments') if isinstance(data, dict) else None
+
+        if not isinstance(payments, list) or not payments:
+            return JSONResponse({"error": "Expected a non-empty 'payments' list"}, status_code=400)
+        if len(payments) > PAYMENT_BULK_MAX:
+            return JSONResponse({"error": f"At most {PAYMENT_BULK_MAX} payments per request"}, status_code=400)
+
+        results, summary = await asyncio.to_thread(
+            get_assistant_service().bank.make_payments, payments, data.get('account_id'), bool(data.get('atomic'))
+        )
+        return JSONResponse({"success": summary["failed"] == 0, "results": results, **summary})
+
+    except BalanceUnavailableError as e:
+        return JSONResponse({"error": str(e)}, status_code=503)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    start_warm_up()
+    yield
+    if services_ready():
+        await get_assistant_service().bank.aclose()
+
+
+routes = [
+    Route('/api/health', health_check, methods=['GET']),
+    Route('/api/metrics', get_metrics, methods=['GET']),
+    Route('/api/chat', chat, methods=['POST']),
+    Route('/api/accounts', get_accounts, methods=['GET']),
+    Route('/api/balance', get_balance, methods=['GET']),
+    Route('/api/transactions', get_transactions, methods=['GET']),
+    Route('/api/spending', get_spending, methods=['GET']),
+    Route('/api/payees', get_payees, methods=['GET']),
+    Route('/api/payments', get_payments, methods=['GET']),
+    Route('/api/direct-payment', direct_payment, methods=['POST']),
+    Route('/api/direct-payment/bulk', direct_payment_bulk, methods=['POST']),
+    # Everything else is served by the Flask app
+    Mount('/', WSGIMiddleware(flask_app)),
+]
+
+middleware = [Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])]
+if request_profiler.enabled:
+    # Mounted Flask routes are profiled by the Flask app's own middleware
+    native = [route.path for route in routes if isinstance(route, Route)]
+    middleware.append(Middleware(ProfilingASGIMiddleware, profiler=request_profiler, paths=native))
+
+app = Starlette(routes=routes, middleware=middleware, lifespan=lifespan)
@@ -1,31 +1,202 @@
 import os
+import ssl
+import asyncio
+import atexit
+import contextlib
+import contextvars
+import importlib.util
 import httpx
-import google.generativeai as genai
+import certifi
 from dotenv import load_dotenv
 import time
 import json
-from datetime import datetime
-from flask import Flask, request, jsonify
+import re
+from datetime import date, datetime
+from flask import Blueprint, Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from amount_parser import parse_amount
+from payee_index import PayeeIndex
+from profiling import ProfilingMiddleware, RequestProfiler
+from resilience import CircuitBreaker, CircuitOpenError, StaleWhileRevalidate
+from payee_matcher import PayeeMatcher
+from transaction_store import TransactionStore
+from query_parsing import parse_granularity, parse_merchant, parse_period
+from state_backend import MemoryStateBackend, SQLiteStateBackend, new_payment_id
+import intent_classifier
+import metrics
+from structured_log import configure_logging
 
 # ---------------------------------------------------------
 # Load environment variables
 # ---------------------------------------------------------
 load_dotenv()
 
+# Logs go through a queue to a background writer; LOG_FORMAT=json for log
+# pipelines, "text" (key=value fields) for terminals
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+logger = configure_logging(level=LOG_LEVEL, as_json=LOG_FORMAT == "json")
+
 TELLER_TOKEN = os.getenv("TELLER_TOKEN")
 CERT_FILE = os.getenv("TELLER_CERT")
 KEY_FILE = os.getenv("TELLER_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-BASE_URL = "https://api.teller.io"
+BASE_URL = os.getenv("TELLER_BASE_URL", "https://api.teller.io")
+# Optional CA bundle for verifying the Teller server (defaults to certifi's bundle)
+CA_BUNDLE = os.getenv("TELLER_CA_BUNDLE")
+
+# Connection pool settings for the shared Teller client
+TELLER_MAX_CONNECTIONS = int(os.getenv("TELLER_MAX_CONNECTIONS", "20"))
+TELLER_MAX_KEEPALIVE = int(os.getenv("TELLER_MAX_KEEPALIVE", "10"))
+TELLER_KEEPALIVE_EXPIRY = float(os.getenv("TELLER_KEEPALIVE_EXPIRY", "30"))
+TELLER_HTTP2 = os.getenv("TELLER_HTTP2", "false").lower() in ("1", "true", "yes")
+TELLER_TIMEOUT = float(os.getenv("TELLER_TIMEOUT", "10"))
+
+# How long the /accounts list and an account's balance are used as fresh (seconds)
+ACCOUNTS_CACHE_TTL = float(os.getenv("ACCOUNTS_CACHE_TTL", "300"))
+BALANCE_CACHE_TTL = float(os.getenv("BALANCE_CACHE_TTL", "5"))
+
+# Past that (and past TRANSACTION_SYNC_INTERVAL for transactions), the last
+# good value is still served, tagged with its age: for this many seconds
+# while a background refresh runs...
+TELLER_STALE_WHILE_REVALIDATE = float(os.getenv("TELLER_STALE_WHILE_REVALIDATE", "60"))
+# ...and for this many while Teller is failing
+TELLER_STALE_IF_ERROR = float(os.getenv("TELLER_STALE_IF_ERROR", "3600"))
+# Circuit breaker: consecutive Teller failures (timeouts, connection errors,
+# 5xx/429) before failing fast, and seconds until a trial request
+TELLER_BREAKER_FAILURES = int(os.getenv("TELLER_BREAKER_FAILURES", "5"))
+TELLER_BREAKER_RESET = float(os.getenv("TELLER_BREAKER_RESET", "30"))
+
+# Minimum seconds between incremental payee index syncs
+PAYEE_SYNC_INTERVAL = float(os.getenv("PAYEE_SYNC_INTERVAL", "60"))
+
+# Local transaction store: minimum seconds between Teller syncs per account,
+# and how many rows of history the first sync backfills
+TRANSACTION_DB_PATH = os.getenv("TRANSACTION_DB_PATH", "transactions.db")
+TRANSACTION_SYNC_INTERVAL = float(os.getenv("TRANSACTION_SYNC_INTERVAL", "30"))
+TRANSACTION_BACKFILL = int(os.getenv("TRANSACTION_BACKFILL", "500"))
+
+# Payment journal durability and compaction
+PAYMENT_JOURNAL_FSYNC = os.getenv("PAYMENT_JOURNAL_FSYNC", "true").lower() in ("1", "true", "yes")
+PAYMENT_SNAPSHOT_EVERY = int(os.getenv("PAYMENT_SNAPSHOT_EVERY", "10000"))
+
+# Cache for Gemini acknowledgements, keyed on intent + normalized utterance
+GEMINI_CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", "3600"))
+GEMINI_CACHE_SIZE = int(os.getenv("GEMINI_CACHE_SIZE", "2048"))
+# Optional file with one phrase per line to pre-warm that cache at startup
+GEMINI_PREWARM_FILE = os.getenv("GEMINI_PREWARM_FILE")
+
+# How long a chat turn waits for its Gemini acknowledgement (ms, 0 waits forever).
+# Past the budget the templated text is sent; a late request that hasn't started
+# is cancelled, one already running finishes and fills the cache. New requests
+# are skipped (templated text at once) while LLM_MAX_PENDING are unfinished.
+LLM_LATENCY_BUDGET_MS = float(os.getenv("LLM_LATENCY_BUDGET_MS", "1500"))
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "8"))
+LLM_MAX_PENDING = int(os.getenv("LLM_MAX_PENDING", str(LLM_WORKERS * 2)))
+
+# /api/chat/batch: largest accepted batch and how many users run in parallel
+CHAT_BATCH_MAX = int(os.getenv("CHAT_BATCH_MAX", "100"))
+CHAT_BATCH_WORKERS = int(os.getenv("CHAT_BATCH_WORKERS", "8"))
+
+# Largest list accepted by /api/direct-payment/bulk
+PAYMENT_BULK_MAX = int(os.getenv("PAYMENT_BULK_MAX", "500"))
+
+# Fuzzy payee matching: minimum confidence to pick a payee, and the lead it
+# needs over the runner-up before we stop asking which one was meant
+PAYEE_MATCH_THRESHOLD = float(os.getenv("PAYEE_MATCH_THRESHOLD", "0.6"))
+PAYEE_MATCH_MARGIN = float(os.getenv("PAYEE_MATCH_MARGIN", "0.08"))
+
+# Opt-in request profiling: a fraction of requests, and/or requests sent
+# with "X-Profile: <PROFILE_TOKEN>". Off (and not installed) by default.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+request_profiler = RequestProfiler(PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_TOKEN, PROFILE_KEEP)
+
+# Services are built on the first request. With WARMUP=true they are built
+# in the background at startup instead, opening the Teller connection pool,
+# the account and transaction caches and the Gemini client before traffic arrives.
+WARMUP = os.getenv("WARMUP", "false").lower() in ("1", "true", "yes")
+
+# Seconds of inactivity before a user's conversation state is dropped
+SESSION_TTL = float(os.getenv("SESSION_TTL", "3600"))
+
+# Where sessions, the payment ledger and upstream caches live: "memory"
+# (one process) or "sqlite" (shared by every worker on the host)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").lower()
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "banking_state.db")
+PAYMENTS_FILE = "simulated_payments.json"
+
+
+def create_state_backend():
+    if STATE_BACKEND == "sqlite":
+        logger.info("shared state in SQLite (WAL)", extra={"path": STATE_DB_PATH})
+        return SQLiteStateBackend(STATE_DB_PATH, legacy_payments_file=PAYMENTS_FILE)
+    if STATE_BACKEND != "memory":
+        raise RuntimeError(f"Unknown STATE_BACKEND: {STATE_BACKEND}")
+    return MemoryStateBackend(PAYMENTS_FILE, fsync=PAYMENT_JOURNAL_FSYNC, snapshot_every=PAYMENT_SNAPSHOT_EVERY)
+
+
+# ---------------------------------------------------------
+# Upstream lookups shared within one batch of messages
+# ---------------------------------------------------------
+class UpstreamMemo:
+    """Futures for upstream lookups, keyed by what they fetch.
+
+    The first caller of a key runs the fetch; concurrent and later callers
+    in the same batch wait on its future instead of repeating the request.
+    """
+
+    def __init__(self):
+        self.futures = {}
+        self.lock = threading.Lock()
+        self.lookups = 0
+        self.shared = 0
+
+    def lookup(self, key, fetch):
+        with self.lock:
+            self.lookups += 1
+            future = self.futures.get(key)
+            owner = future is None
+            if owner:
+                future = self.futures[key] = Future()
+            else:
+                self.shared += 1
+
+        if owner:
+            try:
+                future.set_result(fetch())
+            except BaseException as e:
+                future.set_exception(e)
+        return future.result()
+
+    def stats(self):
+        return {"lookups": self.lookups, "deduplicated": self.shared}
+
+
+def teller_unavailable(exc):
+    """Whether `exc` says Teller is unhealthy, rather than that the request was wrong"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500 or exc.response.status_code == 429
+    return isinstance(exc, (httpx.TransportError, CircuitOpenError))
+
+
+BALANCE_UNAVAILABLE = "Your balance can't be checked right now, so no payment was made. Please try again in a moment."
+
+
+class BalanceUnavailableError(RuntimeError):
+    """A payment was refused because a fresh balance could not be read from Teller"""
+
 
 # ---------------------------------------------------------
 # Enhanced Banking Service with REAL Payment Tracking
 # ---------------------------------------------------------
 class BankingService:
-    def __init__(self):
+    def __init__(self, state=None):
         if not TELLER_TOKEN:
             raise RuntimeError("TELLER_TOKEN not found in .env")
         if not os.path.exists(CERT_FILE):
@@ -33,41 +204,174 @@ class BankingService:
         if not os.path.exists(KEY_FILE):
             raise RuntimeError(f"Key file missing: {KEY_FILE}")
         
-        # File to track our simulated payments
-        self.payments_file = "simulated_payments.json"
-        self.load_payments()
+        self.state = state or create_state_backend()
 
-    def load_payments(self):
-        """Load simulated payments from file"""
-        try:
-            if os.path.exists(self.payments_file):
-                with open(self.payments_file, 'r') as f:
-                    self.simulated_payments = json.load(f)
-            else:
-                self.simulated_payments = []
-        except:
-            self.simulated_payments = []
+        # Ledger of our simulated payments with per-account completed totals
+        self.ledger = self.state.ledger()
 
-    def save_payments(self):
-        """Save simulated payments to file"""
-        try:
-            with open(self.payments_file, 'w') as f:
-                json.dump(self.simulated_payments, f, indent=2)
-        except Exception as e:
-            print(f"Warning: Could not save payments: {e}")
+        # One pooled mTLS client per process, created on first use
+        self._client = None
+        self._aclient = None
+        self._client_lock = threading.Lock()
+        atexit.register(self.close)
+
+        # Teller reads serve their last good value while refreshing it, and
+        # fail fast (or serve stale) while the breaker is open
+        self.breaker = CircuitBreaker("teller", TELLER_BREAKER_FAILURES, TELLER_BREAKER_RESET,
+                                      is_failure=teller_unavailable)
+        self.accounts_reads, self.balance_reads, self.transaction_reads = (
+            StaleWhileRevalidate(source, self.breaker, fresh_for, TELLER_STALE_WHILE_REVALIDATE, TELLER_STALE_IF_ERROR)
+            for source, fresh_for in (("accounts", ACCOUNTS_CACHE_TTL), ("balances", BALANCE_CACHE_TTL),
+                                      ("transactions", TRANSACTION_SYNC_INTERVAL))
+        )
+
+        # [fetched_at, value] entries: account lists keyed by access token, Teller balances by account
+        self.accounts_cache = self.state.cache("teller_accounts", ttl=self.accounts_reads.max_age, maxsize=64)
+        self.balances_cache = self.state.cache("teller_balances", ttl=self.balance_reads.max_age, maxsize=1024)
+
+        # Set for the duration of a batch (see batch_scope)
+        self._batch_memo = contextvars.ContextVar("upstream_memo", default=None)
+
+        # Transactions mirrored locally and synced incrementally from Teller
+        self.transaction_store = TransactionStore(TRANSACTION_DB_PATH, backfill=TRANSACTION_BACKFILL)
+
+        # Columnar spending analytics per account, rebuilt when the store changes
+        self.analytics = {}
+        self._analytics_lock = threading.Lock()
+
+        # Payee indexes (and fuzzy matchers built from them) keyed by account id
+        self.payee_indexes = {}
+        self.payee_matchers = {}
+        self._payee_indexes_lock = threading.Lock()
 
     def client(self):
-        return httpx.Client(
-            cert=(CERT_FILE, KEY_FILE),
-            auth=(TELLER_TOKEN, ""),
-            timeout=10.0
+        """Shared keep-alive client, so the mTLS handshake is paid once per connection"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        verify=self._ssl_context(),
+                        auth=(TELLER_TOKEN, ""),
+                        timeout=TELLER_TIMEOUT,
+                        limits=httpx.Limits(
+                            max_connections=TELLER_MAX_CONNECTIONS,
+                            max_keepalive_connections=TELLER_MAX_KEEPALIVE,
+                            keepalive_expiry=TELLER_KEEPALIVE_EXPIRY
+                        ),
+                        http2=self._http2_enabled()
+                    )
+        return self._client
+
+    def aclient(self):
+        """Shared async client for the ASGI server (bound to the running event loop)"""
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(
+                verify=self._ssl_context(),
+                auth=(TELLER_TOKEN, ""),
+                timeout=TELLER_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=TELLER_MAX_CONNECTIONS,
+                    max_keepalive_connections=TELLER_MAX_KEEPALIVE,
+                    keepalive_expiry=TELLER_KEEPALIVE_EXPIRY
+                ),
+                http2=self._http2_enabled()
+            )
+        return self._aclient
+
+    async def aclose(self):
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+
+    def _ssl_context(self):
+        """TLS context carrying the Teller client certificate"""
+        ctx = ssl.create_default_context(cafile=CA_BUNDLE or certifi.where())
+        ctx.load_cert_chain(CERT_FILE, KEY_FILE)
+        return ctx
+
+    def _http2_enabled(self):
+        if not TELLER_HTTP2:
+            return False
+        if importlib.util.find_spec("h2") is None:
+            logger.warning("TELLER_HTTP2 is set but the 'h2' package is missing, using HTTP/1.1")
+            return False
+        return True
+
+    def close(self):
+        """Close the pooled client and flush the journal (safe to call more than once)"""
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+        self.ledger.close()
+        self.transaction_store.close()
+
+    @contextlib.contextmanager
+    def batch_scope(self):
+        """Share identical Teller lookups among everything run in this context.
+
+        Contexts copied from it (contextvars.copy_context) share the same
+        memo, so worker threads handling one batch fetch each account list
+        and balance once. Yields the UpstreamMemo.
+        """
+        memo = UpstreamMemo()
+        token = self._batch_memo.set(memo)
+        try:
+            yield memo
+        finally:
+            self._batch_memo.reset(token)
+
+    def _batch_lookup(self, key, fetch):
+        memo = self._batch_memo.get()
+        if memo is None:
+            return fetch()
+        return memo.lookup(key, fetch)
+
+    def get_accounts(self, refresh=False):
+        """Get accounts from the per-token cache (see get_accounts_with_age)"""
+        return self.get_accounts_with_age(refresh)[0]
+
+    def get_accounts_with_age(self, refresh=False):
+        """(accounts, age in seconds); `refresh` skips the cache and reports a failing Teller"""
+        return self.accounts_reads.get_cached(
+            self.accounts_cache, TELLER_TOKEN, lambda: self._batch_lookup(("accounts",), self._fetch_accounts),
+            force=refresh
         )
 
-    def get_accounts(self):
-        with self.client() as c:
+    def _fetch_accounts(self):
+        c = self.client()
+        with metrics.stage("teller_accounts"):
             res = c.get(f"{BASE_URL}/accounts")
             res.raise_for_status()
-            return res.json()
+        return res.json()
+
+    async def get_accounts_async(self, refresh=False):
+        return (await self.get_accounts_with_age_async(refresh))[0]
+
+    async def get_accounts_with_age_async(self, refresh=False):
+        return await self.accounts_reads.get_cached_async(
+            self.accounts_cache, TELLER_TOKEN, self._fetch_accounts_async, force=refresh
+        )
+
+    async def _fetch_accounts_async(self):
+        with metrics.stage("teller_accounts"):
+            res = await self.aclient().get(f"{BASE_URL}/accounts")
+            res.raise_for_status()
+        return res.json()
+
+    def invalidate_accounts(self):
+        """Drop the cached account list so the next lookup hits Teller"""
+        self.accounts_cache.invalidate(TELLER_TOKEN)
+
+    def cache_stats(self):
+        return {
+            "accounts": self.accounts_cache.stats(),
+            "balances": self.balances_cache.stats(),
+            "teller_breaker": self.breaker.stats(),
+            # Teller reads made, and identical concurrent reads that shared them
+            "teller_flights": {reads.source: reads.flights.stats()
+                               for reads in (self.accounts_reads, self.balance_reads, self.transaction_reads)}
+        }
 
     def get_default_account_id(self):
         accounts = self.get_accounts()
@@ -75,40 +379,188 @@ class BankingService:
             return accounts[0]["id"]
         return None
 
+    async def get_default_account_id_async(self):
+        accounts = await self.get_accounts_async()
+        if accounts:
+            return accounts[0]["id"]
+        return None
+
     def get_balance(self, account_id):
-        """Get REAL balance from Teller API"""
-        with self.client() as c:
+        """Get REAL balance from Teller API (or its last good value, see age_seconds)"""
+        # Only the upstream figure is cached; the adjustment always reflects the ledger
+        data, age = self.balance_reads.get_cached(
+            self.balances_cache, account_id,
+            lambda: self._batch_lookup(("balance", account_id), lambda: self._fetch_balance(account_id))
+        )
+        return self._adjusted_balance(account_id, data, age)
+
+    def get_balance_for_payment(self, account_id):
+        """The balance read fresh from Teller, for authorizing a payment.
+
+        Cached and stale figures are fine for display but never move money:
+        this always goes upstream (coalesced with concurrent reads) and
+        raises BalanceUnavailableError instead of falling back.
+        """
+        try:
+            data, age = self.balance_reads.get_cached(
+                self.balances_cache, account_id, lambda: self._fetch_balance(account_id), force=True
+            )
+        except Exception as e:
+            if teller_unavailable(e):
+                raise BalanceUnavailableError(BALANCE_UNAVAILABLE) from e
+            raise
+        return self._adjusted_balance(account_id, data, age)
+
+    def _fetch_balance(self, account_id):
+        c = self.client()
+        with metrics.stage("teller_balances"):
             res = c.get(f"{BASE_URL}/accounts/{account_id}/balances")
             res.raise_for_status()
-            balance_data = res.json()
-            
-            # Calculate adjusted balance considering our simulated payments
-            real_balance = float(balance_data.get('available', 0))
-            adjusted_balance = self.calculate_adjusted_balance(real_balance)
-            
-            return {
-                'real_available': real_balance,
-                'available': adjusted_balance,
-                'ledger': float(balance_data.get('ledger', 0))
-            }
+        return res.json()
 
-    def calculate_adjusted_balance(self, real_balance):
-        """Calculate balance after deducting simulated payments"""
-        total_pending_payments = sum(
-            float(payment['amount']) 
-            for payment in self.simulated_payments 
-            if payment['status'] == 'completed'
+    async def get_balance_async(self, account_id):
+        data, age = await self.balance_reads.get_cached_async(
+            self.balances_cache, account_id, lambda: self._fetch_balance_async(account_id)
         )
-        return real_balance - total_pending_payments
+        completed = await self.ledger.completed_total_async(account_id)
+        return self._adjusted_balance(account_id, data, age, completed)
+
+    async def _fetch_balance_async(self, account_id):
+        with metrics.stage("teller_balances"):
+            res = await self.aclient().get(f"{BASE_URL}/accounts/{account_id}/balances")
+            res.raise_for_status()
+        return res.json()
+
+    def _adjusted_balance(self, account_id, balance_data, age=0.0, completed=None):
+        # Calculate adjusted balance considering our simulated payments
+        real_balance = float(balance_data.get('available', 0))
+        if completed is None:
+            adjusted_balance = self.calculate_adjusted_balance(real_balance, account_id)
+        else:
+            adjusted_balance = real_balance - completed
+        
+        return {
+            'real_available': real_balance,
+            'available': adjusted_balance,
+            'ledger': float(balance_data.get('ledger', 0)),
+            # How old Teller's figure is; stale once past BALANCE_CACHE_TTL
+            'age_seconds': round(age, 1),
+            'stale': self.balance_reads.is_stale(age)
+        }
+
+    def calculate_adjusted_balance(self, real_balance, account_id):
+        """Calculate balance after deducting this account's simulated payments"""
+        return real_balance - self.ledger.completed_total(account_id)
+
+    def sync_transactions(self, account_id):
+        """Bring the local store up to date with Teller; returns the stored data's age in seconds.
+
+        Once an account has synced, a stale store is served while it syncs
+        in the background, and kept (up to TELLER_STALE_IF_ERROR) while
+        Teller is failing.
+        """
+        def sync():
+            self.transaction_store.sync(
+                account_id,
+                lambda count, from_id: self.get_transactions_page(account_id, count, from_id),
+                max_age=TRANSACTION_SYNC_INTERVAL
+            )
+        _, age = self.transaction_reads.get(account_id, self.transactions_age(account_id), lambda: None, sync)
+        return age
 
-    def get_transactions(self, account_id, count=5):
-        with self.client() as c:
+    def transactions_age(self, account_id):
+        """Seconds since the account's transactions were last synced (None if never)"""
+        last_sync = self.transaction_store.last_sync(account_id)
+        return None if last_sync is None else max(0.0, time.time() - last_sync)
+
+    def get_transactions(self, account_id, count=5, start=None, end=None, description=None):
+        """Newest `count` transactions, served from the local store.
+
+        `start`/`end` bound the date (inclusive) and `description` matches a
+        description prefix, ignoring case; filtered lookups use the store's
+        date and description indexes.
+        """
+        self.sync_transactions(account_id)
+        if start is None and end is None and not description:
+            return self.transaction_store.recent(account_id, count)
+        return self.transaction_store.search(account_id, count, start, end, description)
+
+    async def get_transactions_async(self, account_id, count=5, start=None, end=None, description=None):
+        # The store is SQLite, so run the lookup (and any sync) off the event loop
+        return await asyncio.to_thread(self.get_transactions, account_id, count, start, end, description)
+
+    def get_transactions_page(self, account_id, count, from_id=None):
+        """Fetch `count` transactions, newest first, older than `from_id` if given"""
+        params = {"count": count}
+        if from_id:
+            params["from_id"] = from_id
+        c = self.client()
+        with metrics.stage("teller_transactions"):
             res = c.get(
                 f"{BASE_URL}/accounts/{account_id}/transactions",
-                params={"count": count}
+                params=params
             )
             res.raise_for_status()
-            return res.json()
+        return res.json()
+
+    def get_spending_analytics(self, account_id):
+        """SpendingAnalytics over the account's full stored history"""
+        # Imported here (with numpy) so processes that never see a spending question don't pay for it
+        from spending_analytics import SpendingAnalytics
+
+        self.sync_transactions(account_id)
+        version = self.transaction_store.version(account_id)
+        with self._analytics_lock:
+            cached = self.analytics.get(account_id)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+            analytics = SpendingAnalytics.from_columns(
+                *self.transaction_store.columns(account_id), extract_name=self._extract_payee_name
+            )
+            self.analytics[account_id] = (version, analytics)
+            return analytics
+
+    def get_spending(self, account_id, start=None, end=None, merchant=None, top=5):
+        """Totals, breakdowns and buckets of spending between `start` and `end`"""
+        return self.get_spending_analytics(account_id).summary(start, end, merchant=merchant, top=top)
+
+    def get_payee_index(self, account_id):
+        """Payee index for the account, fed from the transaction store when it is stale"""
+        with self._payee_indexes_lock:
+            index = self.payee_indexes.get(account_id)
+            if index is None:
+                index = PayeeIndex(account_id, self._extract_payee_name,
+                                   initial_count=None, page_size=500, max_pages=200)
+                self.payee_indexes[account_id] = index
+
+        if index.is_stale(PAYEE_SYNC_INTERVAL):
+            self.sync_transactions(account_id)
+            index.sync(lambda count, from_id: self.transaction_store.page(account_id, count, from_id))
+        return index
+
+    def get_payee_matcher(self, account_id):
+        """Fuzzy matcher over the account's payees, most frequent first on ties"""
+        index = self.get_payee_index(account_id)
+        with self._payee_indexes_lock:
+            cached = self.payee_matchers.get(account_id)
+            if cached is None or cached[0] != index.version:
+                cached = (index.version, PayeeMatcher(index.ranked()))
+                self.payee_matchers[account_id] = cached
+            return cached[1]
+
+    def match_payee(self, text, limit=3):
+        """Ranked payee candidates for a spoken request, [{'payee', 'score'}]"""
+        try:
+            account_id = self.get_default_account_id()
+            if not account_id:
+                return []
+            matcher = self.get_payee_matcher(account_id)
+            with metrics.stage("payee_match"):
+                return matcher.match(text, limit)
+        except Exception as e:
+            logger.warning("error matching payee", extra={"error": str(e)})
+            return []
 
     def get_payees(self):
         """Get list of payees from transaction history"""
@@ -117,19 +569,9 @@ class BankingService:
             if not account_id:
                 return []
             
-            transactions = self.get_transactions(account_id, count=50)
-            payees = set()
-            
-            for transaction in transactions:
-                description = transaction.get('description', '').strip()
-                if description and description not in ['', 'Payment', 'Transfer']:
-                    payee_name = self._extract_payee_name(description)
-                    if payee_name:
-                        payees.add(payee_name)
-            
-            return sorted(list(payees))
+            return self.get_payee_index(account_id).names()
         except Exception as e:
-            print(f"Error getting payees: {e}")
+            logger.warning("error getting payees", extra={"error": str(e)})
             return []
 
     def _extract_payee_name(self, description):
@@ -162,24 +604,23 @@ class BankingService:
                 return False, "No account found"
             
             # Get current REAL balance
-            balance_info = self.get_balance(account_id)
+            balance_info = self.get_balance_for_payment(account_id)
             real_balance = balance_info['real_available']
             current_balance = balance_info['available']
             payment_amount = float(amount)
             
-            print(f"💰 Processing payment: ${payment_amount:.2f} to {payee_name}")
-            print(f"📊 Current balance: ${current_balance:.2f}")
+            logger.info("processing payment", extra={
+                "payee": payee_name, "amount": payment_amount, "balance": current_balance
+            })
             
             # Check if sufficient balance (considering real balance)
             if real_balance < payment_amount:
                 return False, f"Insufficient funds. Your actual balance is ${real_balance:.2f}"
             
-            if current_balance < payment_amount:
-                return False, f"Insufficient available balance. Available: ${current_balance:.2f}"
-            
-            # Create and record the payment
+            # Create the payment; the ledger checks the available balance
+            # and records it atomically so concurrent payments can't overdraw
             payment_record = {
-                'id': f"sim_pay_{int(time.time())}",
+                'id': new_payment_id(),
                 'payee': payee_name,
                 'amount': payment_amount,
                 'date': datetime.now().isoformat(),
@@ -188,12 +629,13 @@ class BankingService:
                 'description': f'Payment to {payee_name}'
             }
             
-            # Add to our simulated payments
-            self.simulated_payments.append(payment_record)
-            self.save_payments()
+            with metrics.stage("payment_persist"):
+                accepted, available = self.ledger.reserve(payment_record, real_balance)
+            if not accepted:
+                return False, f"Insufficient available balance. Available: ${available:.2f}"
             
             # Calculate new balance
-            new_balance = current_balance - payment_amount
+            new_balance = available - payment_amount
             
             return True, {
                 'message': f"Payment of ${payment_amount:.2f} to {payee_name} completed successfully!",
@@ -202,16 +644,88 @@ class BankingService:
                 'payee': payee_name
             }
             
+        except BalanceUnavailableError as e:
+            return False, str(e)
         except Exception as e:
             return False, f"Payment failed: {str(e)}"
 
+    def make_payments(self, payments, account_id=None, atomic=False):
+        """Pay many payees from one account with one balance check and one ledger write.
+
+        `payments` is a list of {payee, amount}. They are checked in order
+        against a single balance snapshot; with `atomic` either every
+        payment goes through or none does. Returns (per-item results,
+        summary). Raises BalanceUnavailableError, with nothing recorded,
+        if Teller can't give a fresh balance for a batch that would pay.
+        """
+        if not account_id:
+            account_id = self.get_default_account_id()
+        if not account_id:
+            raise ValueError("No account found")
+
+        records = []
+        slots = []  # per input item: its record, or the validation error
+        for item in payments:
+            payee = item.get('payee') if isinstance(item, dict) else None
+            try:
+                amount = float(item.get('amount'))
+            except (AttributeError, TypeError, ValueError):
+                amount = None
+            if not payee or amount is None or amount <= 0:
+                slots.append({"payee": payee, "success": False, "error": "Payee and a positive amount are required"})
+                continue
+
+            record = {
+                'id': new_payment_id(),
+                'payee': payee,
+                'amount': amount,
+                'date': datetime.now().isoformat(),
+                'status': 'completed',
+                'account_id': account_id,
+                'description': f'Payment to {payee}'
+            }
+            records.append(record)
+            slots.append(record)
+
+        if not records or (atomic and len(records) < len(slots)):
+            # Nothing can be paid (no valid items, or an invalid one in an
+            # all-or-nothing batch): skip the fresh read and the ledger, and
+            # report the balance net of this account's earlier payments
+            funded, available = set(), self.get_balance(account_id)['available']
+        else:
+            balance_info = self.get_balance_for_payment(account_id)
+            logger.info("processing bulk payments", extra={
+                "payments": len(records), "total": round(sum(r['amount'] for r in records), 2)
+            })
+            with metrics.stage("payment_persist"):
+                accepted, available = self.ledger.reserve_many(records, balance_info['real_available'], atomic=atomic)
+            funded = {r['id'] for r, ok in zip(records, accepted) if ok}
+
+        results = []
+        for slot in slots:
+            if 'id' not in slot:
+                results.append(slot)
+            elif slot['id'] in funded:
+                results.append({"payee": slot['payee'], "amount": slot['amount'], "success": True, "id": slot['id']})
+            else:
+                error = "Not applied: the batch could not be paid in full" if atomic else "Insufficient available balance"
+                results.append({"payee": slot['payee'], "amount": slot['amount'], "success": False, "error": error})
+
+        total_paid = sum((r['amount'] for r in records if r['id'] in funded), 0.0)
+        return results, {
+            "paid": len(funded),
+            "failed": len(results) - len(funded),
+            "total_paid": round(total_paid, 2),
+            "new_balance": available - total_paid
+        }
+
     def get_payment_history(self):
         """Get history of simulated payments"""
-        return self.simulated_payments[-5:]  # Last 5 payments
+        return self.ledger.recent(5)  # Last 5 payments
 
     def get_recent_payments(self, count=3):
         """Get recent payments for confirmation"""
-        recent = self.simulated_payments[-count:]
+        recent = self.ledger.recent(count)
         return recent[::-1]  # Reverse to show newest first
 
 
@@ -219,56 +733,217 @@ class BankingService:
 # AI Service for Natural Language Processing
 # ---------------------------------------------------------
 class AIService:
-    def __init__(self):
-        if GEMINI_API_KEY:
-            genai.configure(api_key=GEMINI_API_KEY)
-            self.gemini_model = genai.GenerativeModel('gemini-2.5-flash')
-            print("✓ Gemini AI ready!")
-        else:
-            self.gemini_model = None
-            print("⚠️ Gemini API key not found")
+    def __init__(self, state=None):
+        # Created on first use: importing google.generativeai takes longer
+        # than the rest of the app put together
+        self._gemini_model = None
+        self._gemini_lock = threading.Lock()
+        if not GEMINI_API_KEY:
+            logger.warning("Gemini API key not found")
+
+        # Acknowledgements are short and repetitive, so reuse them
+        state = state or MemoryStateBackend()
+        self.response_cache = state.cache("gemini", ttl=GEMINI_CACHE_TTL, maxsize=GEMINI_CACHE_SIZE)
+
+        # Worker pool so acknowledgements can run alongside the Teller fetches
+        self._executor = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="gemini")
+        self._background_tasks = set()
+        # Enhancements started and not finished, so a slow Gemini can't build a backlog
+        self._pending = threading.BoundedSemaphore(LLM_MAX_PENDING)
+        self.late_responses = 0
+        self.skipped = 0
+
+    @property
+    def gemini_model(self):
+        """The Gemini model, or None without an API key"""
+        if self._gemini_model is None and GEMINI_API_KEY:
+            with self._gemini_lock:
+                if self._gemini_model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=GEMINI_API_KEY)
+                    self._gemini_model = genai.GenerativeModel('gemini-2.5-flash')
+                    logger.info("Gemini AI ready")
+        return self._gemini_model
+
+    async def gemini_model_async(self):
+        """gemini_model, with the first (slow) import run off the event loop"""
+        if self._gemini_model is None and GEMINI_API_KEY:
+            return await asyncio.to_thread(lambda: self.gemini_model)
+        return self._gemini_model
 
     def detect_intent(self, text):
-        if not text:
-            return "UNKNOWN"
-        text = text.lower()
-
-        # Payment exit commands should have highest priority
-        if any(w in text for w in ["cancel", "stop", "nevermind", "not now", "exit payment", "don't pay"]):
-            return "CANCEL_PAYMENT"
-        if any(w in text for w in ["go back", "main menu", "start over", "different", "something else"]):
-            return "GO_BACK"
-        if any(w in text for w in ["what can you do", "options", "menu"]):
-            return "HELP"
-        
-        # Rest of existing intent detection
-        if any(w in text for w in ["hello", "hi", "hey", "good morning"]):
-            return "GREETING"
-        if any(w in text for w in ["balance", "how much", "money"]):
-            return "CHECK_BALANCE"
-        if any(w in text for w in ["transaction", "history", "payments", "recent"]):
-            return "VIEW_TRANSACTIONS"
-        if any(w in text for w in ["spent", "spending"]):
-            return "SPENDING_SUMMARY"
-        if any(w in text for w in ["payee", "payees", "who i pay", "merchants", "user list", "pay list", "list of payees"]):
-            return "VIEW_PAYEES"
-        if any(w in text for w in ["pay", "send money", "transfer", "make payment"]):
-            return "MAKE_PAYMENT"
-        if any(w in text for w in ["payment history", "my payments", "recent payments"]):
-            return "PAYMENT_HISTORY"
-        if "help" in text:
-            return "HELP"
-        if any(w in text for w in ["bye", "goodbye", "exit", "quit"]):
-            return "FAREWELL"
-        return "GENERAL_INQUIRY"
-
-    def enhance_conversation(self, user_input, banking_context=""):
+        with metrics.stage("intent"):
+            return intent_classifier.detect_intent(text)
+
+    def detect_intents(self, texts):
+        """Classify a batch of utterances in one pass"""
+        with metrics.stage("intent"):
+            return intent_classifier.detect_intents(texts)
+
+    def enhance_conversation(self, user_input, banking_context="", intent=None):
         """Use Gemini for natural responses"""
         if not self.gemini_model:
             return None
+
+        key = self._cache_key(user_input, intent)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            return cached
+        return self._generate(key, user_input, banking_context)
+
+    def _generate(self, key, user_input, banking_context):
+        try:
+            with metrics.stage("gemini"):
+                response = self.gemini_model.generate_content(self._build_prompt(user_input, banking_context))
+            return self._store_response(key, response.text)
             
+        except Exception as e:
+            logger.warning("Gemini error", extra={"error": str(e)})
+            return None
+
+    def submit_enhancement(self, user_input, banking_context="", intent=None):
+        """Start enhance_conversation in the worker pool and return a Future.
+
+        `banking_context` may be a callable; it is then evaluated in the
+        worker, so slow context lookups count against the same budget.
+        """
+        future = Future()
+        if not self.gemini_model:
+            future.set_result(None)
+            return future
+
+        key = self._cache_key(user_input, intent)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            future.set_result(cached)
+            return future
+
+        if not self._claim_slot():
+            future.set_result(None)
+            return future
+
+        def run():
+            context = banking_context() if callable(banking_context) else banking_context
+            return self._generate(key, user_input, context)
+        # Run in a copy of the caller's context so batch-scoped lookups are shared
+        future = self._executor.submit(contextvars.copy_context().run, run)
+        # Also called when the future is cancelled
+        future.add_done_callback(lambda _: self._pending.release())
+        return future
+
+    def _claim_slot(self):
+        """Reserve room for one more unfinished enhancement, or count it as skipped"""
+        if self._pending.acquire(blocking=False):
+            return True
+        self.skipped += 1
+        return False
+
+    def wait_for_enhancement(self, future, deadline):
+        """Result of a submitted enhancement, or None if it misses `deadline`"""
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
         try:
-            prompt = f"""You're a friendly banking assistant. User said: "{user_input}"
+            return future.result(timeout=timeout)
+        except FuturesTimeout:
+            # Still queued: drop it so it doesn't hold up later turns. Already
+            # running: let it finish in the background (it still fills the cache)
+            future.cancel()
+            self.late_responses += 1
+            return None
+
+    async def enhance_conversation_async(self, user_input, banking_context="", intent=None):
+        """Non-blocking variant of enhance_conversation for the ASGI server"""
+        if not await self.gemini_model_async():
+            return None
+
+        key = self._cache_key(user_input, intent)
+        cached = await self.response_cache.get_async(key)
+        if cached is not None:
+            return cached
+
+        return await self._generate_async(key, user_input, banking_context)
+
+    async def _generate_async(self, key, user_input, banking_context):
+        try:
+            with metrics.stage("gemini"):
+                model = await self.gemini_model_async()
+                response = await model.generate_content_async(self._build_prompt(user_input, banking_context))
+            return await self._store_response_async(key, response.text)
+
+        except Exception as e:
+            logger.warning("Gemini error", extra={"error": str(e)})
+            return None
+
+    def submit_enhancement_async(self, user_input, banking_context="", intent=None):
+        """Async counterpart of submit_enhancement: returns an asyncio Task.
+
+        `banking_context` may be an async callable, awaited inside the task.
+        """
+        async def run():
+            if not await self.gemini_model_async():
+                return None
+            key = self._cache_key(user_input, intent)
+            cached = await self.response_cache.get_async(key)
+            if cached is not None:
+                return cached
+            if not self._claim_slot():
+                return None
+            try:
+                context = await banking_context() if callable(banking_context) else banking_context
+                return await self._generate_async(key, user_input, context)
+            finally:
+                self._pending.release()
+
+        task = asyncio.create_task(run())
+        # Keep a reference so a task that misses its deadline isn't garbage collected
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def wait_for_enhancement_async(self, task, deadline):
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        if task in done:
+            return task.result()
+        self.late_responses += 1
+        return None
+
+    def _cache_key(self, user_input, intent):
+        # The banking context is deliberately left out: the acknowledgement
+        # never contains banking data, so it doesn't depend on it.
+        normalized = " ".join(re.sub(r"[^\w\s']", " ", user_input.lower()).split())
+        return (intent or self.detect_intent(user_input), normalized)
+
+    def _store_response(self, key, text):
+        text = self._clean_response(text)
+        if text:
+            self.response_cache.set(key, text)
+        return text
+
+    async def _store_response_async(self, key, text):
+        text = self._clean_response(text)
+        if text:
+            await self.response_cache.set_async(key, text)
+        return text
+
+    def prewarm(self, phrases):
+        """Fill the acknowledgement cache for common phrases; returns how many were cached"""
+        warmed = 0
+        for phrase in phrases:
+            phrase = phrase.strip()
+            if phrase and self.enhance_conversation(phrase):
+                warmed += 1
+        return warmed
+
+    def prewarm_from_file(self, path):
+        try:
+            with open(path, 'r') as f:
+                warmed = self.prewarm(f.read().splitlines())
+            logger.info("pre-warmed Gemini responses", extra={"count": warmed, "path": path})
+        except OSError as e:
+            logger.warning("could not pre-warm Gemini cache", extra={"error": str(e)})
+
+    def _build_prompt(self, user_input, banking_context):
+        return f"""You're a friendly banking assistant. User said: "{user_input}"
 
 Context: {banking_context}
 
@@ -282,19 +957,58 @@ Examples:
 - "Absolutely, let me pull that up"
 
 Keep it very short and natural."""
-            
-            response = self.gemini_model.generate_content(prompt)
-            text = response.text.strip()
-            
-            # Remove any overly long responses
-            if len(text) > 100:
-                return None
-                
-            return text
-            
+
+    def stream_conversation(self, user_input, banking_context="", intent=None):
+        """Yield the acknowledgement as Gemini produces it (streaming generation).
+
+        A cached acknowledgement is yielded in one piece. Text past the
+        100-character limit is cut off rather than sent.
+        """
+        if not self.gemini_model:
+            return
+
+        key = self._cache_key(user_input, intent)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        sent = 0
+        try:
+            # Timed until the last token sent (the client's wait), not just the first
+            with metrics.stage("gemini_stream"):
+                for chunk in self.gemini_model.generate_content(self._build_prompt(user_input, banking_context), stream=True):
+                    text = chunk.text
+                    if not text:
+                        continue
+                    parts.append(text)
+                    if sent + len(text) > 100:
+                        break
+                    sent += len(text)
+                    yield text
         except Exception as e:
-            print(f"⚠️ Gemini error: {e}")
+            logger.warning("Gemini error", extra={"error": str(e)})
+            return
+
+        self._store_response(key, "".join(parts))
+
+    def _clean_response(self, text):
+        text = text.strip()
+        
+        # Remove any overly long responses
+        if len(text) > 100:
             return None
+            
+        return text
+
+
+def _describe_age(seconds):
+    if seconds < 3600:
+        minutes = max(1, int(seconds // 60))
+        return f"{minutes} minute{'s' if minutes != 1 else ''}"
+    hours = int(seconds // 3600)
+    return f"{hours} hour{'s' if hours != 1 else ''}"
 
 
 # ---------------------------------------------------------
@@ -302,31 +1016,64 @@ Keep it very short and natural."""
 # ---------------------------------------------------------
 class BankingAssistantService:
     def __init__(self):
-        self.bank = BankingService()
-        self.ai = AIService()
-        self.user_sessions = {}
+        self.state = create_state_backend()
+        self.bank = BankingService(self.state)
+        self.ai = AIService(self.state)
+        self.user_sessions = self.state.sessions(ttl=SESSION_TTL)
+        self._batch_executor = ThreadPoolExecutor(max_workers=CHAT_BATCH_WORKERS, thread_name_prefix="chat-batch")
+
+    def cache_stats(self):
+        return {
+            **self.bank.cache_stats(),
+            "gemini": {**self.ai.response_cache.stats(), "late": self.ai.late_responses,
+                       "skipped": self.ai.skipped}
+        }
 
     def get_user_session(self, user_id):
         """Get or create user session"""
-        if user_id not in self.user_sessions:
-            self.user_sessions[user_id] = {
-                'payment_mode': False,
-                'current_payee': None,
-                'current_amount': None,
-                'last_active': time.time()
-            }
-        return self.user_sessions[user_id]
+        return self.user_sessions.get(user_id)
+
+    def process_batch(self, items):
+        """Run a list of {user_id, message} through process_message.
+
+        Each user's messages run in order on one worker, different users run
+        in parallel, and identical Teller lookups are made once for the whole
+        batch. Returns (responses in input order, upstream lookup stats).
+        """
+        by_user = {}
+        responses = [None] * len(items)
+        for index, item in enumerate(items):
+            message = (item.get('message') or '').strip() if isinstance(item, dict) else ''
+            if not message:
+                responses[index] = {"error": "No message provided"}
+                continue
+            user_id = item.get('user_id', 'default_user')
+            by_user.setdefault(user_id, []).append((index, message))
+
+        def run_user(user_id, queue):
+            for index, message in queue:
+                try:
+                    response = self.process_message(user_id, message)
+                except Exception as e:
+                    response = self._error_response(e)
+                responses[index] = {"user_id": user_id, **response}
+
+        with self.bank.batch_scope() as memo:
+            futures = [
+                self._batch_executor.submit(contextvars.copy_context().run, run_user, user_id, queue)
+                for user_id, queue in by_user.items()
+            ]
+            for future in futures:
+                future.result()
+        return responses, memo.stats()
 
     def cleanup_sessions(self):
-        """Clean up old sessions (older than 1 hour)"""
-        current_time = time.time()
-        expired_users = []
-        for user_id, session in self.user_sessions.items():
-            if current_time - session['last_active'] > 3600:  # 1 hour
-                expired_users.append(user_id)
-        
-        for user_id in expired_users:
-            del self.user_sessions[user_id]
+        """Evict sessions idle for longer than SESSION_TTL"""
+        self.user_sessions.evict_expired()
+
+    def _payment_mode(self, user_id):
+        with self.user_sessions.checkout(user_id) as session:
+            return session.payment_mode
 
     def get_banking_context(self, user_id):
         try:
@@ -338,17 +1085,27 @@ class BankingAssistantService:
             pass
         return ""
 
-    def handle_payment_flow(self, user_id, text):
+    async def get_banking_context_async(self, user_id):
+        try:
+            account_id = await self.bank.get_default_account_id_async()
+            if account_id:
+                balance_info = await self.bank.get_balance_async(account_id)
+                return f"Balance: {balance_info.get('available', 'Unknown')}"
+        except Exception:
+            pass
+        return ""
+
+    def handle_payment_flow(self, user_id, text, intent=None):
         """Handle multi-step payment process with REAL tracking and escape routes"""
         session = self.get_user_session(user_id)
-        session['last_active'] = time.time()
 
         # FIRST check if user wants to exit payment mode
-        intent = self.ai.detect_intent(text)
+        if intent is None:
+            intent = self.ai.detect_intent(text)
         if intent in ["CANCEL_PAYMENT", "GO_BACK", "HELP"]:
-            session['payment_mode'] = False
-            session['current_payee'] = None
-            session['current_amount'] = None
+            session.payment_mode = False
+            session.current_payee = None
+            session.current_amount = None
             
             if intent == "CANCEL_PAYMENT":
                 return {
@@ -369,11 +1126,11 @@ class BankingAssistantService:
                     "next_step": None
                 }
 
-        if not session['current_payee']:
+        if not session.current_payee:
             # Step 1: Extract payee name
             payees = self.bank.get_payees()
             if not payees:
-                session['payment_mode'] = False
+                session.payment_mode = False
                 return {
                     "response": "I couldn't find any payees in your transaction history. Please add payees manually.",
                     "payment_mode": False,
@@ -392,22 +1149,27 @@ class BankingAssistantService:
                     "next_step": "payee"
                 }
             
-            # Try to find mentioned payee
+            # Rank payees by how closely they match what was heard
+            candidates = [c for c in self.bank.match_payee(text) if c["score"] >= PAYEE_MATCH_THRESHOLD]
             mentioned_payee = None
-            text_lower = text.lower()
-            for payee in payees:
-                payee_lower = payee.lower()
-                # Check if any word from payee is in the text
-                if any(word in text_lower for word in payee_lower.split() if len(word) > 2):
-                    mentioned_payee = payee
-                    break
+            if candidates and (len(candidates) == 1 or candidates[0]["score"] - candidates[1]["score"] >= PAYEE_MATCH_MARGIN):
+                mentioned_payee = candidates[0]["payee"]
+            elif candidates:
+                options = " or ".join(c["payee"] for c in candidates)
+                return {
+                    "response": f"Did you mean {options}? Please say the payee's name. (Say 'cancel' to stop)",
+                    "payment_mode": True,
+                    "next_step": "payee",
+                    "candidates": candidates
+                }
             
             if mentioned_payee:
-                session['current_payee'] = mentioned_payee
+                session.current_payee = mentioned_payee
                 return {
                     "response": f"I found {mentioned_payee} in your payees. How much would you like to pay? (Say 'cancel' to stop)",
                     "payment_mode": True,
-                    "next_step": "amount"
+                    "next_step": "amount",
+                    "confidence": candidates[0]["score"]
                 }
             else:
                 # List available payees
@@ -421,11 +1183,11 @@ class BankingAssistantService:
                     "next_step": "payee"
                 }
         
-        elif not session['current_amount']:
+        elif not session.current_amount:
             # Step 2: Extract amount
             # Check if user is trying to change payee or exit
             if any(word in text.lower() for word in ["different", "change", "other", "new payee", "wrong payee"]):
-                session['current_payee'] = None
+                session.current_payee = None
                 payees = self.bank.get_payees()
                 payee_list = ", ".join(payees[:5])
                 return {
@@ -434,59 +1196,30 @@ class BankingAssistantService:
                     "next_step": "payee"
                 }
             
-            try:
-                # Enhanced amount extraction
-                words = text.replace('$', ' $').replace('rs', ' $').replace('rupees', ' $').replace('₹', ' $').split()
-                amount_found = None
-                
-                for i, word in enumerate(words):
-                    clean_word = word.replace('$', '').replace(',', '').replace('₹', '').strip()
-                    
-                    # Handle number words
-                    number_words = {
-                        'hundred': 100, 'thousand': 1000, 'lakh': 100000,
-                        'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
-                        'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
-                        'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50,
-                        'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90
-                    }
-                    
-                    if clean_word in number_words:
-                        amount_found = number_words[clean_word]
-                    elif clean_word.replace('.', '').isdigit():
-                        amount_found = float(clean_word)
-                        break
-                
-                if amount_found:
-                    session['current_amount'] = amount_found
-                    # Get current balance for confirmation
-                    account_id = self.bank.get_default_account_id()
-                    balance_info = self.bank.get_balance(account_id) if account_id else None
-                    current_balance = balance_info['available'] if balance_info else 'unknown'
-                    
-                    return {
-                        "response": f"Confirm payment: ${session['current_amount']:.2f} to {session['current_payee']}. Your current balance is ${current_balance:.2f}. Say 'confirm' to proceed or 'cancel' to stop.",
-                        "payment_mode": True,
-                        "next_step": "confirmation"
-                    }
-                else:
-                    return {
-                        "response": "I didn't catch the amount. Please say something like 'fifty dollars' or '$50'. Say 'cancel' to stop the payment.",
-                        "payment_mode": True,
-                        "next_step": "amount"
-                    }
-            
-            except ValueError:
+            amount_found = parse_amount(text)
+            if amount_found:
+                session.current_amount = amount_found
+                # Get current balance for confirmation
+                account_id = self.bank.get_default_account_id()
+                balance_info = self.bank.get_balance(account_id) if account_id else None
+                current_balance = balance_info['available'] if balance_info else 'unknown'
+
                 return {
-                    "response": "I didn't understand the amount. Please say something like 'fifty dollars' or '$50'. Say 'cancel' to stop the payment.",
+                    "response": f"Confirm payment: ${session.current_amount:.2f} to {session.current_payee}. Your current balance is ${current_balance:.2f}. Say 'confirm' to proceed or 'cancel' to stop.",
+                    "payment_mode": True,
+                    "next_step": "confirmation"
+                }
+            else:
+                return {
+                    "response": "I didn't catch the amount. Please say something like 'fifty dollars' or '$50'. Say 'cancel' to stop the payment.",
                     "payment_mode": True,
                     "next_step": "amount"
                 }
-        
+
         else:
             # Step 3: Confirm payment
             if any(word in text.lower() for word in ['yes', 'confirm', 'proceed', 'ok', 'do it', 'confirm the payment']):
-                success, result = self.bank.make_payment(session['current_payee'], session['current_amount'])
+                success, result = self.bank.make_payment(session.current_payee, session.current_amount)
                 
                 if success:
                     # Payment successful
@@ -499,16 +1232,16 @@ class BankingAssistantService:
                     }
                     
                     # Reset payment state
-                    session['current_payee'] = None
-                    session['current_amount'] = None
-                    session['payment_mode'] = False
+                    session.current_payee = None
+                    session.current_amount = None
+                    session.payment_mode = False
                     
                     return response
                 else:
                     # Payment failed
-                    session['current_payee'] = None
-                    session['current_amount'] = None
-                    session['payment_mode'] = False
+                    session.current_payee = None
+                    session.current_amount = None
+                    session.payment_mode = False
                     return {
                         "response": f"❌ {result}",
                         "payment_mode": False,
@@ -517,31 +1250,43 @@ class BankingAssistantService:
                     }
             else:
                 # Cancel payment
-                session['current_payee'] = None
-                session['current_amount'] = None
-                session['payment_mode'] = False
+                session.current_payee = None
+                session.current_amount = None
+                session.payment_mode = False
                 return {
                     "response": "❌ Payment cancelled. What would you like to do instead?",
                     "payment_mode": False,
                     "next_step": None
                 }
 
-    def process_message(self, user_id, message):
-        """Process user message and return response"""
-        # Clean up old sessions periodically
-        if len(self.user_sessions) > 100:  # If too many sessions, clean up
-            self.cleanup_sessions()
+    def _deadline(self):
+        if LLM_LATENCY_BUDGET_MS <= 0:
+            return None
+        return time.monotonic() + LLM_LATENCY_BUDGET_MS / 1000.0
+
+    def process_message(self, user_id, message, intent=None):
+        """Process user message and return response (`intent` if the caller already classified it)"""
+        # Evict idle sessions (amortized, only touches sessions that are due)
+        self.cleanup_sessions()
+
+        # The session is read once and written back when the turn is done
+        with metrics.track_request(), self.user_sessions.checkout(user_id):
+            return self._process_message(user_id, message, intent)
 
+    def _process_message(self, user_id, message, intent=None):
+        deadline = self._deadline()
         session = self.get_user_session(user_id)
         
         # Check if we're in payment mode - but first check for exit commands
-        intent = self.ai.detect_intent(message)
+        if intent is None:
+            intent = self.ai.detect_intent(message)
+        metrics.set_intent(intent)
         
         # Allow these commands to break out of payment mode
-        if session['payment_mode'] and intent in ["CANCEL_PAYMENT", "GO_BACK", "HELP"]:
-            session['payment_mode'] = False
-            session['current_payee'] = None
-            session['current_amount'] = None
+        if session.payment_mode and intent in ["CANCEL_PAYMENT", "GO_BACK", "HELP"]:
+            session.payment_mode = False
+            session.current_payee = None
+            session.current_amount = None
             
             if intent == "CANCEL_PAYMENT":
                 return {
@@ -555,23 +1300,18 @@ class BankingAssistantService:
                 }
         
         # Check if we're in payment mode (after handling potential exits)
-        if session['payment_mode']:
-            return self.handle_payment_flow(user_id, message)
+        if session.payment_mode:
+            metrics.set_intent("PAYMENT_FLOW")
+            return self.handle_payment_flow(user_id, message, intent)
 
         # Handle normal intents
         try:
             if intent == "GREETING":
-                context = self.get_banking_context(user_id)
-                natural = self.ai.enhance_conversation(message, context)
-                return {
-                    "response": natural or "Hello! I can help with balances, transactions, payees, payments, and payment history. How can I assist you?",
-                    "intent": "GREETING",
-                    "payment_mode": False
-                }
+                ack = self.ai.submit_enhancement(message, lambda: self.get_banking_context(user_id), intent)
+                return self._greeting_response(self.ai.wait_for_enhancement(ack, deadline))
                 
             elif intent == "FAREWELL":
-                if user_id in self.user_sessions:
-                    del self.user_sessions[user_id]
+                self.user_sessions.pop(user_id)
                 return {
                     "response": "Goodbye! Have a great day!",
                     "intent": "FAREWELL",
@@ -586,116 +1326,29 @@ class BankingAssistantService:
                 }
                 
             elif intent == "CHECK_BALANCE":
+                # The acknowledgement doesn't need the figure, so run it alongside the fetches
+                ack = self.ai.submit_enhancement(message, "User is asking for their balance", intent)
                 account_id = self.bank.get_default_account_id()
                 if not account_id:
-                    return {
-                        "response": "I couldn't find any accounts.",
-                        "intent": "CHECK_BALANCE",
-                        "payment_mode": False
-                    }
+                    return self._no_account_response("CHECK_BALANCE")
                 
                 info = self.bank.get_balance(account_id)
-                balance = info.get('available', 'Unknown')
-                real_balance = info.get('real_available', balance)
-                
-                context = f"User's balance is {balance}"
-                natural = self.ai.enhance_conversation(message, context)
-                
-                if natural and "balance" not in natural.lower():
-                    response_text = f"{natural} Your available balance is ${balance:.2f}."
-                else:
-                    response_text = f"Your available balance is ${balance:.2f}."
-                
-                return {
-                    "response": response_text,
-                    "intent": "CHECK_BALANCE",
-                    "balance": balance,
-                    "real_balance": real_balance,
-                    "payment_mode": False
-                }
+                return self._balance_response(info, self.ai.wait_for_enhancement(ack, deadline))
                 
             elif intent == "VIEW_TRANSACTIONS":
                 account_id = self.bank.get_default_account_id()
                 if not account_id:
-                    return {
-                        "response": "I couldn't find any accounts.",
-                        "intent": "VIEW_TRANSACTIONS",
-                        "payment_mode": False
-                    }
+                    return self._no_account_response("VIEW_TRANSACTIONS")
                 
-                txs = self.bank.get_transactions(account_id, count=5)
-                if not txs:
-                    return {
-                        "response": "You have no recent transactions.",
-                        "intent": "VIEW_TRANSACTIONS",
-                        "payment_mode": False
-                    }
+                filters, label = self._transaction_query(message)
+                return self._transactions_response(self.bank.get_transactions(account_id, count=5, **filters), label)
                 
-                response = "Here are your recent transactions. "
-                transactions_list = []
-                for i, t in enumerate(txs[:5], 1):
-                    desc = t.get('description', 'Unknown transaction')
-                    amt = t.get('amount', '0')
-                    
-                    try:
-                        amt_float = float(amt)
-                        if amt_float < 0:
-                            amt_str = f"spent ${abs(amt_float):.2f}"
-                        else:
-                            amt_str = f"received ${amt_float:.2f}"
-                    except:
-                        amt_str = f"amount {amt}"
-                    
-                    response += f"Transaction {i}: {desc}, {amt_str}. "
-                    transactions_list.append({
-                        "description": desc,
-                        "amount": amt,
-                        "formatted_amount": amt_str
-                    })
-                
-                return {
-                    "response": response,
-                    "intent": "VIEW_TRANSACTIONS",
-                    "transactions": transactions_list,
-                    "payment_mode": False
-                }
-                
-            elif intent == "SPENDING_SUMMARY":
+            elif intent in self.SPENDING_INTENTS:
                 account_id = self.bank.get_default_account_id()
                 if not account_id:
-                    return {
-                        "response": "I couldn't access your account.",
-                        "intent": "SPENDING_SUMMARY",
-                        "payment_mode": False
-                    }
-                
-                txs = self.bank.get_transactions(account_id, count=10)
-                
-                total_spent = 0
-                num_expenses = 0
-                for t in txs:
-                    try:
-                        amt = float(t.get("amount", 0))
-                        if amt < 0:
-                            total_spent += abs(amt)
-                            num_expenses += 1
-                    except:
-                        continue
-                
-                if num_expenses == 0:
-                    return {
-                        "response": "You have no expenses in your recent transactions.",
-                        "intent": "SPENDING_SUMMARY",
-                        "payment_mode": False
-                    }
+                    return self._no_account_response(intent)
                 
-                return {
-                    "response": f"You have spent a total of ${total_spent:.2f} across {num_expenses} transactions in your recent history.",
-                    "intent": "SPENDING_SUMMARY",
-                    "total_spent": total_spent,
-                    "num_expenses": num_expenses,
-                    "payment_mode": False
-                }
+                return self._spending_response(intent, message, account_id)
                 
             elif intent == "VIEW_PAYEES":
                 payees = self.bank.get_payees()
@@ -721,11 +1374,11 @@ class BankingAssistantService:
                 }
                 
             elif intent == "MAKE_PAYMENT":
-                session['payment_mode'] = True
+                session.payment_mode = True
                 payees = self.bank.get_payees()
                 
                 if not payees:
-                    session['payment_mode'] = False
+                    session.payment_mode = False
                     return {
                         "response": "I couldn't find any payees in your transaction history. Please add payees manually.",
                         "intent": "MAKE_PAYMENT",
@@ -766,63 +1419,366 @@ class BankingAssistantService:
                 }
                 
             else:
-                context = self.get_banking_context(user_id)
-                natural = self.ai.enhance_conversation(message, context)
-                
-                if natural:
-                    return {
-                        "response": natural,
-                        "intent": "GENERAL_INQUIRY",
-                        "payment_mode": False
-                    }
-                else:
-                    return {
-                        "response": "I can help you check balances, view transactions, list payees, make payments, or show payment history. What would you like to do?",
-                        "intent": "GENERAL_INQUIRY",
-                        "payment_mode": False
-                    }
+                ack = self.ai.submit_enhancement(message, lambda: self.get_banking_context(user_id), intent)
+                return self._general_response(self.ai.wait_for_enhancement(ack, deadline))
                 
         except Exception as e:
-            print(f"⚠️ Error: {e}")
-            import traceback
-            traceback.print_exc()
+            return self._error_response(e)
+
+    # Intents whose Gemini acknowledgement is streamed token by token
+    STREAM_INTENTS = ("GREETING", "CHECK_BALANCE", "GENERAL_INQUIRY")
+
+    def process_message_stream(self, user_id, message):
+        """Yield (event, data) pairs for a chat turn as soon as each part is ready.
+
+        `banking` carries the deterministic answer (e.g. the balance) as soon
+        as it is computed, `token` carries acknowledgement text as Gemini
+        streams it, and `done` carries the same payload /api/chat returns.
+        """
+        payment_mode = self._payment_mode(user_id)
+        intent = self.ai.detect_intent(message)
+        if payment_mode or intent not in self.STREAM_INTENTS:
+            yield "done", self.process_message(user_id, message, intent)
+            return
+        yield from metrics.track_stream(self._stream_turn(user_id, message, intent), intent)
+
+    def _stream_turn(self, user_id, message, intent):
+        try:
+            if intent == "CHECK_BALANCE":
+                account_id = self.bank.get_default_account_id()
+                if not account_id:
+                    yield "done", self._no_account_response("CHECK_BALANCE")
+                    return
+
+                info = self.bank.get_balance(account_id)
+                banking = self._balance_response(info, None)
+                yield "banking", banking
+                context = "User is asking for their balance"
+            else:
+                banking = None
+                context = self.get_banking_context(user_id)
+        except Exception as e:
+            yield "done", self._error_response(e)
+            return
+
+        tokens = []
+        for token in self.ai.stream_conversation(message, context, intent):
+            tokens.append(token)
+            yield "token", {"text": token}
+        natural = "".join(tokens).strip() or None
+
+        if intent == "CHECK_BALANCE":
+            yield "done", self._balance_response(info, natural)
+        elif intent == "GREETING":
+            yield "done", self._greeting_response(natural)
+        else:
+            yield "done", self._general_response(natural)
+
+    # Intents the ASGI server answers natively on the event loop; the rest
+    # (payment flow, payees, history) run the sync path in a worker thread.
+    ASYNC_INTENTS = ("GREETING", "CHECK_BALANCE", "VIEW_TRANSACTIONS", "GENERAL_INQUIRY")
+
+    async def process_message_async(self, user_id, message):
+        """Async variant of process_message with concurrent upstream fan-out"""
+        deadline = self._deadline()
+        # Session stores may be SQLite, so their calls run in a worker thread
+        payment_mode = await asyncio.to_thread(self._payment_mode, user_id)
+        intent = self.ai.detect_intent(message)
+        if payment_mode or intent not in self.ASYNC_INTENTS:
+            return await asyncio.to_thread(self.process_message, user_id, message, intent)
+
+        await asyncio.to_thread(self.cleanup_sessions)
+
+        with metrics.track_request():
+            metrics.set_intent(intent)
+            return await self._process_message_async(user_id, message, intent, deadline)
+
+    async def _process_message_async(self, user_id, message, intent, deadline):
+        try:
+            if intent == "GREETING":
+                ack = self.ai.submit_enhancement_async(message, lambda: self.get_banking_context_async(user_id), intent)
+                return self._greeting_response(await self.ai.wait_for_enhancement_async(ack, deadline))
+
+            elif intent == "CHECK_BALANCE":
+                # The acknowledgement doesn't need the figure, so fetch both at once
+                ack = self.ai.submit_enhancement_async(message, "User is asking for their balance", intent)
+                account_id = await self.bank.get_default_account_id_async()
+                if not account_id:
+                    return self._no_account_response("CHECK_BALANCE")
+
+                info = await self.bank.get_balance_async(account_id)
+                return self._balance_response(info, await self.ai.wait_for_enhancement_async(ack, deadline))
+
+            elif intent == "VIEW_TRANSACTIONS":
+                account_id = await self.bank.get_default_account_id_async()
+                if not account_id:
+                    return self._no_account_response(intent)
+
+                filters, label = self._transaction_query(message)
+                return self._transactions_response(
+                    await self.bank.get_transactions_async(account_id, count=5, **filters), label
+                )
+
+            else:
+                ack = self.ai.submit_enhancement_async(message, lambda: self.get_banking_context_async(user_id), intent)
+                return self._general_response(await self.ai.wait_for_enhancement_async(ack, deadline))
+
+        except Exception as e:
+            return self._error_response(e)
+
+    # -----------------------------------------------------
+    # Response builders shared by the sync and async paths
+    # -----------------------------------------------------
+    def _no_account_response(self, intent):
+        return {
+            "response": "I couldn't access your account." if intent in self.SPENDING_INTENTS else "I couldn't find any accounts.",
+            "intent": intent,
+            "payment_mode": False
+        }
+
+    def _greeting_response(self, natural):
+        return {
+            "response": natural or "Hello! I can help with balances, transactions, payees, payments, and payment history. How can I assist you?",
+            "intent": "GREETING",
+            "payment_mode": False
+        }
+
+    def _general_response(self, natural):
+        return {
+            "response": natural or "I can help you check balances, view transactions, list payees, make payments, or show payment history. What would you like to do?",
+            "intent": "GENERAL_INQUIRY",
+            "payment_mode": False
+        }
+
+    def _balance_response(self, info, natural):
+        balance = info.get('available', 'Unknown')
+        real_balance = info.get('real_available', balance)
+        
+        if natural and "balance" not in natural.lower():
+            response_text = f"{natural} Your available balance is ${balance:.2f}."
+        else:
+            response_text = f"Your available balance is ${balance:.2f}."
+
+        # Say so when Teller couldn't give us a current figure
+        age = info.get('age_seconds') or 0
+        if age >= 60:
+            response_text += f" That's as of {_describe_age(age)} ago."
+        
+        return {
+            "response": response_text,
+            "intent": "CHECK_BALANCE",
+            "balance": balance,
+            "real_balance": real_balance,
+            "balance_age_seconds": info.get('age_seconds'),
+            "payment_mode": False
+        }
+
+    def _transaction_query(self, message):
+        """get_transactions filters for the merchant and period named in `message`, and how to describe them"""
+        start, end, period = parse_period(message)
+        merchant = parse_merchant(message)
+        label = []
+        if merchant:
+            label.append(f"at {merchant}")
+        if start is not None:
+            label.append(period)
+        return {"start": start, "end": end, "description": merchant}, " ".join(label)
+
+    def _transactions_response(self, txs, label=""):
+        if not txs:
             return {
-                "response": "Sorry, I'm having trouble accessing your banking information right now.",
-                "intent": "ERROR",
+                "response": f"You have no transactions {label}." if label else "You have no recent transactions.",
+                "intent": "VIEW_TRANSACTIONS",
                 "payment_mode": False
             }
+        
+        response = f"Here are your recent transactions {label}. " if label else "Here are your recent transactions. "
+        transactions_list = []
+        for i, t in enumerate(txs[:5], 1):
+            desc = t.get('description', 'Unknown transaction')
+            amt = t.get('amount', '0')
+            
+            try:
+                amt_float = float(amt)
+                if amt_float < 0:
+                    amt_str = f"spent ${abs(amt_float):.2f}"
+                else:
+                    amt_str = f"received ${amt_float:.2f}"
+            except:
+                amt_str = f"amount {amt}"
+            
+            response += f"Transaction {i}: {desc}, {amt_str}. "
+            transactions_list.append({
+                "description": desc,
+                "amount": amt,
+                "formatted_amount": amt_str
+            })
+        
+        return {
+            "response": response,
+            "intent": "VIEW_TRANSACTIONS",
+            "transactions": transactions_list,
+            "payment_mode": False
+        }
+
+    # Spending questions, all answered from the columnar analytics
+    SPENDING_INTENTS = ("SPENDING_SUMMARY", "SPENDING_BY_MERCHANT", "SPENDING_BY_CATEGORY", "SPENDING_TREND")
+
+    def _spending_response(self, intent, message, account_id):
+        start, end, period = parse_period(message)
+        merchant = parse_merchant(message) if intent == "SPENDING_SUMMARY" else None
+        summary = self.bank.get_spending(account_id, start, end, merchant=merchant, top=3)
+        total = summary["total_spent"]
+        count = summary["num_expenses"]
+        result = {
+            "intent": intent,
+            "total_spent": total,
+            "num_expenses": count,
+            "period": period,
+            "payment_mode": False
+        }
+
+        if count == 0:
+            where = f" at {merchant}" if merchant else ""
+            result["response"] = f"You have no expenses{where} {period}."
+            return result
+
+        if intent == "SPENDING_BY_MERCHANT":
+            top = ", ".join(f"{m['merchant']} (${m['amount']:.2f})" for m in summary["by_merchant"])
+            result["by_merchant"] = summary["by_merchant"]
+            result["response"] = f"Your top merchants {period}: {top}. Total spent: ${total:.2f}."
+        elif intent == "SPENDING_BY_CATEGORY":
+            top = ", ".join(f"{c['category']} ${c['amount']:.2f}" for c in summary["by_category"])
+            result["by_category"] = summary["by_category"]
+            result["response"] = f"Your biggest spending categories {period}: {top}. Total spent: ${total:.2f}."
+        elif intent == "SPENDING_TREND":
+            unit = parse_granularity(message)
+            key = {"day": "daily", "week": "weekly", "month": "monthly"}[unit]
+            buckets = summary[key]
+            # Periods in the range without spending count towards the average
+            average = total / max(summary["periods"][unit], 1)
+            peak = max(buckets, key=lambda b: b["amount"])
+            result[key] = buckets
+            result["response"] = (
+                f"You spent an average of ${average:.2f} per {unit} {period}. "
+                f"Your highest {unit} was {peak['period']} at ${peak['amount']:.2f}."
+            )
+        elif merchant:
+            names = ", ".join(summary["matched_merchants"])
+            result["merchant"] = merchant
+            result["response"] = f"You have spent ${total:.2f} at {names} across {count} transactions {period}."
+        else:
+            result["response"] = f"You have spent a total of ${total:.2f} across {count} transactions {period}."
+        return result
+
+    def _error_response(self, e):
+        logger.error("error handling message", exc_info=e)
+        return {
+            "response": "Sorry, I'm having trouble accessing your banking information right now.",
+            "intent": "ERROR",
+            "payment_mode": False
+        }
 
 
 # ---------------------------------------------------------
-# Flask API Server
+# Service construction (lazy) and warm-up
 # ---------------------------------------------------------
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+_assistant_service = None
+_assistant_service_lock = threading.Lock()
+_warm_up_thread = None
+_warm_up_lock = threading.Lock()
+
+
+def get_assistant_service():
+    """The process's BankingAssistantService, built on first use"""
+    global _assistant_service
+    if _assistant_service is None:
+        with _assistant_service_lock:
+            if _assistant_service is None:
+                _assistant_service = BankingAssistantService()
+    return _assistant_service
+
+
+def warm_up(connections=True):
+    """Build the services ahead of the first request.
+
+    With `connections`, also open the Teller pool (TLS handshake), fill
+    the accounts cache, sync the default account's transactions and create
+    the Gemini client. Then pre-warm the acknowledgement cache from
+    GEMINI_PREWARM_FILE if one is set. Failures are logged; the first
+    request then does the remaining work itself.
+    """
+    start = time.perf_counter()
+    service = get_assistant_service()
+    if connections:
+        try:
+            service.ai.gemini_model
+            account_id = service.bank.get_default_account_id()
+            if account_id:
+                service.bank.sync_transactions(account_id)
+        except Exception as e:
+            logger.warning("warm-up incomplete", extra={"error": str(e)})
+    if GEMINI_PREWARM_FILE:
+        service.ai.prewarm_from_file(GEMINI_PREWARM_FILE)
+    logger.info("warm-up finished", extra={"seconds": round(time.perf_counter() - start, 3)})
+
+
+def start_warm_up(connections=WARMUP):
+    """Run warm_up once per process in a background thread (None if there's nothing to do)"""
+    global _warm_up_thread
+    if not connections and not GEMINI_PREWARM_FILE:
+        return None
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=warm_up, args=(connections,), name="warm-up", daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
+
+
+def services_ready():
+    return _assistant_service is not None
 
-# Initialize the banking assistant service
-assistant_service = BankingAssistantService()
 
-@app.route('/')
+# ---------------------------------------------------------
+# Flask API Server
+# ---------------------------------------------------------
+api = Blueprint('api', __name__)
+
+@api.route('/')
 def home():
     return jsonify({
         "message": "Voice Banking Assistant API",
         "status": "running",
         "endpoints": {
             "/api/chat": "POST - Send text messages",
-            "/api/accounts": "GET - Get account information",
+            "/api/chat/stream": "POST - Send text messages, response streamed as Server-Sent Events",
+            "/api/chat/batch": "POST - Send {messages: [{user_id, message}, ...]}, answered in one response",
+            "/api/accounts": "GET - Get account information (?refresh=true bypasses the cache)",
             "/api/balance": "GET - Get account balance",
             "/api/transactions": "GET - Get recent transactions",
+            "/api/spending": "GET - Spending totals, breakdowns and daily/weekly/monthly buckets (?period=this month or ?start=&end=, ?merchant=, ?top=)",
             "/api/payees": "GET - Get payee list",
             "/api/payments": "GET - Get payment history",
-            "/api/health": "GET - Health check"
+            "/api/health": "GET - Health check",
+            "/api/metrics": "GET - Per-stage latency histograms and counters (Prometheus text format)"
         }
     })
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint (this worker process's counters)"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@api.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
+    return jsonify({
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        # Not built until the first request (or warm-up); a health probe shouldn't build them
+        "caches": get_assistant_service().cache_stats() if services_ready() else None
+    })
 
-@app.route('/api/chat', methods=['POST'])
+@api.route('/api/chat', methods=['POST'])
 def chat():
     """Main chat endpoint for processing user messages"""
     try:
@@ -837,84 +1793,218 @@ def chat():
         if not message:
             return jsonify({"error": "No message provided"}), 400
         
-        print(f"📨 Received message from {user_id}: {message}")
+        logger.info("message received", extra={"user_id": user_id, "text": message})
         
         # Process the message
-        response = assistant_service.process_message(user_id, message)
+        response = get_assistant_service().process_message(user_id, message)
         
-        print(f"📤 Sending response: {response['response'][:100]}...")
+        logger.info("response sent", extra={
+            "user_id": user_id, "intent": response.get('intent'), "text": response['response'][:100]
+        })
         
         return jsonify(response)
         
-    except Exception as e:
-        print(f"❌ Error in /api/chat: {e}")
+    except Exception:
+        logger.exception("error in /api/chat")
         return jsonify({
             "error": "Internal server error",
             "response": "Sorry, I encountered an error processing your request."
         }), 500
 
-@app.route('/api/accounts', methods=['GET'])
+@api.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Process a batch of user messages: in order per user, in parallel across users"""
+    try:
+        data = request.get_json(silent=True)
+        messages = data.get('messages') if isinstance(data, dict) else None
+
+        if not isinstance(messages, list) or not messages:
+            return jsonify({"error": "Expected a non-empty 'messages' list"}), 400
+        if len(messages) > CHAT_BATCH_MAX:
+            return jsonify({"error": f"At most {CHAT_BATCH_MAX} messages per batch"}), 400
+
+        logger.info("batch received", extra={"messages": len(messages)})
+        responses, upstream = get_assistant_service().process_batch(messages)
+        return jsonify({"responses": responses, "upstream": upstream})
+
+    except Exception:
+        logger.exception("error in /api/chat/batch")
+        return jsonify({"error": "Internal server error"}), 500
+
+@api.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Server-Sent Events variant of /api/chat for voice clients"""
+    data = request.get_json(silent=True)
+    
+    if not data:
+        return jsonify({"error": "No JSON data provided"}), 400
+    
+    user_id = data.get('user_id', 'default_user')
+    message = data.get('message', '').strip()
+    
+    if not message:
+        return jsonify({"error": "No message provided"}), 400
+
+    def events():
+        try:
+            for event, payload in get_assistant_service().process_message_stream(user_id, message):
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except Exception:
+            logger.exception("error in /api/chat/stream")
+            payload = {
+                "error": "Internal server error",
+                "response": "Sorry, I encountered an error processing your request."
+            }
+            yield f"event: error\ndata: {json.dumps(payload)}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api.route('/api/accounts', methods=['GET'])
 def get_accounts():
     """Get account information"""
     try:
-        accounts = assistant_service.bank.get_accounts()
-        return jsonify({"accounts": accounts})
+        refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+        accounts, age = get_assistant_service().bank.get_accounts_with_age(refresh=refresh)
+        return jsonify({"accounts": accounts, "age_seconds": round(age, 1)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/balance', methods=['GET'])
+@api.route('/api/balance', methods=['GET'])
 def get_balance():
     """Get account balance"""
     try:
+        bank = get_assistant_service().bank
         account_id = request.args.get('account_id')
         if not account_id:
-            account_id = assistant_service.bank.get_default_account_id()
+            account_id = bank.get_default_account_id()
         
         if not account_id:
             return jsonify({"error": "No account found"}), 404
         
-        balance_info = assistant_service.bank.get_balance(account_id)
+        balance_info = bank.get_balance(account_id)
         return jsonify({"balance": balance_info})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/transactions', methods=['GET'])
+@api.route('/api/transactions', methods=['GET'])
 def get_transactions():
-    """Get recent transactions"""
+    """Get recent transactions, optionally filtered by start/end/period and merchant"""
     try:
         account_id = request.args.get('account_id')
-        count = int(request.args.get('count', 5))
+        count = query_int(request.args, 'count', 5)
+        filters = transactions_query(request.args)
+        bank = get_assistant_service().bank
         
         if not account_id:
-            account_id = assistant_service.bank.get_default_account_id()
+            account_id = bank.get_default_account_id()
         
         if not account_id:
             return jsonify({"error": "No account found"}), 404
         
-        transactions = assistant_service.bank.get_transactions(account_id, count)
-        return jsonify({"transactions": transactions})
+        transactions = bank.get_transactions(account_id, count, **filters)
+        return jsonify({"transactions": transactions, "age_seconds": _rounded(bank.transactions_age(account_id))})
+    except InvalidQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@api.route('/api/spending', methods=['GET'])
+def get_spending():
+    """Get spending analytics over the full transaction history"""
+    try:
+        bank = get_assistant_service().bank
+        account_id = request.args.get('account_id') or bank.get_default_account_id()
+        if not account_id:
+            return jsonify({"error": "No account found"}), 404
+
+        spending = bank.get_spending(account_id, **spending_query(request.args))
+        return jsonify({"spending": spending})
+    except InvalidQueryError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/payees', methods=['GET'])
+def _rounded(age):
+    return None if age is None else round(age, 1)
+
+class InvalidQueryError(ValueError):
+    """A REST query parameter is malformed; the message names it and is safe to return"""
+
+
+PERIOD_NAMES = "today, yesterday, this/last week, this/last month, this/last year or last N days"
+
+def _query_date(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise InvalidQueryError(f"Expected '{name}' as a date (YYYY-MM-DD)") from None
+
+def query_int(args, name, default):
+    """A positive integer query parameter"""
+    value = args.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise InvalidQueryError(f"Expected '{name}' as a positive integer")
+    return number
+
+def _date_range(args):
+    """(start, end) from the start/end or period query parameters"""
+    if args.get('period'):
+        start, end, _ = parse_period(args['period'])
+        if start is None:
+            raise InvalidQueryError(f"Unknown 'period'; use {PERIOD_NAMES}")
+        return start, end
+    start, end = _query_date(args, 'start'), _query_date(args, 'end')
+    if start and end and start > end:
+        raise InvalidQueryError("Expected 'start' on or before 'end'")
+    return start, end
+
+def transactions_query(args):
+    """get_transactions filters from /api/transactions query parameters"""
+    start, end = _date_range(args)
+    return {"start": start, "end": end, "description": args.get('merchant')}
+
+def spending_query(args):
+    """get_spending keyword arguments from /api/spending query parameters"""
+    start, end = _date_range(args)
+    return {
+        "start": start,
+        "end": end,
+        "merchant": args.get('merchant'),
+        "top": query_int(args, 'top', 5)
+    }
+
+@api.route('/api/payees', methods=['GET'])
 def get_payees():
     """Get payee list"""
     try:
-        payees = assistant_service.bank.get_payees()
+        payees = get_assistant_service().bank.get_payees()
         return jsonify({"payees": payees})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/payments', methods=['GET'])
+@api.route('/api/payments', methods=['GET'])
 def get_payments():
     """Get payment history"""
     try:
-        payments = assistant_service.bank.get_payment_history()
+        payments = get_assistant_service().bank.get_payment_history()
         return jsonify({"payments": payments})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/direct-payment', methods=['POST'])
+@api.route('/api/direct-payment', methods=['POST'])
 def direct_payment():
     """Make a direct payment without chat flow"""
     try:
@@ -930,7 +2020,7 @@ def direct_payment():
         if not payee or not amount:
             return jsonify({"error": "Payee and amount are required"}), 400
         
-        success, result = assistant_service.bank.make_payment(payee, amount, account_id)
+        success, result = get_assistant_service().bank.make_payment(payee, amount, account_id)
         
         if success:
             return jsonify({
@@ -947,16 +2037,61 @@ def direct_payment():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@api.route('/api/direct-payment/bulk', methods=['POST'])
+def direct_payment_bulk():
+    """Make many direct payments against one balance check, in one ledger write"""
+    try:
+        data = request.get_json(silent=True)
+        payments = data.get('payments') if isinstance(data, dict) else None
+
+        if not isinstance(payments, list) or not payments:
+            return jsonify({"error": "Expected a non-empty 'payments' list"}), 400
+        if len(payments) > PAYMENT_BULK_MAX:
+            return jsonify({"error": f"At most {PAYMENT_BULK_MAX} payments per request"}), 400
+
+        results, summary = get_assistant_service().bank.make_payments(
+            payments, data.get('account_id'), atomic=bool(data.get('atomic'))
+        )
+        return jsonify({"success": summary["failed"] == 0, "results": results, **summary})
+
+    except BalanceUnavailableError as e:
+        return jsonify({"error": str(e)}), 503
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def create_app(warm=False):
+    """Flask app serving the API; `warm` starts warm_up in the background.
+
+    Cheap to call: the services behind it are built by the first request
+    (or the warm-up). For gunicorn: 'banking_assistant:create_app(warm=True)'.
+    """
+    app = Flask(__name__)
+    CORS(app)  # Enable CORS for all routes
+    app.register_blueprint(api)
+    if request_profiler.enabled:
+        app.wsgi_app = ProfilingMiddleware(app.wsgi_app, request_profiler)
+    if warm:
+        start_warm_up(connections=True)
+    return app
+
+
+# For `gunicorn banking_assistant:app` and the ASGI server
+app = create_app()
+
+
 def main():
     print("\n" + "="*60)
     print("🚀 VOICE BANKING ASSISTANT API STARTING")
     print("="*60)
     
     try:
-        # Test banking connection
-        accounts = assistant_service.bank.get_accounts()
-        print(f"✓ Connected to banking API. Found {len(accounts)} accounts.")
-        
+        # Serve right away; the Teller connection and caches are opened by the
+        # first request, or in the background with WARMUP=true
+        if start_warm_up():
+            print("✓ Warming up services in the background")
+
         # Start the Flask server
         print("✓ Starting Flask server on http://localhost:5000")
         app.run(host='0.0.0.0', port=5000, debug=False)
@@ -0,0 +1,99 @@
+"""
+Benchmark: the original amount extraction vs the compiled AmountParser.
+
+Scores both on the labelled replies in amount_cases.tsv (what a user says
+at the "how much?" step), then times them on a large corpus built from the
+same replies.
+
+    python benchmarks/bench_amount_parser.py --utterances 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from amount_parser import AmountParser  # noqa: E402
+
+CASES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "amount_cases.tsv")
+
+
+def load_cases(path=CASES_FILE):
+    cases = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            text, _, expected = line.rstrip("\n").partition("\t")
+            cases.append((text, float(expected) if expected else None))
+    return cases
+
+
+def legacy_parse(text):
+    """The original amount step of handle_payment_flow, kept verbatim for comparison"""
+    try:
+        words = text.replace('$', ' $').replace('rs', ' $').replace('rupees', ' $').replace('₹', ' $').split()
+        amount_found = None
+
+        for i, word in enumerate(words):
+            clean_word = word.replace('$', '').replace(',', '').replace('₹', '').strip()
+
+            number_words = {
+                'hundred': 100, 'thousand': 1000, 'lakh': 100000,
+                'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+                'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+                'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50,
+                'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90
+            }
+
+            if clean_word in number_words:
+                amount_found = number_words[clean_word]
+            elif clean_word.replace('.', '').isdigit():
+                amount_found = float(clean_word)
+                break
+        return amount_found or None
+    except ValueError:
+        return None
+
+
+def score(parse, cases, show_errors=False):
+    correct = 0
+    for text, expected in cases:
+        got = parse(text)
+        if got == expected or (got is not None and expected is not None and abs(got - expected) < 0.005):
+            correct += 1
+        elif show_errors:
+            print(f"    {text!r}: got {got}, expected {expected}")
+    return correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--utterances", type=int, default=200000)
+    parser.add_argument("--errors", action="store_true", help="list every miss")
+    args = parser.parse_args()
+
+    cases = load_cases()
+    amounts = AmountParser()
+    print(f"{len(cases)} labelled replies")
+    legacy_correct = score(legacy_parse, cases, args.errors)
+    print(f"{'legacy word scan':<30} {legacy_correct:3d}/{len(cases)} correct")
+    parser_correct = score(amounts.parse, cases, args.errors)
+    print(f"{'AmountParser':<30} {parser_correct:3d}/{len(cases)} correct\n")
+
+    rng = random.Random(5)
+    corpus = [rng.choice(cases)[0] for _ in range(args.utterances)]
+    for label, parse in (("legacy word scan", legacy_parse), ("AmountParser", amounts.parse)):
+        start = time.perf_counter()
+        for text in corpus:
+            parse(text)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<30} {len(corpus) / elapsed:12.0f} utterances/s")
+
+    sys.exit(0 if parser_correct == len(cases) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: single-flight coalescing of identical concurrent Teller reads.
+
+Fires bursts of concurrent reads for one account, as after a push
+notification or when the dashboard and chat load together, against the
+mTLS Teller stub. Caches are configured to be stale at once, so every
+burst has to go upstream. Compares each caller fetching on its own (the
+old behaviour) with BankingService's coalesced reads, for threads and for
+asyncio, and reports Teller requests per burst and caller latency.
+
+    python benchmarks/bench_coalescing.py --callers 32 --bursts 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from teller_stub import TellerStub  # noqa: E402
+
+
+def thread_burst(callers, fn):
+    """Run fn() in `callers` threads released together; returns per-call latencies"""
+    barrier = threading.Barrier(callers)
+    latencies = []
+    lock = threading.Lock()
+
+    def run():
+        barrier.wait()
+        start = time.perf_counter()
+        fn()
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=run) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+async def async_burst(callers, fn):
+    async def run():
+        start = time.perf_counter()
+        await fn()
+        return time.perf_counter() - start
+    return await asyncio.gather(*(run() for _ in range(callers)))
+
+
+def report(label, requests, bursts, latencies):
+    latencies = sorted(latencies)
+    print(f"{label:<34} {requests / bursts:9.1f} {statistics.median(latencies) * 1000:9.1f} "
+          f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--callers", type=int, default=32, help="concurrent identical reads per burst")
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per Teller request")
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="bench-coalescing-"))
+    with TellerStub(latency=args.latency) as stub:
+        os.environ.update(stub.env())
+        # Every read is past its freshness and outside the revalidate window, so it goes upstream
+        os.environ.update({"BALANCE_CACHE_TTL": "0", "TRANSACTION_SYNC_INTERVAL": "0",
+                           "TELLER_STALE_WHILE_REVALIDATE": "0", "LOG_LEVEL": "WARNING",
+                           "TELLER_MAX_CONNECTIONS": str(args.callers), "TELLER_MAX_KEEPALIVE": str(args.callers)})
+        import banking_assistant as ba
+        import metrics
+
+        bank = ba.BankingService()
+        account_id = bank.get_default_account_id()
+        bank.get_transactions(account_id)  # backfill once, so bursts sync incrementally
+
+        print(f"{args.bursts} bursts of {args.callers} concurrent reads, Teller latency {args.latency * 1000:.0f} ms\n")
+        print(f"{'':<34} {'req/burst':>9} {'p50 ms':>9} {'p95 ms':>9}")
+
+        def per_caller_sync():
+            bank.transaction_store.sync(
+                account_id, lambda count, from_id: bank.get_transactions_page(account_id, count, from_id)
+            )
+
+        threaded = [
+            ("balance, per-caller fetch", lambda: bank._fetch_balance(account_id)),
+            ("balance, coalesced", lambda: bank.get_balance(account_id)),
+            ("transactions, per-caller sync", per_caller_sync),
+            ("transactions, coalesced", lambda: bank.get_transactions(account_id)),
+        ]
+        for label, fn in threaded:
+            stub.reset_counters()
+            latencies = [t for _ in range(args.bursts) for t in thread_burst(args.callers, fn)]
+            report(label, stub.requests, args.bursts, latencies)
+
+        async def run_async():
+            for label, fn in (("balance async, per-caller fetch", lambda: bank._fetch_balance_async(account_id)),
+                              ("balance async, coalesced", lambda: bank.get_balance_async(account_id))):
+                stub.reset_counters()
+                latencies = []
+                for _ in range(args.bursts):
+                    latencies.extend(await async_burst(args.callers, fn))
+                report(label, stub.requests, args.bursts, latencies)
+            await bank.aclose()
+
+        asyncio.run(run_async())
+
+        print("\n" + "\n".join(line for line in metrics.render().splitlines()
+                               if line.startswith("banking_upstream_coalesced_total")))
+        bank.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark: cold start of the backend, from process spawn to first 200.
+
+Each run starts a fresh interpreter (against the mTLS Teller stub) that
+imports the Flask or ASGI app and starts serving, then requests each of
+`--paths` once. Reports, as medians over the runs: interpreter startup,
+app import time, time to listening, the latency of each first request and
+the total from spawn to the first 200. With --warm-up the server starts
+with WARMUP=true; --idle gives the warm-up that long before the first
+request, as a load balancer's first health check would.
+
+    python benchmarks/bench_cold_start.py --runs 5
+    python benchmarks/bench_cold_start.py --server asgi --warm-up --idle 1
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from teller_stub import TellerStub  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the fresh interpreter; prints one JSON line once it is serving
+CHILD = r"""
+import json, os, sys, threading, time
+start = time.time()
+sys.path.insert(0, os.environ["BENCH_BACKEND_DIR"])
+server_kind = os.environ["BENCH_SERVER"]
+
+if server_kind == "asgi":
+    import asgi
+    imported = time.time()
+    import socket
+    import uvicorn
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    server = uvicorn.Server(uvicorn.Config(asgi.app, log_level="warning", access_log=False))
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.001)
+    port = sock.getsockname()[1]
+else:
+    import banking_assistant
+    imported = time.time()
+    import logging
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    if os.environ.get("WARMUP") == "true":
+        banking_assistant.start_warm_up()  # as main() does
+    server = make_server("127.0.0.1", 0, banking_assistant.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.port
+
+print(json.dumps({"start": start, "imported": imported, "listening": time.time(), "port": port}), flush=True)
+threading.Event().wait()
+"""
+
+
+def cold_start(args, env, paths):
+    """Timings (seconds) of one cold start"""
+    workdir = tempfile.mkdtemp(prefix="cold-start-")
+    spawned = time.time()
+    child = subprocess.Popen([sys.executable, "-c", CHILD], cwd=workdir, env=env,
+                             stdout=subprocess.PIPE, text=True)
+    try:
+        ready = json.loads(child.stdout.readline())
+        if args.idle:
+            time.sleep(args.idle)
+        timings = {
+            "interpreter": ready["start"] - spawned,
+            "import": ready["imported"] - ready["start"],
+            "listening": ready["listening"] - spawned,
+        }
+        with httpx.Client(base_url=f"http://127.0.0.1:{ready['port']}", timeout=30.0) as client:
+            first_ok = None
+            for path in paths:
+                start = time.time()
+                res = client.get(path)
+                if res.status_code != 200:
+                    raise RuntimeError(f"GET {path} returned {res.status_code}: {res.text[:200]}")
+                timings[f"first {path}"] = time.time() - start
+                first_ok = first_ok or time.time()
+        # Includes --idle
+        timings["spawn to first 200"] = first_ok - spawned
+        return timings
+    finally:
+        child.terminate()
+        child.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--server", choices=("flask", "asgi"), default="flask")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--paths", default="/api/health,/api/balance",
+                        help="comma-separated GETs to time, in order")
+    parser.add_argument("--warm-up", action="store_true", help="start the server with WARMUP=true")
+    parser.add_argument("--idle", type=float, default=0.0, help="seconds between listening and the first request")
+    parser.add_argument("--teller-latency", type=float, default=0.02, help="seconds per Teller request")
+    args = parser.parse_args()
+    paths = [p.strip() for p in args.paths.split(",") if p.strip()]
+
+    with TellerStub(latency=args.teller_latency) as stub:
+        env = {
+            **os.environ, **stub.env(),
+            "BENCH_BACKEND_DIR": BACKEND_DIR,
+            "BENCH_SERVER": args.server,
+            # A key, so the Gemini client is set up the way production's is (lazily)
+            "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "stub"),
+            "LOG_LEVEL": "WARNING",
+            "WARMUP": "true" if args.warm_up else "false",
+        }
+        runs = [cold_start(args, env, paths) for _ in range(args.runs)]
+
+    print(f"{args.server} server, {args.runs} cold starts, warm-up {'on' if args.warm_up else 'off'}, "
+          f"idle {args.idle:.1f} s, Teller {args.teller_latency * 1000:.0f} ms\n")
+    print(f"{'phase':<28} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for phase in runs[0]:
+        values = [run[phase] * 1000 for run in runs]
+        print(f"{phase:<28} {statistics.median(values):10.1f} {min(values):8.1f} {max(values):8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark: original any()-chain intent detection vs the compiled classifier.
+
+Builds a large utterance corpus from voice-style templates, checks that the
+compiled classifier, built from the original rule table, agrees with the
+original on every utterance, and reports throughput for single calls and
+the batch API.
+
+    python benchmarks/bench_intent_classifier.py --utterances 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_classifier import IntentClassifier  # noqa: E402
+
+TEMPLATES = [
+    "what's my balance", "how much money do I have", "show my recent transactions",
+    "hello there", "hi", "good morning assistant", "how much have I spent this week",
+    "list my payees", "who i pay most often", "pay john smith fifty dollars",
+    "send money to sarah", "transfer two hundred to comcast", "cancel that",
+    "stop the payment", "nevermind", "go back to the main menu", "start over please",
+    "what can you do", "help me", "show my payment history", "my payments please",
+    "bye", "goodbye for now", "quit", "can you tell me a joke", "is the bank open on sunday",
+    "I want to make payment to netflix", "yes confirm", "two hundred fifty", "amazon",
+    "what are my options", "something else", "show me merchants", "exit",
+]
+
+
+# The rule table legacy_detect_intent encodes (INTENT_RULES has grown since)
+LEGACY_RULES = (
+    ("CANCEL_PAYMENT", ("cancel", "stop", "nevermind", "not now", "exit payment", "don't pay")),
+    ("GO_BACK", ("go back", "main menu", "start over", "different", "something else")),
+    ("HELP", ("what can you do", "options", "menu")),
+    ("GREETING", ("hello", "hi", "hey", "good morning")),
+    ("CHECK_BALANCE", ("balance", "how much", "money")),
+    ("VIEW_TRANSACTIONS", ("transaction", "history", "payments", "recent")),
+    ("SPENDING_SUMMARY", ("spent", "spending")),
+    ("VIEW_PAYEES", ("payee", "payees", "who i pay", "merchants", "user list", "pay list", "list of payees")),
+    ("MAKE_PAYMENT", ("pay", "send money", "transfer", "make payment")),
+    ("PAYMENT_HISTORY", ("payment history", "my payments", "recent payments")),
+    ("HELP", ("help",)),
+    ("FAREWELL", ("bye", "goodbye", "exit", "quit")),
+)
+
+
+def legacy_detect_intent(text):
+    """The original AIService.detect_intent, kept verbatim for comparison"""
+    if not text:
+        return "UNKNOWN"
+    text = text.lower()
+
+    if any(w in text for w in ["cancel", "stop", "nevermind", "not now", "exit payment", "don't pay"]):
+        return "CANCEL_PAYMENT"
+    if any(w in text for w in ["go back", "main menu", "start over", "different", "something else"]):
+        return "GO_BACK"
+    if any(w in text for w in ["what can you do", "options", "menu"]):
+        return "HELP"
+    if any(w in text for w in ["hello", "hi", "hey", "good morning"]):
+        return "GREETING"
+    if any(w in text for w in ["balance", "how much", "money"]):
+        return "CHECK_BALANCE"
+    if any(w in text for w in ["transaction", "history", "payments", "recent"]):
+        return "VIEW_TRANSACTIONS"
+    if any(w in text for w in ["spent", "spending"]):
+        return "SPENDING_SUMMARY"
+    if any(w in text for w in ["payee", "payees", "who i pay", "merchants", "user list", "pay list", "list of payees"]):
+        return "VIEW_PAYEES"
+    if any(w in text for w in ["pay", "send money", "transfer", "make payment"]):
+        return "MAKE_PAYMENT"
+    if any(w in text for w in ["payment history", "my payments", "recent payments"]):
+        return "PAYMENT_HISTORY"
+    if "help" in text:
+        return "HELP"
+    if any(w in text for w in ["bye", "goodbye", "exit", "quit"]):
+        return "FAREWELL"
+    return "GENERAL_INQUIRY"
+
+
+def build_corpus(n, seed=7):
+    rng = random.Random(seed)
+    fillers = ["", "please", "um", "okay so", "could you", "right now", "for me", "thanks"]
+    corpus = []
+    for _ in range(n):
+        words = [rng.choice(fillers), rng.choice(TEMPLATES), rng.choice(fillers)]
+        text = " ".join(w for w in words if w)
+        corpus.append(text.upper() if rng.random() < 0.1 else text)
+    corpus.extend(["", "HELLO", "payment history", "the recent payments"])
+    return corpus
+
+
+def timed(label, fn, n):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms   {n / elapsed / 1000:8.1f} k utterances/s")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--utterances", type=int, default=200000)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.utterances)
+    classifier = IntentClassifier(LEGACY_RULES)
+    n = len(corpus)
+
+    legacy, t_legacy = timed("legacy any() chain", lambda: [legacy_detect_intent(t) for t in corpus], n)
+    single, t_single = timed("compiled classify()", lambda: [classifier.classify(t) for t in corpus], n)
+    batch, t_batch = timed("compiled classify_many()", lambda: classifier.classify_many(corpus), n)
+
+    mismatches = [(t, a, b) for t, a, b in zip(corpus, legacy, single) if a != b]
+    mismatches += [(t, a, b) for t, a, b in zip(corpus, legacy, batch) if a != b]
+    print(f"\nspeedup: {t_legacy / t_single:.2f}x single, {t_legacy / t_batch:.2f}x batch")
+    print(f"mismatches vs legacy: {len(mismatches)}")
+    for text, want, got in mismatches[:10]:
+        print(f"  {text!r}: legacy={want} compiled={got}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark: first-substring-hit payee lookup vs the trigram PayeeMatcher.
+
+Scores both against an accuracy corpus of transcribed payment requests
+(payee_corpus.tsv, including ASR misspellings and requests that name no
+payee), then times lookups as the payee list grows to thousands of names.
+
+    python benchmarks/bench_payee_matcher.py --payees 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from payee_matcher import PayeeMatcher  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "payee_corpus.tsv")
+THRESHOLD = 0.6
+
+PAYEES = [
+    "AMAZON MKTPLACE", "Apple Services", "Anjali Mehta", "Bright Horizons Daycare", "Chase Credit Card",
+    "City Water Dept", "Comcast Cable", "DoorDash", "Dr. Priya Raman", "Electric Company",
+    "Google Storage", "John Smith", "Jonathan Smithers", "Kevin O'Brien", "Lakeside Apartments",
+    "Lyft Ride", "Maria Garcia", "Mario Garza", "Michael Brown", "Michelle Browne", "NETFLIX.COM",
+    "Rahul Sharma", "Rohit Verma", "STARBUCKS STORE", "Sara Jones", "Sarah Johnson", "Shell Oil",
+    "Spotify USA", "State Farm Insurance", "T-Mobile", "Target Store", "UBER TRIP",
+    "Verizon Wireless", "Whole Foods Market",
+]
+
+FIRST = ["James", "Mary", "Robert", "Patricia", "Linda", "David", "Barbara", "Richard", "Susan", "Joseph",
+         "Thomas", "Karen", "Daniel", "Nancy", "Matthew", "Lisa", "Anthony", "Betty", "Mark", "Sandra",
+         "Arjun", "Deepa", "Vikram", "Sneha", "Wei", "Mei", "Hiroshi", "Yuki", "Omar", "Fatima"]
+LAST = ["Williams", "Jones", "Miller", "Davis", "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez",
+        "Wilson", "Anderson", "Taylor", "Moore", "Jackson", "Martin", "Lee", "Perez", "Thompson", "White",
+        "Patel", "Iyer", "Reddy", "Nair", "Chen", "Wang", "Tanaka", "Sato", "Hassan", "Khan", "Ali"]
+BUSINESS = ["Plumbing", "Dental", "Auto Repair", "Bakery", "Cleaners", "Pharmacy", "Fitness", "Tutoring",
+            "Landscaping", "Pet Care", "Salon", "Hardware", "Books", "Pizza", "Florist"]
+
+
+def legacy_match(payees, text):
+    """The original handle_payment_flow lookup, kept verbatim for comparison"""
+    text_lower = text.lower()
+    for payee in payees:
+        payee_lower = payee.lower()
+        if any(word in text_lower for word in payee_lower.split() if len(word) > 2):
+            return payee
+    return None
+
+
+def load_corpus():
+    cases = []
+    with open(CORPUS, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            utterance, _, expected = line.rstrip("\n").partition("\t")
+            cases.append((utterance, expected or None))
+    return cases
+
+
+def matcher_pick(matcher, text):
+    candidates = matcher.match(text)
+    if candidates and candidates[0]["score"] >= THRESHOLD:
+        return candidates[0]["payee"]
+    return None
+
+
+def accuracy(label, pick, cases, show_errors):
+    errors = [(text, want, got) for text, want in cases for got in [pick(text)] if got != want]
+    correct = len(cases) - len(errors)
+    print(f"{label:<32} {correct:3d}/{len(cases)} correct ({correct / len(cases):.0%})")
+    if show_errors:
+        for text, want, got in errors:
+            print(f"    {text!r}: expected {want}, got {got}")
+    return correct
+
+
+def synthetic_payees(n, seed=5):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        if rng.random() < 0.7:
+            names.add(f"{rng.choice(FIRST)} {rng.choice(LAST)}{rng.choice(['', ' Jr', ' II'])}".strip())
+        else:
+            names.add(f"{rng.choice(LAST)} {rng.choice(BUSINESS)} {rng.randint(1, 999)}")
+    return sorted(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--payees", type=int, default=5000)
+    parser.add_argument("--errors", action="store_true", help="list every miss")
+    args = parser.parse_args()
+
+    cases = load_corpus()
+    payees = sorted(PAYEES)
+    matcher = PayeeMatcher(payees)
+    print(f"accuracy on {len(cases)} requests, {len(payees)} payees")
+    legacy_correct = accuracy("legacy substring scan", lambda t: legacy_match(payees, t), cases, args.errors)
+    matcher_correct = accuracy("PayeeMatcher", lambda t: matcher_pick(matcher, t), cases, args.errors)
+
+    crowd = sorted(set(payees) | set(synthetic_payees(args.payees)))
+    start = time.perf_counter()
+    big = PayeeMatcher(crowd)
+    build = time.perf_counter() - start
+    print(f"\nwith {len(crowd)} payees (index built in {build * 1000:.1f} ms)")
+    accuracy("legacy substring scan", lambda t: legacy_match(crowd, t), cases, False)
+    accuracy("PayeeMatcher", lambda t: matcher_pick(big, t), cases, False)
+
+    texts = [text for text, _ in cases] * 20
+    for label, pick in (("legacy substring scan", lambda t: legacy_match(crowd, t)),
+                        ("PayeeMatcher", lambda t: matcher_pick(big, t))):
+        start = time.perf_counter()
+        for text in texts:
+            pick(text)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<32} {elapsed / len(texts) * 1e6:9.1f} us/lookup")
+
+    sys.exit(0 if matcher_correct > legacy_correct else 1)
+
+
+if __name__ == "__main__":
+    main()
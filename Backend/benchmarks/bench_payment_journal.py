@@ -0,0 +1,119 @@
+"""
+Benchmark: whole-file JSON rewrite vs the append-only payment journal.
+
+Reports the per-payment write cost at growing history sizes. The legacy
+strategy (re-serialize the full list with indent=2 on every payment) is
+only run up to --legacy-records because its cost grows with history. For
+the journal it also reports the tail of single-append latency, which is
+where a compaction that blocked payers would show up.
+
+    python benchmarks/bench_payment_journal.py --records 120000
+    python benchmarks/bench_payment_journal.py --fsync --threads 8 --records 20000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from payment_journal import PaymentJournal  # noqa: E402
+
+
+def make_record(i):
+    return {
+        'id': f"sim_pay_{i}",
+        'payee': "John Smith",
+        'amount': 12.5,
+        'date': datetime.now().isoformat(),
+        'status': 'completed',
+        'account_id': "acc_bench",
+        'description': "Payment to John Smith",
+    }
+
+
+def bench_legacy(directory, records, window):
+    path = os.path.join(directory, "legacy.json")
+    payments = []
+    start = time.perf_counter()
+    for i in range(1, records + 1):
+        payments.append(make_record(i))
+        with open(path, 'w') as f:
+            json.dump(payments, f, indent=2)
+        if i % window == 0:
+            elapsed = time.perf_counter() - start
+            print(f"  legacy   history={i:>7}  {elapsed / window * 1e6:10.1f} us/payment")
+            start = time.perf_counter()
+
+
+def bench_journal(directory, records, window, fsync, threads, snapshot_every):
+    journal = PaymentJournal(os.path.join(directory, "payments.json"),
+                             fsync=fsync, snapshot_every=snapshot_every)
+    journal.load()
+    counter = iter(range(1, records + 1))
+    lock = threading.Lock()
+    done = [0]
+    window_start = [time.perf_counter()]
+    latencies = []
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            journal.append(make_record(i))
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                done[0] += 1
+                if done[0] % window == 0:
+                    now = time.perf_counter()
+                    print(f"  journal  history={done[0]:>7}  "
+                          f"{(now - window_start[0]) / window * 1e6:10.1f} us/payment")
+                    window_start[0] = now
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    journal.close()
+
+    latencies.sort()
+    print(f"  append latency  p50 {latencies[len(latencies) // 2] * 1e6:.1f} us  "
+          f"p99.9 {latencies[int(len(latencies) * 0.999) - 1] * 1e6:.1f} us  "
+          f"max {latencies[-1] * 1000:.2f} ms  ({records // snapshot_every} compactions)")
+
+    start = time.perf_counter()
+    replayed = PaymentJournal(os.path.join(directory, "payments.json")).load()
+    print(f"  replay of {len(replayed)} records: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=120000)
+    parser.add_argument("--legacy-records", type=int, default=3000)
+    parser.add_argument("--window", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--fsync", action="store_true", help="fsync each group commit")
+    parser.add_argument("--snapshot-every", type=int, default=50000)
+    args = parser.parse_args()
+    window = args.window or max(args.records // 10, 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.legacy_records:
+            print(f"legacy whole-file rewrite ({args.legacy_records} payments)")
+            bench_legacy(directory, args.legacy_records, max(args.legacy_records // 5, 1))
+        print(f"\njournal ({args.records} payments, {args.threads} thread(s), "
+              f"fsync={'on' if args.fsync else 'off'}, snapshot every {args.snapshot_every})")
+        bench_journal(directory, args.records, window, args.fsync, args.threads, args.snapshot_every)
+
+
+if __name__ == "__main__":
+    main()
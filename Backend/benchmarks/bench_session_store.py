@@ -0,0 +1,115 @@
+"""
+Benchmark: dict-of-dicts sessions with full-scan cleanup vs SessionStore.
+
+Measures memory for N concurrent sessions and the per-request cost of the
+cleanup step (the old code scanned every session on each request once more
+than 100 existed).
+
+    python benchmarks/bench_session_store.py --sessions 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import SessionStore  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def legacy_get(sessions, user_id, now):
+    if user_id not in sessions:
+        sessions[user_id] = {
+            'payment_mode': False,
+            'current_payee': None,
+            'current_amount': None,
+            'last_active': now
+        }
+    return sessions[user_id]
+
+
+def legacy_cleanup(sessions, now):
+    expired = [uid for uid, s in sessions.items() if now - s['last_active'] > 3600]
+    for uid in expired:
+        del sessions[uid]
+
+
+def measure_memory(label, build):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    store = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    print(f"{label:<28} {size / 1024 / 1024:8.2f} MiB")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    n = args.sessions
+    user_ids = [f"user_{i}" for i in range(n)]
+
+    print(f"memory for {n} sessions")
+    clock = FakeClock()
+
+    def build_legacy():
+        sessions = {}
+        for uid in user_ids:
+            legacy_get(sessions, uid, clock.now)
+        return sessions
+
+    def build_store():
+        store = SessionStore(ttl=3600, clock=clock)
+        for uid in user_ids:
+            store.get(uid)
+        return store
+
+    legacy = measure_memory("dict of dicts", build_legacy)
+    store = measure_memory("SessionStore (__slots__)", build_store)
+
+    print(f"\nper-request cleanup + lookup with {n} live sessions ({args.requests} requests)")
+    rng = random.Random(1)
+    picks = [rng.choice(user_ids) for _ in range(args.requests)]
+
+    start = time.perf_counter()
+    for uid in picks:
+        clock.now += 0.01
+        legacy_cleanup(legacy, clock.now)
+        legacy_get(legacy, uid, clock.now)
+    elapsed = time.perf_counter() - start
+    print(f"{'legacy full scan':<28} {elapsed / args.requests * 1e6:10.1f} us/request")
+
+    clock.now = 1_000_000.0
+    start = time.perf_counter()
+    for uid in picks:
+        clock.now += 0.01
+        store.evict_expired()
+        store.get(uid)
+    elapsed = time.perf_counter() - start
+    print(f"{'SessionStore heap expiry':<28} {elapsed / args.requests * 1e6:10.1f} us/request")
+
+    # Let every session expire and time the eviction wave
+    clock.now += 7200
+    start = time.perf_counter()
+    evicted = store.evict_expired()
+    elapsed = time.perf_counter() - start
+    print(f"\nevicting {evicted} expired sessions: {elapsed * 1000:.1f} ms "
+          f"({elapsed / max(evicted, 1) * 1e6:.2f} us/session), {len(store)} left")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark: per-row Python loop vs columnar NumPy spending analytics.
+
+Generates a synthetic multi-year history, then computes the same report
+(total, per-merchant and per-category breakdowns, daily/weekly/monthly
+buckets) with a plain Python loop over transaction dicts and with
+SpendingAnalytics, checks the two agree, and reports timings. With
+--store the history is also round-tripped through the SQLite
+TransactionStore to time a cold load.
+
+    python benchmarks/bench_spending_analytics.py --transactions 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spending_analytics import SpendingAnalytics  # noqa: E402
+
+MERCHANTS = [
+    ("AMAZON MKTPLACE", "shopping"), ("STARBUCKS STORE", "dining"), ("UBER TRIP", "transportation"),
+    ("NETFLIX.COM", "entertainment"), ("Whole Foods Market", "groceries"), ("Target Store", "shopping"),
+    ("Comcast Cable", "utilities"), ("Electric Company", "utilities"), ("Shell Oil", "fuel"),
+    ("Delta Air Lines", "travel"), ("CVS Pharmacy", "health"), ("Chipotle", "dining"),
+]
+
+
+def build_history(n, seed=3):
+    rng = random.Random(seed)
+    today = date.today()
+    merchants = MERCHANTS + [(f"Local Shop {i}", "general") for i in range(500)]
+    rows = []
+    for i in range(n):
+        name, category = rng.choice(merchants)
+        amount = -round(rng.uniform(1, 250), 2)
+        if rng.random() < 0.05:
+            name, category, amount = "PAYROLL DEPOSIT", "income", round(rng.uniform(1000, 3000), 2)
+        rows.append({
+            "id": f"txn_{i:08d}",
+            "date": (today - timedelta(days=(n - i) * 3650 // n)).isoformat(),
+            "description": name,
+            "amount": f"{amount:.2f}",
+            "details": {"category": category},
+        })
+    return rows
+
+
+def python_report(rows, start, end):
+    """The straightforward approach: one dict update per row and report"""
+    total = 0.0
+    count = 0
+    by_merchant, by_category, daily, weekly, monthly = {}, {}, {}, {}, {}
+    for t in rows:
+        d = t["date"]
+        if d < start or d > end:
+            continue
+        amount = float(t["amount"])
+        if amount >= 0:
+            continue
+        spent = -amount
+        total += spent
+        count += 1
+        day = date.fromisoformat(d)
+        week = (day - timedelta(days=day.weekday())).isoformat()
+        for bucket, key in ((by_merchant, t["description"]), (by_category, t["details"]["category"]),
+                            (daily, d), (weekly, week), (monthly, d[:7])):
+            bucket[key] = bucket.get(key, 0.0) + spent
+    return total, count, by_merchant, by_category, daily, weekly, monthly
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed * 1000:10.1f} ms")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--store", action="store_true", help="also time a load through the SQLite TransactionStore")
+    args = parser.parse_args()
+
+    rows = build_history(args.transactions)
+    start, end = rows[0]["date"], rows[-1]["date"]
+    year_start = (date.today() - timedelta(days=365)).isoformat()
+    print(f"{len(rows)} transactions from {start} to {end}\n")
+
+    columns = (
+        [t["date"] for t in rows], [t["description"] for t in rows],
+        [float(t["amount"]) for t in rows], [t["details"]["category"] for t in rows],
+    )
+    analytics, _ = timed("build SpendingAnalytics", lambda: SpendingAnalytics.from_columns(*columns))
+
+    failed = False
+    for label, lo in (("full history", start), ("last 365 days", year_start)):
+        print(f"\n{label}")
+        expected, t_python = timed("python loop", lambda: python_report(rows, lo, end))
+        summary, t_numpy = timed("SpendingAnalytics.summary", lambda: analytics.summary(lo, end, top=0))
+        print(f"speedup: {t_python / t_numpy:.1f}x")
+
+        total, count, by_merchant, by_category, daily, weekly, monthly = expected
+        checks = [
+            abs(summary["total_spent"] - round(total, 2)) < 0.01,
+            summary["num_expenses"] == count,
+            {m["merchant"]: m["amount"] for m in summary["by_merchant"]} == {k: round(v, 2) for k, v in by_merchant.items()},
+            {c["category"]: c["amount"] for c in summary["by_category"]} == {k: round(v, 2) for k, v in by_category.items()},
+            {b["period"]: b["amount"] for b in summary["daily"]} == {k: round(v, 2) for k, v in daily.items()},
+            {b["period"]: b["amount"] for b in summary["weekly"]} == {k: round(v, 2) for k, v in weekly.items()},
+            {b["period"]: b["amount"] for b in summary["monthly"]} == {k: round(v, 2) for k, v in monthly.items()},
+        ]
+        if not all(checks):
+            failed = True
+            print(f"MISMATCH vs python loop: {checks}")
+
+    if args.store:
+        from transaction_store import TransactionStore
+
+        with tempfile.TemporaryDirectory() as workdir:
+            store = TransactionStore(os.path.join(workdir, "transactions.db"), page_size=10000,
+                                     backfill=len(rows))
+            newest_first = rows[::-1]
+            positions = {t["id"]: i for i, t in enumerate(newest_first)}
+
+            def fetch_page(count, from_id):
+                offset = positions[from_id] + 1 if from_id else 0
+                return newest_first[offset:offset + count]
+
+            timed("\nsync into TransactionStore", lambda: store.sync("acc", fetch_page))
+            timed("load columns + build", lambda: SpendingAnalytics.from_columns(*store.columns("acc")))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: per-call httpx.Client vs the pooled BankingService client.
+
+Runs simulated CHECK_BALANCE turns (account discovery + balance) against the
+local mTLS Teller stub and reports latency and TLS handshakes per turn.
+
+    python benchmarks/bench_teller_pool.py --turns 200 --latency 0.005
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from teller_stub import TellerStub  # noqa: E402
+
+
+def run_turns(label, stub, turns, turn_fn):
+    stub.reset_counters()
+    start = time.perf_counter()
+    for _ in range(turns):
+        turn_fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed / turns * 1000:8.2f} ms/turn  "
+          f"{stub.handshakes / turns:5.2f} handshakes/turn  "
+          f"{stub.requests / turns:4.1f} requests/turn")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="artificial server latency per request (seconds)")
+    args = parser.parse_args()
+
+    with TellerStub(latency=args.latency) as stub, tempfile.TemporaryDirectory(prefix="bench-teller-pool-") as workdir:
+        os.environ.update(stub.env())
+        # BankingService opens its stores in the cwd; keep them out of the source tree
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        import httpx
+        import banking_assistant as ba
+
+        bank = ba.BankingService()
+
+        def per_call_client():
+            # The old behaviour: a fresh client (and handshake) for every call
+            return httpx.Client(verify=bank._ssl_context(), auth=(ba.TELLER_TOKEN, ""), timeout=10.0)
+
+        def legacy_turn():
+            with per_call_client() as c:
+                account_id = c.get(f"{ba.BASE_URL}/accounts").json()[0]["id"]
+            with per_call_client() as c:
+                c.get(f"{ba.BASE_URL}/accounts/{account_id}/balances").json()
+
+        def pooled_turn():
+            # The upstream fetches themselves: get_accounts and get_balance are served from caches
+            account_id = bank._fetch_accounts()[0]["id"]
+            bank._fetch_balance(account_id)
+
+        print(f"{args.turns} CHECK_BALANCE turns, server latency {args.latency * 1000:.1f} ms\n")
+        legacy = run_turns("per-call client", stub, args.turns, legacy_turn)
+        pooled = run_turns("pooled client", stub, args.turns, pooled_turn)
+        print(f"\nspeedup: {legacy / pooled:.2f}x")
+        bank.close()
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Offline stand-in for google.generativeai.GenerativeModel used by the benchmarks.
+
+Answers every prompt with a short acknowledgement after a configurable
+delay (plus optional jitter), for plain, streamed and async generation,
+and counts calls. install() swaps it in for the real class, so it must run
+before banking_assistant is imported.
+"""
+import asyncio
+import random
+import threading
+import time
+
+ACKNOWLEDGEMENTS = [
+    "Sure, let me check that for you.",
+    "Of course, here's what I found.",
+    "Absolutely, let me pull that up.",
+]
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubGenerativeModel:
+    """Drop-in for GenerativeModel(model_name) with simulated latency"""
+
+    latency = 0.0
+    jitter = 0.0
+    calls = 0
+    _lock = threading.Lock()
+
+    def __init__(self, model_name="stub", **kwargs):
+        self.model_name = model_name
+
+    @classmethod
+    def _delay(cls):
+        with cls._lock:
+            cls.calls += 1
+        return max(0.0, cls.latency + random.uniform(-cls.jitter, cls.jitter))
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        delay = self._delay()
+        text = random.choice(ACKNOWLEDGEMENTS)
+        if stream:
+            return self._stream(text, delay)
+        time.sleep(delay)
+        return _Response(text)
+
+    def _stream(self, text, delay):
+        # Most of the wait is before the first token, as with the real API
+        time.sleep(delay * 0.8)
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(delay * 0.2 / len(words))
+            yield _Response(word + (" " if i < len(words) - 1 else ""))
+
+    async def generate_content_async(self, prompt, **kwargs):
+        await asyncio.sleep(self._delay())
+        return _Response(random.choice(ACKNOWLEDGEMENTS))
+
+
+def install(latency=0.0, jitter=0.0):
+    """Make google.generativeai.GenerativeModel the stub; returns the stub class"""
+    import google.generativeai as genai
+
+    StubGenerativeModel.latency = latency
+    StubGenerativeModel.jitter = jitter
+    genai.GenerativeModel = StubGenerativeModel
+    return StubGenerativeModel
@@ -0,0 +1,269 @@
+"""
+Load test: scripted voice-banking conversations against a local server.
+
+Starts the backend (Flask or ASGI) in a child process, wired to the mTLS
+Teller stub and a stub Gemini model with configurable latency, so no
+credentials are needed. Concurrent virtual users then replay multi-turn
+conversations over HTTP: greeting and balance checks, full payment flows,
+spending questions, REST lookups and direct payments. Reports throughput
+and p50/p95/p99 latency per endpoint (chat turns grouped by conversation),
+plus the Teller and Gemini calls the server made, read from /api/metrics.
+
+    python benchmarks/load_test.py --users 16 --duration 20
+    python benchmarks/load_test.py --server asgi --gemini-latency 0.4 --json results.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def chat(message, check=None):
+    return ("POST", "/api/chat", {"message": message}, check)
+
+
+def get(path):
+    return ("GET", path, None, None)
+
+
+def post(path, body):
+    return ("POST", path, body, None)
+
+
+def _paid(data):
+    return data.get("payment_success") is True
+
+
+# Each conversation runs under a fresh user_id, so sessions start clean
+CONVERSATIONS = {
+    "balance": [chat("hello"), chat("what's my balance"), chat("show my recent transactions")],
+    "payment": [chat("I want to make a payment"), chat("john smith"), chat("two dollars"),
+                chat("confirm", check=_paid)],
+    "spending": [chat("how much did I spend this month"), chat("show my spending by category"),
+                 chat("what did I spend at starbucks last week")],
+    "rest": [get("/api/balance"), get("/api/transactions?count=5"), get("/api/payees"),
+             get("/api/spending?period=this month"), get("/api/payments")],
+    "direct": [post("/api/direct-payment", {"payee": "Netflix", "amount": 1.5})],
+}
+
+
+# ---------------------------------------------------------
+# Server side (runs in the child process)
+# ---------------------------------------------------------
+def serve(args, ready):
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+    os.chdir(tempfile.mkdtemp(prefix="load-test-"))
+
+    import gemini_stub
+    from teller_stub import TellerStub
+
+    stub = TellerStub(latency=args.teller_latency, transactions=args.transactions, balance="100000000.00").start()
+    os.environ.update(stub.env())
+    os.environ.update({
+        "GEMINI_API_KEY": "stub",
+        "STATE_BACKEND": args.state,
+        "LOG_LEVEL": "WARNING",
+        "LLM_LATENCY_BUDGET_MS": str(args.llm_budget_ms),
+    })
+    if args.no_gemini_cache:
+        os.environ["GEMINI_CACHE_TTL"] = "0"
+    gemini_stub.install(args.gemini_latency, args.gemini_jitter)
+
+    if args.server == "asgi":
+        import socket
+        import uvicorn
+        import asgi
+
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        # uvicorn sets this on sockets it binds itself; without it every response waits on delayed ACKs
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        server = uvicorn.Server(uvicorn.Config(asgi.app, log_level="warning", access_log=False))
+        threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+        ready.put(sock.getsockname()[1])
+    else:
+        import logging
+        from werkzeug.serving import make_server
+        import banking_assistant
+
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no access log
+
+        server = make_server("127.0.0.1", 0, banking_assistant.app, threaded=True)
+        ready.put(server.port)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Serve until the parent terminates us
+    threading.Event().wait()
+
+
+# ---------------------------------------------------------
+# Client side
+# ---------------------------------------------------------
+class Results:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, label, seconds, ok):
+        with self._lock:
+            self.latencies[label].append(seconds)
+            if not ok:
+                self.errors[label] += 1
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def run_user(index, base_url, names, deadline, measure_from, results):
+    client = httpx.Client(base_url=base_url, timeout=30.0)
+    turn = 0
+    while time.monotonic() < deadline:
+        name = names[(index + turn) % len(names)]
+        user_id = f"load_{index}_{turn}"
+        turn += 1
+        for method, path, body, check in CONVERSATIONS[name]:
+            if method == "POST" and path == "/api/chat":
+                body = {**body, "user_id": user_id}
+            start = time.monotonic()
+            try:
+                res = client.request(method, path, json=body)
+                ok = res.status_code == 200
+                if ok and check is not None:
+                    ok = check(res.json())
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.monotonic() - start
+            if start >= measure_from:
+                label = f"{method} {path.split('?')[0]}"
+                if path == "/api/chat":
+                    label += f" [{name}]"
+                results.record(label, elapsed, ok)
+    client.close()
+
+
+def upstream_calls(base_url):
+    """Stage call counts from the server's /api/metrics, e.g. {'teller_balances': 120}"""
+    counts = defaultdict(int)
+    text = httpx.get(f"{base_url}/api/metrics", timeout=10.0).text
+    for line in text.splitlines():
+        if line.startswith("banking_stage_duration_seconds_count{"):
+            labels, value = line.rsplit(" ", 1)
+            stage = labels.split('stage="', 1)[1].split('"', 1)[0]
+            counts[stage] += int(float(value))
+    return dict(counts)
+
+
+def summarize(results, seconds):
+    rows = {}
+    everything = []
+    for label in sorted(results.latencies):
+        values = sorted(results.latencies[label])
+        everything.extend(values)
+        rows[label] = _row(values, results.errors[label], seconds)
+    rows["all requests"] = _row(sorted(everything), sum(results.errors.values()), seconds)
+    return rows
+
+
+def _row(values, errors, seconds):
+    return {
+        "count": len(values),
+        "errors": errors,
+        "rps": len(values) / seconds if seconds else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": (values[-1] if values else 0.0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--server", choices=("flask", "asgi"), default="flask")
+    parser.add_argument("--state", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--users", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds of load before measuring")
+    parser.add_argument("--conversations", default=",".join(CONVERSATIONS),
+                        help=f"comma-separated mix (from {', '.join(CONVERSATIONS)})")
+    parser.add_argument("--teller-latency", type=float, default=0.02, help="seconds per Teller request")
+    parser.add_argument("--gemini-latency", type=float, default=0.3, help="seconds per Gemini call")
+    parser.add_argument("--gemini-jitter", type=float, default=0.1)
+    parser.add_argument("--no-gemini-cache", action="store_true", help="disable the acknowledgement cache")
+    parser.add_argument("--llm-budget-ms", type=float, default=1500)
+    parser.add_argument("--transactions", type=int, default=500, help="transactions in the Teller stub")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="exit 1 if the overall p95 exceeds this")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.conversations.split(",") if n.strip()]
+    unknown = [n for n in names if n not in CONVERSATIONS]
+    if unknown:
+        parser.error(f"unknown conversations: {', '.join(unknown)}")
+
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Queue()
+    server = ctx.Process(target=serve, args=(args, ready), daemon=True)
+    server.start()
+    try:
+        base_url = f"http://127.0.0.1:{ready.get(timeout=120)}"
+        print(f"{args.server} server ({args.state} state) at {base_url}: {args.users} users, "
+              f"Teller {args.teller_latency * 1000:.0f} ms, Gemini {args.gemini_latency * 1000:.0f} "
+              f"± {args.gemini_jitter * 1000:.0f} ms, mix {', '.join(names)}\n")
+
+        results = Results()
+        measure_from = time.monotonic() + args.warmup
+        deadline = measure_from + args.duration
+        users = [
+            threading.Thread(target=run_user, args=(i, base_url, names, deadline, measure_from, results))
+            for i in range(args.users)
+        ]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+
+        rows = summarize(results, args.duration)
+        calls = upstream_calls(base_url)
+    finally:
+        server.terminate()
+        server.join()
+
+    print(f"{'endpoint':<34} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'errors':>7}")
+    for label, row in rows.items():
+        print(f"{label:<34} {row['count']:7d} {row['rps']:8.1f} {row['p50_ms']:8.1f} {row['p95_ms']:8.1f} "
+              f"{row['p99_ms']:8.1f} {row['max_ms']:8.1f} {row['errors']:7d}")
+    print("\nserver stage calls: " + ", ".join(f"{stage} {count}" for stage, count in sorted(calls.items())))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "endpoints": rows, "stage_calls": calls}, f, indent=2)
+
+    overall = rows["all requests"]
+    failed = overall["errors"] > 0 or not overall["count"]
+    if args.max_p95_ms is not None and overall["p95_ms"] > args.max_p95_ms:
+        print(f"\np95 {overall['p95_ms']:.1f} ms exceeds --max-p95-ms {args.max_p95_ms:.1f}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
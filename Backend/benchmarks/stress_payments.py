@@ -0,0 +1,183 @@
+"""
+Stress test: concurrent payments against the ledger must never overdraw.
+
+Many threads (and, for the SQLite backend, several processes) pay out of a
+handful of accounts whose real balance only covers part of the attempted
+payments. Afterwards the ledger is checked: no account is overdrawn, the
+per-account completed totals match the recorded payments, and every
+payment id is unique. The unlocked check-then-record sequence the old
+make_payment used is run first for comparison. For the SQLite backend it
+also checks that payments journaled by the in-process backend (before any
+snapshot exists) are imported on the switch to SQLite.
+
+    python benchmarks/stress_payments.py --threads 32 --payments 20000
+    python benchmarks/stress_payments.py --backend sqlite --processes 4
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state_backend import MemoryStateBackend, SQLiteStateBackend, new_payment_id  # noqa: E402
+
+REAL_BALANCE = 10000.0
+
+
+def make_record(account_id, amount):
+    return {
+        'id': new_payment_id(),
+        'payee': 'Stress Payee',
+        'amount': amount,
+        'date': '2026-01-01T00:00:00',
+        'status': 'completed',
+        'account_id': account_id,
+        'description': 'Payment to Stress Payee'
+    }
+
+
+def legacy_pay(ledger, record, real_balance):
+    """The old make_payment sequence: read the balance, check, then record"""
+    available = real_balance - ledger.completed_total(record['account_id'])
+    time.sleep(0)  # the old code made a Teller round trip here
+    if available < record['amount']:
+        return False
+    ledger.append_many([record])
+    return True
+
+
+def engine_pay(ledger, record, real_balance):
+    return ledger.reserve(record, real_balance)[0]
+
+
+def run_threads(ledger, pay, accounts, threads, payments, seed):
+    per_thread = payments // threads
+    accepted = [0] * threads
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        for _ in range(per_thread):
+            record = make_record(rng.choice(accounts), float(rng.randint(1, 20)))
+            if pay(ledger, record, REAL_BALANCE):
+                accepted[index] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return sum(accepted), time.perf_counter() - start
+
+
+def open_backend(name, workdir):
+    if name == "sqlite":
+        return SQLiteStateBackend(os.path.join(workdir, "state.db"))
+    return MemoryStateBackend(os.path.join(workdir, "payments.json"), fsync=False)
+
+
+def verify(ledger, accounts):
+    records = ledger.recent(len(ledger))
+    problems = []
+    ids = [r['id'] for r in records]
+    if len(set(ids)) != len(ids):
+        problems.append(f"{len(ids) - len(set(ids))} duplicate payment ids")
+    for account_id in accounts:
+        spent = sum(r['amount'] for r in records if r['account_id'] == account_id)
+        total = ledger.completed_total(account_id)
+        if spent > REAL_BALANCE:
+            problems.append(f"{account_id} overdrawn by ${spent - REAL_BALANCE:.2f}")
+        if abs(spent - total) > 1e-6:
+            problems.append(f"{account_id} total {total:.2f} != recorded {spent:.2f}")
+    return len(records), problems
+
+
+def check_migration(accounts, payments):
+    """Payments in the memory backend's journal carry over to a new SQLite backend"""
+    with tempfile.TemporaryDirectory() as workdir:
+        payments_file = os.path.join(workdir, "payments.json")
+        # Fewer records than snapshot_every, so they live in the journal only
+        ledger = MemoryStateBackend(payments_file, fsync=False, snapshot_every=payments + 1).ledger()
+        run_threads(ledger, engine_pay, accounts, 4, payments, seed=2)
+        expected = {account_id: ledger.completed_total(account_id) for account_id in accounts}
+        count = len(ledger)
+        ledger.close()
+
+        imported = SQLiteStateBackend(os.path.join(workdir, "state.db"), legacy_payments_file=payments_file).ledger()
+        problems = [] if len(imported) == count else [f"imported {len(imported)} of {count} payments"]
+        problems += [f"{account_id} total {imported.completed_total(account_id):.2f} != {total:.2f}"
+                     for account_id, total in expected.items()
+                     if abs(imported.completed_total(account_id) - total) > 1e-6]
+    print(f"{'journal -> sqlite import':<24} {count:>6} payments   {'OK' if not problems else 'BROKEN'}")
+    for problem in problems[:5]:
+        print(f"    {problem}")
+    return problems
+
+
+def report(label, accepted, elapsed, attempted, ledger, accounts):
+    recorded, problems = verify(ledger, accounts)
+    print(f"{label:<24} {attempted / elapsed:10.0f} payments/s   accepted {accepted:6d}   "
+          f"recorded {recorded:6d}   {'OK' if not problems else 'BROKEN'}")
+    for problem in problems[:5]:
+        print(f"    {problem}")
+    return problems
+
+
+def process_worker(args):
+    path, accounts, threads, payments, seed = args
+    backend = SQLiteStateBackend(path)
+    ledger = backend.ledger()
+    return run_threads(ledger, engine_pay, accounts, threads, payments, seed)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--payments", type=int, default=20000)
+    parser.add_argument("--accounts", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=0, help="also run N worker processes (sqlite only)")
+    args = parser.parse_args()
+
+    # Enough attempts that every account runs out of money partway through
+    accounts = [f"acc_{i}" for i in range(args.accounts)]
+    print(f"{args.backend} backend, {args.threads} threads, {args.payments} payments over "
+          f"{args.accounts} accounts with ${REAL_BALANCE:.0f} each\n")
+
+    failed = False
+    for label, pay in (("unlocked check+record", legacy_pay), ("ledger.reserve", engine_pay)):
+        with tempfile.TemporaryDirectory() as workdir:
+            ledger = open_backend(args.backend, workdir).ledger()
+            accepted, elapsed = run_threads(ledger, pay, accounts, args.threads, args.payments, seed=1)
+            problems = report(label, accepted, elapsed, args.payments, ledger, accounts)
+            ledger.close()
+            if pay is engine_pay and problems:
+                failed = True
+
+    if args.processes and args.backend == "sqlite":
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, "state.db")
+            SQLiteStateBackend(path)
+            per_process = args.payments // args.processes
+            jobs = [(path, accounts, args.threads, per_process, seed) for seed in range(args.processes)]
+            start = time.perf_counter()
+            with multiprocessing.Pool(args.processes) as pool:
+                accepted = sum(pool.map(process_worker, jobs))
+            elapsed = time.perf_counter() - start
+            ledger = SQLiteStateBackend(path).ledger()
+            problems = report(f"{args.processes} processes", accepted, elapsed, args.payments, ledger, accounts)
+            failed = failed or bool(problems)
+
+    if args.backend == "sqlite":
+        failed = bool(check_migration(accounts, min(args.payments, 2000))) or failed
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Local HTTPS stand-in for api.teller.io used by the benchmarks.
+
+Generates a throwaway CA, a server certificate for localhost and a client
+certificate (via the `openssl` CLI), then serves the handful of Teller
+endpoints the backend uses over mutual TLS. The server counts TCP
+connections and completed TLS handshakes so benchmarks can report how many
+handshakes a workload cost.
+"""
+import json
+import os
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+ACCOUNT_ID = "acc_stub_checking"
+
+MERCHANTS = [
+    "POS AMAZON MKTPLACE 4411", "STARBUCKS STORE 1022", "UBER TRIP 8812",
+    "NETFLIX.COM", "PAYMENT John Smith", "DEBIT Whole Foods Market 118",
+    "ATM WITHDRAWAL 2231", "Sarah Johnson", "PURCHASE Target Store 0091",
+    "Comcast Cable", "Electric Company", "Transfer",
+]
+
+# Teller's details.category for each merchant above
+CATEGORIES = [
+    "shopping", "dining", "transportation", "entertainment", "general",
+    "groceries", "general", "general", "shopping", "utilities", "utilities", "general",
+]
+
+
+def _openssl(*args, cwd):
+    subprocess.run(["openssl", *args], cwd=cwd, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def generate_certs(directory):
+    """Create ca/server/client key pairs in `directory` and return their paths"""
+    _openssl("req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "2",
+             "-keyout", "ca.key", "-out", "ca.pem", "-subj", "/CN=Teller Stub CA",
+             cwd=directory)
+    with open(os.path.join(directory, "server.ext"), "w") as f:
+        f.write("subjectAltName=DNS:localhost,IP:127.0.0.1\n")
+    for name, cn in (("server", "localhost"), ("client", "teller-client")):
+        _openssl("req", "-newkey", "rsa:2048", "-nodes", "-keyout", f"{name}.key",
+                 "-out", f"{name}.csr", "-subj", f"/CN={cn}", cwd=directory)
+        extra = ["-extfile", "server.ext"] if name == "server" else []
+        _openssl("x509", "-req", "-in", f"{name}.csr", "-CA", "ca.pem",
+                 "-CAkey", "ca.key", "-CAcreateserial", "-days", "2",
+                 "-out", f"{name}.pem", *extra, cwd=directory)
+    return {
+        "ca": os.path.join(directory, "ca.pem"),
+        "server_cert": os.path.join(directory, "server.pem"),
+        "server_key": os.path.join(directory, "server.key"),
+        "client_cert": os.path.join(directory, "client.pem"),
+        "client_key": os.path.join(directory, "client.key"),
+    }
+
+
+def build_transactions(n, account_id=ACCOUNT_ID):
+    """Deterministic transaction history, newest first (like Teller)"""
+    today = date.today()
+    txs = []
+    for i in range(n):
+        seq = n - i
+        merchant = MERCHANTS[seq % len(MERCHANTS)]
+        category = CATEGORIES[seq % len(CATEGORIES)]
+        amount = -round(5 + (seq * 37 % 9000) / 100, 2)
+        if seq % 15 == 0:
+            amount = round(1500 + seq % 100, 2)
+            merchant = "PAYROLL DEPOSIT ACME"
+            category = "income"
+        txs.append({
+            "id": f"txn_{seq:08d}",
+            "account_id": account_id,
+            "amount": f"{amount:.2f}",
+            "date": (today - timedelta(days=i // 3)).isoformat(),
+            "description": merchant,
+            "details": {"category": category, "processing_status": "complete"},
+            "status": "posted",
+            "type": "card_payment",
+        })
+    return txs
+
+
+class TellerStub:
+    """Threaded mTLS server implementing /accounts, /balances and /transactions"""
+
+    def __init__(self, latency=0.0, transactions=200, balance="25000.00"):
+        self.latency = latency
+        self.balance = balance
+        self.transactions = build_transactions(transactions)
+        self.connections = 0
+        self.handshakes = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._tmp = tempfile.TemporaryDirectory(prefix="teller-stub-")
+        self.certs = generate_certs(self._tmp.name)
+        self._server = None
+        self._thread = None
+
+    # -- counters -------------------------------------------------------
+    def _count(self, attr):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def reset_counters(self):
+        with self._lock:
+            self.connections = self.handshakes = self.requests = 0
+
+    def add_transaction(self, description, amount, category="general"):
+        """Prepend a new transaction, as if it just posted upstream"""
+        with self._lock:
+            seq = int(self.transactions[0]["id"].split("_")[1]) + 1 if self.transactions else 1
+            self.transactions.insert(0, {
+                "id": f"txn_{seq:08d}",
+                "account_id": ACCOUNT_ID,
+                "amount": f"{amount:.2f}",
+                "date": date.today().isoformat(),
+                "description": description,
+                "details": {"category": category, "processing_status": "complete"},
+                "status": "posted",
+                "type": "card_payment",
+            })
+
+    # -- lifecycle ------------------------------------------------------
+    @property
+    def base_url(self):
+        return f"https://localhost:{self._server.server_address[1]}"
+
+    def env(self):
+        """Environment variables that point banking_assistant at this stub"""
+        return {
+            "TELLER_TOKEN": "stub_token",
+            "TELLER_CERT": self.certs["client_cert"],
+            "TELLER_KEY": self.certs["client_key"],
+            "TELLER_BASE_URL": self.base_url,
+            "TELLER_CA_BUNDLE": self.certs["ca"],
+        }
+
+    def start(self):
+        stub = self
+        ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH, cafile=self.certs["ca"])
+        ctx.load_cert_chain(self.certs["server_cert"], self.certs["server_key"])
+        ctx.verify_mode = ssl.CERT_REQUIRED
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 256
+
+            def get_request(self):
+                sock, addr = self.socket.accept()
+                stub._count("connections")
+                return ctx.wrap_socket(sock, server_side=True, do_handshake_on_connect=False), addr
+
+            def finish_request(self, request, client_address):
+                try:
+                    request.do_handshake()
+                except (ssl.SSLError, OSError):
+                    return
+                stub._count("handshakes")
+                super().finish_request(request, client_address)
+
+        self._server = Server(("127.0.0.1", 0), _make_handler(self))
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        self._tmp.cleanup()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _make_handler(stub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            stub._count("requests")
+            if stub.latency:
+                time.sleep(stub.latency)
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            parts = [p for p in url.path.split("/") if p]
+
+            if parts == ["accounts"]:
+                return self._send(200, [{
+                    "id": ACCOUNT_ID, "name": "Stub Checking", "type": "depository",
+                    "subtype": "checking", "currency": "USD", "last_four": "0042",
+                    "status": "open", "institution": {"id": "stub", "name": "Stub Bank"},
+                }])
+            if len(parts) == 3 and parts[0] == "accounts" and parts[2] == "balances":
+                return self._send(200, {
+                    "account_id": parts[1], "available": stub.balance, "ledger": stub.balance,
+                })
+            if len(parts) == 3 and parts[0] == "accounts" and parts[2] == "transactions":
+                with stub._lock:
+                    txs = list(stub.transactions)
+                from_id = params.get("from_id", [None])[0]
+                if from_id:
+                    ids = [t["id"] for t in txs]
+                    txs = txs[ids.index(from_id) + 1:] if from_id in ids else []
+                count = int(params.get("count", [len(txs)])[0])
+                return self._send(200, txs[:count])
+            return self._send(404, {"error": {"code": "not_found", "message": self.path}})
+
+    return Handler
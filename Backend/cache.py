@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+# ---------------------------------------------------------
+# Bounded TTL cache with hit/miss counters
+# ---------------------------------------------------------
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds.
+
+    A ttl of 0 (or less) disables caching: every lookup is a miss.
+    """
+
+    def __init__(self, ttl, maxsize=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    async def get_async(self, key, default=None):
+        # In memory, so nothing blocks: no need to leave the event loop
+        return self.get(key, default)
+
+    async def set_async(self, key, value, ttl=None):
+        self.set(key, value, ttl)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
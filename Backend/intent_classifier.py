@@ -0,0 +1,110 @@
+import re
+
+# Keyword rules in priority order: the first rule with a keyword anywhere
+# in the (lowercased) text wins. Payment exit commands come first.
+# Spending questions sit above CHECK_BALANCE and GREETING, since they
+# usually contain "how much"; GREETING sits below balance and transaction
+# questions, since periods like "this month" contain "hi".
+INTENT_RULES = (
+    ("CANCEL_PAYMENT", ("cancel", "stop", "nevermind", "not now", "exit payment", "don't pay")),
+    ("GO_BACK", ("go back", "main menu", "start over", "different", "something else")),
+    ("HELP", ("what can you do", "options", "menu")),
+    ("SPENDING_BY_CATEGORY", ("by category", "categories", "spending breakdown", "category breakdown")),
+    ("SPENDING_BY_MERCHANT", ("by merchant", "top merchants", "spend the most", "spent the most", "biggest expenses")),
+    ("SPENDING_TREND", ("per day", "per week", "per month", "each month", "daily spending", "weekly spending",
+                        "monthly spending", "spending trend")),
+    ("SPENDING_SUMMARY", ("spent", "spend", "expenses")),
+    ("CHECK_BALANCE", ("balance", "how much", "money")),
+    ("VIEW_TRANSACTIONS", ("transaction", "history", "payments", "recent")),
+    ("GREETING", ("hello", "hi", "hey", "good morning")),
+    ("VIEW_PAYEES", ("payee", "payees", "who i pay", "merchants", "user list", "pay list", "list of payees")),
+    ("MAKE_PAYMENT", ("pay", "send money", "transfer", "make payment")),
+    ("PAYMENT_HISTORY", ("payment history", "my payments", "recent payments")),
+    ("HELP", ("help",)),
+    ("FAREWELL", ("bye", "goodbye", "exit", "quit")),
+)
+
+
+# ---------------------------------------------------------
+# Compiled keyword intent classifier
+# ---------------------------------------------------------
+class IntentClassifier:
+    """Keyword intent detection with a single precompiled regex.
+
+    The pattern is a zero-width lookahead over a prefix trie of every
+    keyword, so it reports a match at each position where some keyword
+    starts (overlapping matches included). Taking the best priority over all
+    positions gives exactly what the original rule-by-rule substring scan
+    returned, in one pass over the text.
+    """
+
+    def __init__(self, rules=INTENT_RULES, default="GENERAL_INQUIRY"):
+        self.default = default
+        self._intents = [intent for intent, _ in rules]
+        self._priority = {}
+        for priority, (_, keywords) in enumerate(rules):
+            for keyword in keywords:
+                self._priority.setdefault(keyword, priority)
+
+        # The trie pattern reports the longest keyword starting at each
+        # position; any other keyword starting there is a prefix of it, so
+        # fold the best priority among its prefixes into each keyword.
+        self._effective = {
+            keyword: min(p for k, p in self._priority.items() if keyword.startswith(k))
+            for keyword in self._priority
+        }
+        self._pattern = re.compile("(?=(" + _trie_pattern(self._priority) + "))")
+
+    def classify(self, text):
+        if not text:
+            return "UNKNOWN"
+        found = self._pattern.findall(text.lower())
+        if not found:
+            return self.default
+        return self._intents[min(map(self._effective.__getitem__, found))]
+
+    def classify_many(self, texts):
+        """Classify a batch of utterances"""
+        findall = self._pattern.findall
+        effective = self._effective.__getitem__
+        intents = self._intents
+        results = []
+        for text in texts:
+            if not text:
+                results.append("UNKNOWN")
+                continue
+            found = findall(text.lower())
+            results.append(intents[min(map(effective, found))] if found else self.default)
+        return results
+
+
+def _trie_pattern(keywords):
+    """Regex matching any keyword, factored by common prefix, longest first"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+default_classifier = IntentClassifier()
+
+
+def detect_intent(text):
+    return default_classifier.classify(text)
+
+
+def detect_intents(texts):
+    return default_classifier.classify_many(texts)
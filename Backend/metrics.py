@@ -0,0 +1,216 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+# Latency buckets in seconds, from in-process steps (intent detection,
+# payee matching) up to slow Teller and Gemini round trips
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Intent of the chat turn being handled; copied into worker threads and
+# asyncio tasks with the rest of the context, so upstream calls made on a
+# turn's behalf are labeled with its intent. REST endpoints report "none".
+_intent = contextvars.ContextVar("metrics_intent", default="none")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ---------------------------------------------------------
+# Counters and histograms in the Prometheus text format
+# ---------------------------------------------------------
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram; each observation is one bisect under a lock"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labels, (counts, total, count) in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                label_text = _labels(self.labelnames, labels, (("le", _number(bound)),))
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_SECONDS = registry.histogram(
+    "banking_chat_request_duration_seconds", "Time to answer a chat turn, by intent", ("intent",)
+)
+REQUEST_ERRORS = registry.counter(
+    "banking_chat_request_errors_total", "Chat turns that raised instead of returning a response", ("intent",)
+)
+STAGE_SECONDS = registry.histogram(
+    "banking_stage_duration_seconds",
+    "Time spent in one stage (intent detection, a Teller endpoint, Gemini, payment persistence, ...)",
+    ("stage", "intent")
+)
+STAGE_ERRORS = registry.counter(
+    "banking_stage_errors_total", "Stage calls that raised", ("stage", "intent")
+)
+STALE_SERVED = registry.counter(
+    "banking_stale_reads_total",
+    "Upstream reads answered with a value past its freshness: while refreshing it, or because the upstream failed",
+    ("source", "reason")
+)
+COALESCED = registry.counter(
+    "banking_upstream_coalesced_total",
+    "Upstream reads that joined an identical call already in flight instead of making their own",
+    ("source",)
+)
+BREAKER_OPENS = registry.counter(
+    "banking_circuit_breaker_opened_total", "Times a circuit breaker opened", ("breaker",)
+)
+BREAKER_REJECTIONS = registry.counter(
+    "banking_circuit_breaker_rejections_total", "Calls failed fast by an open circuit breaker", ("breaker",)
+)
+
+
+def set_intent(intent):
+    """Label the rest of this chat turn (and work it hands off) with `intent`"""
+    _intent.set(intent)
+
+
+@contextlib.contextmanager
+def track_request():
+    """Time a chat turn; the intent label is whatever set_intent chose during it"""
+    # Until the turn is classified (intent detection itself) the label stays "none"
+    token = _intent.set(_intent.get())
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        REQUEST_ERRORS.inc(_intent.get())
+        raise
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, _intent.get())
+        _intent.reset(token)
+
+
+def track_stream(events, intent):
+    """Time a chat turn produced by the generator `events`, labeled `intent`.
+
+    The generator runs in its own copy of the context, so the intent label
+    covers its stages without leaking into whatever the server thread
+    handles next.
+    """
+    context = contextvars.copy_context()
+    context.run(_intent.set, intent)
+    start = time.perf_counter()
+    try:
+        while True:
+            try:
+                item = context.run(next, events)
+            except StopIteration:
+                return
+            yield item
+    except Exception:
+        REQUEST_ERRORS.inc(intent)
+        raise
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, intent)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time one stage of the current request, counting it as an error if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(name, _intent.get())
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, name, _intent.get())
+
+
+def render():
+    return registry.render()
@@ -0,0 +1,99 @@
+import threading
+import time
+
+# Descriptions that never name a payee
+IGNORED_DESCRIPTIONS = {'', 'Payment', 'Transfer'}
+
+
+# ---------------------------------------------------------
+# Incrementally synced payee index
+# ---------------------------------------------------------
+class PayeeIndex:
+    """Payees seen in one account's transaction history.
+
+    The index remembers the id of the newest transaction it has processed
+    (the cursor) so each sync only walks transactions that posted since.
+    For every payee it keeps how often they appear and when they were last
+    seen. With `initial_count=None` the first sync pages through the whole
+    history (up to `max_pages`) instead of one page.
+    """
+
+    def __init__(self, account_id, extract_name, initial_count=50, page_size=50, max_pages=10):
+        self.account_id = account_id
+        self.extract_name = extract_name
+        self.initial_count = initial_count
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.cursor = None
+        self.last_sync = 0.0
+        self.payees = {}  # name -> {'count': int, 'last_seen': 'YYYY-MM-DD'}
+        self.version = 0  # bumped whenever a sync indexes new transactions
+        self._lock = threading.Lock()
+
+    def is_stale(self, max_age):
+        return time.monotonic() - self.last_sync >= max_age
+
+    def sync(self, fetch_page):
+        """Index transactions newer than the cursor.
+
+        `fetch_page(count, from_id)` returns transactions newest first,
+        starting after `from_id` when given (Teller's pagination contract).
+        Returns the number of new transactions indexed.
+        """
+        with self._lock:
+            if self.cursor is None and self.initial_count:
+                new = fetch_page(self.initial_count, None)
+            else:
+                new = self._fetch_since_cursor(fetch_page)
+
+            self._add(new)
+            if new:
+                self.cursor = new[0].get('id', self.cursor)
+                self.version += 1
+            self.last_sync = time.monotonic()
+            return len(new)
+
+    def _fetch_since_cursor(self, fetch_page):
+        new = []
+        from_id = None
+        for _ in range(self.max_pages):
+            page = fetch_page(self.page_size, from_id)
+            for transaction in page:
+                if transaction.get('id') == self.cursor:
+                    return new
+                new.append(transaction)
+            if len(page) < self.page_size:
+                break
+            from_id = page[-1].get('id')
+        return new
+
+    def _add(self, transactions):
+        for transaction in transactions:
+            description = (transaction.get('description') or '').strip()
+            if description in IGNORED_DESCRIPTIONS:
+                continue
+            name = self.extract_name(description)
+            if not name:
+                continue
+            seen = transaction.get('date') or ''
+            entry = self.payees.get(name)
+            if entry is None:
+                self.payees[name] = {'count': 1, 'last_seen': seen}
+            else:
+                entry['count'] += 1
+                if seen > entry['last_seen']:
+                    entry['last_seen'] = seen
+
+    def _snapshot(self):
+        # sync() mutates the dict under the lock; copy it there before iterating
+        with self._lock:
+            return [(name, entry['count'], entry['last_seen']) for name, entry in self.payees.items()]
+
+    def names(self):
+        """Payee names in alphabetical order"""
+        return sorted(name for name, _, _ in self._snapshot())
+
+    def ranked(self):
+        """Payee names, most frequent (then most recent) first"""
+        by_recency = sorted(self._snapshot(), key=lambda item: item[2], reverse=True)
+        return [name for name, _, _ in sorted(by_recency, key=lambda item: item[1], reverse=True)]
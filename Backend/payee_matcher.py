@@ -0,0 +1,139 @@
+import re
+
+# Words in a payment request that never name the payee
+FILLER_WORDS = {
+    "pay", "paying", "send", "sending", "transfer", "money", "make", "payment", "to", "the", "a", "an",
+    "i", "want", "would", "like", "please", "can", "you", "my", "for", "of", "and", "is", "it",
+    "dollars", "dollar", "bucks", "rupees", "rs", "now", "today", "um", "uh", "okay", "so",
+}
+# Payee words that carry little identity (weighted down, never matched alone)
+GENERIC_TOKENS = {"com", "net", "org", "inc", "llc", "ltd", "co", "corp", "the", "and", "store", "market", "shop"}
+
+MIN_TOKEN_SIMILARITY = 0.6
+
+
+def normalize(text):
+    """Lowercase words, with punctuation (e.g. 'NETFLIX.COM') split into separate words"""
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).split()
+
+
+def trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_similarity(a, b, cutoff=0.0):
+    """1 - Levenshtein distance / longer length, or 0.0 once it must fall below `cutoff`"""
+    if a == b:
+        return 1.0
+    if len(a) < len(b):
+        a, b = b, a
+    max_distance = int((1.0 - cutoff) * len(a))
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_distance:
+            return 0.0
+        previous = current
+    return 1.0 - previous[-1] / len(a)
+
+
+# ---------------------------------------------------------
+# Fuzzy payee matcher over a trigram index
+# ---------------------------------------------------------
+class PayeeMatcher:
+    """Ranked fuzzy lookup of payee names in a spoken request.
+
+    Payee names are split into words and every distinct word is indexed
+    by its trigrams. A request's words only get compared with payee words
+    they share a trigram with. Those pairs are scored by the better of
+    trigram overlap (Dice) and edit similarity, so ASR slips like
+    "jon smyth" still match. A payee's score mixes its best matching word
+    with how much of its name (weighted by word length) was heard. Lookup
+    cost depends on the request, not on how many payees there are.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self._words = []          # distinct payee words
+        self._word_ids = {}
+        self._word_trigrams = []
+        self._payee_words = []    # per payee: [(word id, weight)]
+        self._payee_weight = []   # per payee: total word weight
+        self._word_payees = []    # per word: payee indexes containing it
+        self._index = {}          # trigram -> word ids
+
+        for payee, name in enumerate(self.names):
+            entries = []
+            for word in dict.fromkeys(w for w in normalize(name) if not w.isdigit()):
+                word_id = self._word_ids.get(word)
+                if word_id is None:
+                    word_id = self._word_ids[word] = len(self._words)
+                    self._words.append(word)
+                    grams = trigrams(word)
+                    self._word_trigrams.append(grams)
+                    self._word_payees.append([])
+                    for gram in grams:
+                        self._index.setdefault(gram, []).append(word_id)
+                self._word_payees[word_id].append(payee)
+                weight = len(word) * (0.3 if word in GENERIC_TOKENS else 1.0)
+                entries.append((word_id, weight))
+            self._payee_words.append(entries)
+            self._payee_weight.append(sum(weight for _, weight in entries))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _similar_words(self, token):
+        """{word id: similarity} for payee words close to one spoken token"""
+        grams = trigrams(token)
+        shared = {}
+        for gram in grams:
+            for word_id in self._index.get(gram, ()):
+                shared[word_id] = shared.get(word_id, 0) + 1
+
+        similar = {}
+        for word_id, common in shared.items():
+            word = self._words[word_id]
+            score = 2 * common / (len(grams) + len(self._word_trigrams[word_id]))
+            # Edit similarity can't reach the cutoff if the lengths differ too much
+            if score < 1.0 and abs(len(word) - len(token)) <= (1 - MIN_TOKEN_SIMILARITY) * max(len(word), len(token)):
+                score = max(score, edit_similarity(token, word, MIN_TOKEN_SIMILARITY))
+            if score >= MIN_TOKEN_SIMILARITY:
+                similar[word_id] = score
+        return similar
+
+    def match(self, text, limit=3):
+        """Up to `limit` candidates as [{'payee', 'score'}], best first (score 0..1)"""
+        words = normalize(text)
+        tokens = [t for t in words if t not in FILLER_WORDS and not t.isdigit() and len(t) > 1]
+        # ASR splits names ("star bucks", "door dash"), so also try adjacent words joined
+        tokens += [a + b for a, b in zip(words, words[1:]) if not (a in FILLER_WORDS and b in FILLER_WORDS)]
+
+        best = {}  # word id -> best similarity to any spoken token
+        for token in tokens:
+            for word_id, score in self._similar_words(token).items():
+                if score > best.get(word_id, 0.0):
+                    best[word_id] = score
+
+        candidates = set()
+        for word_id in best:
+            if self._words[word_id] not in GENERIC_TOKENS:
+                candidates.update(self._word_payees[word_id])
+
+        scored = []
+        for payee in candidates:
+            top = heard = 0.0
+            for word_id, weight in self._payee_words[payee]:
+                similarity = best.get(word_id)
+                if similarity:
+                    heard += weight * similarity
+                    if similarity > top:
+                        top = similarity
+            scored.append((0.6 * top + 0.4 * heard / self._payee_weight[payee], -payee))
+
+        scored.sort(reverse=True)
+        return [{"payee": self.names[-neg], "score": round(score, 3)} for score, neg in scored[:limit]]
+
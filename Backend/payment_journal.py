@@ -0,0 +1,268 @@
+import json
+import logging
+import os
+import threading
+from collections import deque
+
+logger = logging.getLogger("banking.payments")
+
+
+class JournalWriteError(RuntimeError):
+    """A journal batch could not be made durable"""
+
+
+# ---------------------------------------------------------
+# Append-only payment journal with group commit
+# ---------------------------------------------------------
+class PaymentJournal:
+    """Durable, append-only log of simulated payments.
+
+    Each payment is one JSON line `{"seq": n, "payment": {...}}` in the
+    journal file. Concurrent appends are group committed: whichever writer
+    finds no flush in progress writes every pending line with a single
+    write + fsync, and the others just wait for it.
+
+    Every `snapshot_every` records the journal is compacted so replay on
+    startup stays short. Under the lock the journal is only rotated out
+    to a segment (`<journal>.<last seq>`) and a fresh one opened; a
+    background thread then folds the segments into the snapshot (written
+    atomically) and deletes them, so payers never wait on a rewrite of the
+    history. A crash at any point leaves segments that replay still reads.
+
+    The snapshot keeps the old `simulated_payments.json` name; a legacy
+    snapshot that is a bare JSON list is still accepted.
+    """
+
+    def __init__(self, snapshot_path, journal_path=None, fsync=True, snapshot_every=10000):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or os.path.splitext(snapshot_path)[0] + ".jsonl"
+        self.fsync = fsync
+        self.snapshot_every = snapshot_every
+
+        self.seq = 0
+        self._durable_seq = 0
+        self._pending = []
+        self._flushing = False
+        self._failed = deque(maxlen=32)  # (first_seq, last_seq, error)
+        self._cond = threading.Condition()
+        self._file = None
+        self._compact_at = snapshot_every
+        self._compacting = False
+
+    # -- replay ---------------------------------------------------------
+    def exists(self):
+        """Whether any payment history (snapshot, segment or journal) is on disk"""
+        return (os.path.exists(self.snapshot_path) or os.path.exists(self.journal_path)
+                or bool(self._segments()))
+
+    def load(self):
+        """Replay snapshot + journal and return the payment records in order"""
+        with self._cond:
+            records, self.seq = self._read_snapshot()
+            for _, path in self._segments() + [(None, self.journal_path)]:
+                for seq, payment in self._read_journal(path):
+                    if seq > self.seq:
+                        records.append(payment)
+                        self.seq = seq
+            self._durable_seq = self.seq
+            self._compact_at = self.seq + self.snapshot_every
+            self._open()
+            return records
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return [], 0
+        with open(self.snapshot_path, 'r') as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            return data, len(data)
+        return data.get('payments', []), data.get('seq', 0)
+
+    def _read_journal(self, path):
+        """Yield (seq, payment) pairs, cutting off a torn final line"""
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            # Partial write from a crash: drop it so new appends start cleanly
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+                yield entry['seq'], entry['payment']
+            except (ValueError, KeyError):
+                continue
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.journal_path, 'ab')
+
+    # -- appends --------------------------------------------------------
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records):
+        """Durably append records; returns once they are on disk"""
+        if not records:
+            return
+        with self._cond:
+            self._open()
+            first = self.seq + 1
+            for record in records:
+                self.seq += 1
+                self._pending.append(json.dumps({"seq": self.seq, "payment": record}).encode() + b"\n")
+            target = self.seq
+
+            while self._durable_seq < target:
+                if self._flushing:
+                    self._cond.wait()
+                else:
+                    self._flush_pending()
+
+            for low, high, error in self._failed:
+                if low <= target and first <= high:
+                    raise JournalWriteError(f"Could not persist payment: {error}")
+
+            if self.seq >= self._compact_at and not self._compacting:
+                self._rotate_locked()
+                threading.Thread(target=self._compact_in_background,
+                                 name="payment-journal-compact", daemon=True).start()
+
+    def _flush_pending(self):
+        """Write every pending line in one batch (called with the lock held)"""
+        batch, self._pending = self._pending, []
+        first, last = self._durable_seq + 1, self.seq
+        self._flushing = True
+        self._cond.release()
+        error = None
+        offset = None
+        try:
+            offset = self._file.tell()
+            self._file.write(b"".join(batch))
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        except OSError as e:
+            error = e
+        finally:
+            self._cond.acquire()
+            self._flushing = False
+            self._durable_seq = last
+            if error is not None:
+                self._failed.append((first, last, error))
+                if offset is not None:
+                    self._discard_torn(offset)
+            self._cond.notify_all()
+
+    def _discard_torn(self, offset):
+        """Cut a failed batch's partial bytes off the journal (lock held).
+
+        Otherwise the next batch would be appended to the torn line and
+        replay would skip its first record along with it.
+        """
+        try:
+            self._file.close()
+        except OSError:
+            pass  # the unwritten buffer goes with it
+        self._file = None
+        try:
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(offset)
+            self._open()
+        except OSError as e:
+            # The next append reopens the file; replay still cuts a torn final line
+            logger.warning("could not truncate payment journal", extra={"error": str(e)})
+
+    # -- snapshot / compaction ------------------------------------------
+    def compact(self):
+        """Fold the journal into the snapshot now, in the calling thread"""
+        with self._cond:
+            while self._compacting:
+                self._cond.wait()
+            self._open()
+            self._rotate_locked()
+        self._fold_segments()
+
+    def _rotate_locked(self):
+        """Move the journal aside as a segment and start a new one (lock held)"""
+        # Claimed before draining, which releases the lock while it writes
+        self._compacting = True
+        self._drain_locked()
+        self._compact_at = self.seq + self.snapshot_every
+        segment = f"{self.journal_path}.{self.seq}"
+        if os.path.exists(segment):
+            # Nothing appended since that segment was cut (an earlier fold failed)
+            return
+        self._file.close()
+        self._file = None
+        os.replace(self.journal_path, segment)
+        self._open()
+
+    def _segments(self):
+        """Rotated-out journal files as (last seq, path), oldest first"""
+        directory = os.path.dirname(self.journal_path) or "."
+        prefix = os.path.basename(self.journal_path) + "."
+        return sorted((int(name[len(prefix):]), os.path.join(directory, name))
+                      for name in os.listdir(directory)
+                      if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+    def _compact_in_background(self):
+        try:
+            self._fold_segments()
+        except Exception as e:
+            # The segments stay behind: replay reads them and the next compaction retries
+            logger.warning("payment journal compaction failed", extra={"error": str(e)})
+
+    def _fold_segments(self):
+        """Write snapshot + segments as the new snapshot, then delete the segments.
+
+        Runs without the lock: appends only touch the new journal, and one
+        compaction runs at a time (`_compacting`).
+        """
+        try:
+            records, seq = self._read_snapshot()
+            segments = self._segments()
+            for _, path in segments:
+                for line_seq, payment in self._read_journal(path):
+                    if line_seq > seq:
+                        records.append(payment)
+                        seq = line_seq
+            if segments:
+                seq = max(seq, segments[-1][0])
+
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"seq": seq, "payments": records}, f)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+            # Records up to the snapshot's seq are skipped on replay, so a
+            # crash before these deletes only leaves redundant segments behind.
+            for _, path in segments:
+                os.remove(path)
+        finally:
+            with self._cond:
+                self._compacting = False
+                self._cond.notify_all()
+
+    def _drain_locked(self):
+        """Wait until nothing is pending or in flight (lock held on return)"""
+        while self._flushing or self._pending:
+            if self._flushing:
+                self._cond.wait()
+            else:
+                self._flush_pending()
+
+    def close(self):
+        with self._cond:
+            while self._compacting:
+                self._cond.wait()
+            self._drain_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
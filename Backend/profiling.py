@@ -0,0 +1,255 @@
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+PROFILE_HEADER = "X-Profile"
+
+# Frames from files here are always shown in call paths; library frames in between are elided
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger("banking.profiling")
+
+
+def _frame_name(func):
+    filename, line, name = func
+    if filename == "~":
+        return name  # builtins, e.g. <method 'recv' of '_socket.socket' objects>
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def _compact(path):
+    """Project frames plus the last two frames of a chain; runs of other frames become '...'"""
+    shown = []
+    for i, func in enumerate(path):
+        if func[0].startswith(PROJECT_DIR) or i >= len(path) - 2:
+            shown.append(_frame_name(func))
+        elif not shown or shown[-1] != "...":
+            shown.append("...")
+    return shown
+
+
+def slowest_paths(stats, count=5, min_fraction=0.02, max_depth=40, max_paths=500):
+    """The `count` heaviest call chains in a pstats.Stats, as (ms, [frame names]).
+
+    Chains are followed from the profile's root through every call that
+    takes at least `min_fraction` of the total, and end at the deepest such
+    frame, so each one shows where a slice of the time actually went.
+    """
+    children = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((edge[3], func))
+    roots = [(entry[3], func) for func, entry in stats.stats.items() if not entry[4]]
+    if not roots:
+        return []
+    total = max(ct for ct, _ in roots)
+    threshold = total * min_fraction
+
+    paths = []
+
+    def walk(func, weight, path):
+        if len(paths) >= max_paths:
+            return
+        significant = [(ct, child) for ct, child in children.get(func, ()) if ct >= threshold and child not in path]
+        if not significant or len(path) >= max_depth:
+            paths.append((weight, path))
+            return
+        for ct, child in sorted(significant, reverse=True):
+            walk(child, ct, path + [child])
+
+    for ct, root in sorted(roots, reverse=True):
+        if ct >= threshold:
+            walk(root, ct, [root])
+    paths.sort(key=lambda p: p[0], reverse=True)
+    # Keep the heaviest chain through each sequence of project frames, so
+    # one slow call reached through several library internals is listed once
+    result, seen = [], set()
+    for weight, path in paths:
+        key = tuple(func for func in path if func[0].startswith(PROJECT_DIR))
+        if key not in seen:
+            seen.add(key)
+            result.append((weight * 1000, _compact(path)))
+    return result[:count]
+
+
+# ---------------------------------------------------------
+# Opt-in per-request profiling
+# ---------------------------------------------------------
+class RequestProfiler:
+    """Decides which requests to profile and writes their artifacts.
+
+    A request is profiled when it carries `X-Profile: <token>` (only if a
+    token is configured) or is picked at `sample_rate`. Each profiled
+    request leaves a `.prof` file (load it with pstats or snakeviz) and a
+    `.txt` summary with its slowest call paths and top functions in
+    `directory`; only the newest `keep` requests are kept. cProfile only
+    sees the thread that handled the request, so time spent waiting on the
+    Gemini pool shows up as the wait, not as Gemini's own frames.
+    """
+
+    def __init__(self, directory="profiles", sample_rate=0.0, token="", keep=200):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.token = token
+        self.keep = keep
+        self._active = threading.local()
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or bool(self.token)
+
+    def should_profile(self, header_value):
+        """'header', 'sampled' or None for a request with this X-Profile value"""
+        if header_value and self.token and hmac.compare_digest(header_value, self.token):
+            return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def start(self):
+        """A running cProfile.Profile, or None if this thread is already profiling"""
+        if getattr(self._active, "profile", None) is not None:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a developer's) is already attached
+            return None
+        self._active.profile = profile
+        return profile
+
+    def finish(self, profile, method, path, reason, elapsed):
+        """Stop `profile` and write its artifacts; returns the profile id"""
+        profile.disable()
+        self._active.profile = None
+        with self._lock:
+            self._counter += 1
+            profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._counter}"
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+        base = os.path.join(self.directory, f"{profile_id}-{method.lower()}-{slug}")
+
+        # A failed write costs the artifact, never the request
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profile.dump_stats(base + ".prof")
+            with open(base + ".txt", "w") as f:
+                f.write(self.summary(profile, method, path, reason, elapsed))
+            self._prune()
+        except OSError as e:
+            logger.warning("could not write request profile", extra={"path": base, "error": str(e)})
+        return profile_id
+
+    def summary(self, profile, method, path, reason, elapsed):
+        out = io.StringIO()
+        stats = pstats.Stats(profile, stream=out)
+        lines = [f"{method} {path}  {elapsed * 1000:.1f} ms  ({reason})", "", "Slowest call paths:"]
+        for ms, frames in slowest_paths(stats):
+            lines.append(f"  {ms:9.1f} ms  " + "\n               > ".join(frames))
+        for order, title in (("cumulative", "Top functions by cumulative time"), ("tottime", "Top functions by own time")):
+            out.seek(0)
+            out.truncate()
+            stats.sort_stats(order).print_stats(15)
+            lines += ["", f"{title}:", out.getvalue().split("\n\n", 1)[-1].rstrip()]
+        return "\n".join(lines) + "\n"
+
+    def _prune(self):
+        try:
+            names = sorted(n for n in os.listdir(self.directory) if n.endswith(".txt"))
+        except OSError:
+            return
+        for name in names[:-self.keep] if self.keep > 0 else ():
+            for suffix in (".txt", ".prof"):
+                try:
+                    os.remove(os.path.join(self.directory, name[:-4] + suffix))
+                except OSError:
+                    pass
+
+
+class ProfilingMiddleware:
+    """WSGI middleware: profile the requests RequestProfiler selects.
+
+    A profiled response is consumed inside the profile (so streamed
+    responses arrive in one piece) and gets an X-Profile-Id header naming
+    its artifacts. Other requests pass straight through.
+    """
+
+    def __init__(self, wsgi_app, profiler):
+        self.wsgi_app = wsgi_app
+        self.profiler = profiler
+
+    def __call__(self, environ, start_response):
+        reason = self.profiler.should_profile(environ.get("HTTP_X_PROFILE"))
+        if reason is None:
+            return self.wsgi_app(environ, start_response)
+        profile = self.profiler.start()
+        if profile is None:
+            return self.wsgi_app(environ, start_response)
+
+        captured = []
+        start = time.perf_counter()
+        try:
+            body = self.wsgi_app(environ, lambda status, headers, exc_info=None: captured.append((status, headers, exc_info)))
+            try:
+                chunks = list(body)
+            finally:
+                if hasattr(body, "close"):
+                    body.close()
+        finally:
+            profile_id = self.profiler.finish(profile, environ.get("REQUEST_METHOD", "GET"),
+                                              environ.get("PATH_INFO", "/"), reason, time.perf_counter() - start)
+        status, headers, exc_info = captured[-1]
+        start_response(status, list(headers) + [("X-Profile-Id", profile_id)], exc_info)
+        return chunks
+
+
+class ProfilingASGIMiddleware:
+    """ASGI counterpart of ProfilingMiddleware for the routes in `paths`.
+
+    Other paths are left to the mounted Flask app's WSGI middleware, which
+    runs in the thread that does the work. The profile covers the event
+    loop thread, so coroutines of concurrent requests can show up in it.
+    """
+
+    def __init__(self, app, profiler, paths=()):
+        self.app = app
+        self.profiler = profiler
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        header = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                header = value.decode("latin-1")
+                break
+        reason = self.profiler.should_profile(header)
+        profile = self.profiler.start() if reason else None
+        if profile is None:
+            return await self.app(scope, receive, send)
+
+        messages = []
+
+        async def capture(message):
+            messages.append(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            profile_id = self.profiler.finish(profile, scope["method"], scope["path"], reason,
+                                              time.perf_counter() - start)
+        for message in messages:
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]}
+            await send(message)
@@ -0,0 +1,63 @@
+import re
+from datetime import date, timedelta
+
+# Spending questions can name a period; everything else means all history
+PERIOD_PATTERN = re.compile(
+    r"\b(today|yesterday|this week|last week|this month|last month|this year|last year"
+    r"|(?:last|past) (\d+) days)\b"
+)
+MERCHANT_PATTERN = re.compile(
+    r"\b(?:on|at)\s+([a-z0-9][a-z0-9 .&'-]*?)\s*(?=\b(?:today|yesterday|this|last|past|in|over|during)\b|[?.!]|$)"
+)
+GRANULARITY_WORDS = (("day", "daily"), ("week", "weekly"), ("month", "monthly"))
+
+
+def parse_period(text, today=None):
+    """(start, end, label) for the period named in `text`; dates are inclusive, None means unbounded"""
+    today = today or date.today()
+    match = PERIOD_PATTERN.search(text.lower())
+    if not match:
+        return None, None, "in your history"
+
+    period = match.group(1)
+    if match.group(2):
+        days = int(match.group(2))
+        return today - timedelta(days=days - 1), today, f"in the last {days} days"
+    if period == "today":
+        return today, today, "today"
+    if period == "yesterday":
+        day = today - timedelta(days=1)
+        return day, day, "yesterday"
+    if period == "this week":
+        return today - timedelta(days=today.weekday()), today, "this week"
+    if period == "last week":
+        start = today - timedelta(days=today.weekday() + 7)
+        return start, start + timedelta(days=6), "last week"
+    if period == "this month":
+        return today.replace(day=1), today, "this month"
+    if period == "last month":
+        end = today.replace(day=1) - timedelta(days=1)
+        return end.replace(day=1), end, "last month"
+    if period == "this year":
+        return today.replace(month=1, day=1), today, "this year"
+    return date(today.year - 1, 1, 1), date(today.year - 1, 12, 31), "last year"
+
+
+def parse_merchant(text):
+    """The merchant named after 'on'/'at' in a spending or transactions question, if any"""
+    match = MERCHANT_PATTERN.search(text.lower())
+    if not match:
+        return None
+    name = match.group(1).strip()
+    if name in ("", "it", "that", "this", "average") or name.startswith("my "):
+        return None
+    return name
+
+
+def parse_granularity(text):
+    """'day', 'week' or 'month' (the default) for spending trend questions"""
+    text = text.lower()
+    for unit, adjective in GRANULARITY_WORDS:
+        if f"per {unit}" in text or f"each {unit}" in text or adjective in text:
+            return unit
+    return "month"
@@ -0,0 +1,347 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger("banking.resilience")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit breaker is open"""
+
+
+# ---------------------------------------------------------
+# Circuit breaker
+# ---------------------------------------------------------
+class CircuitBreaker:
+    """Fails fast while an upstream is unhealthy.
+
+    Closed, calls go through, and `failure_threshold` consecutive failures
+    open the breaker. Open, calls raise CircuitOpenError at once for
+    `reset_timeout` seconds. After that one trial call is let through
+    (half-open): success closes the breaker, failure opens it again.
+    Only exceptions for which `is_failure(exc)` is true count as failures;
+    anything else (a 404, a bad request) means the upstream answered.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, is_failure=None, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure or (lambda exc: True)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+
+    @property
+    def state(self):
+        return self._state
+
+    def _acquire(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._trial = False
+            if self._state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return
+            retry_in = max(0.0, self._opened_at + self.reset_timeout - self._clock())
+        metrics.BREAKER_REJECTIONS.inc(self.name)
+        raise CircuitOpenError(f"{self.name} is unavailable (circuit open, next try in {retry_in:.0f}s)")
+
+    def _release(self, exc=None):
+        with self._lock:
+            if exc is not None and not isinstance(exc, Exception):
+                # Cancelled or interrupted: says nothing about the upstream
+                self._trial = False
+                return
+            failed = exc is not None and self.is_failure(exc)
+            if self._state == HALF_OPEN:
+                self._trial = False
+                if failed:
+                    self._open()
+                else:
+                    self._close()
+            elif failed:
+                self._failures += 1
+                if self._state == CLOSED and self._failures >= self.failure_threshold:
+                    self._open()
+            else:
+                self._failures = 0
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = self._clock()
+        metrics.BREAKER_OPENS.inc(self.name)
+        logger.warning("circuit opened", extra={"breaker": self.name, "failures": self._failures,
+                                                "retry_in": self.reset_timeout})
+
+    def _close(self):
+        self._state = CLOSED
+        self._failures = 0
+        logger.info("circuit closed", extra={"breaker": self.name})
+
+    def call(self, fn, *args):
+        """fn(*args) unless the breaker is open (then CircuitOpenError)"""
+        self._acquire()
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            self._release(e)
+            raise
+        self._release()
+        return result
+
+    async def call_async(self, fn, *args):
+        """Await fn(*args) unless the breaker is open (then CircuitOpenError)"""
+        self._acquire()
+        try:
+            result = await fn(*args)
+        except BaseException as e:
+            self._release(e)
+            raise
+        self._release()
+        return result
+
+    def stats(self):
+        return {"state": self._state, "consecutive_failures": self._failures}
+
+
+# ---------------------------------------------------------
+# Single-flight coalescing
+# ---------------------------------------------------------
+class SingleFlight:
+    """Coalesces concurrent identical upstream calls.
+
+    The first caller of a key makes the call; callers arriving while it is
+    in flight wait for its result (or exception) instead of repeating it.
+    Unlike the batch-scoped UpstreamMemo, nothing outlives the call: the
+    next caller after it completes starts a new one. Threads and
+    coroutines are coalesced separately (do and do_async).
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._calls = {}  # key -> concurrent.futures.Future
+        self._tasks = {}  # key -> asyncio.Task, touched only from the event loop
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = self._calls[key] = Future()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not owner:
+            metrics.COALESCED.inc(self.source)
+            return future.result()
+
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            self._forget(key)
+            future.set_exception(e)
+            raise
+        self._forget(key)
+        future.set_result(result)
+        return result
+
+    def _forget(self, key):
+        with self._lock:
+            del self._calls[key]
+
+    async def do_async(self, key, fn, *args):
+        """Await fn(*args) (a coroutine function) once for all concurrent callers of `key`"""
+        task = self._tasks.get(key)
+        if task is None:
+            # A task of its own, so one caller giving up doesn't cancel it for the others
+            task = self._tasks[key] = asyncio.ensure_future(fn(*args))
+            task.add_done_callback(lambda done: self._task_done(key, done))
+            with self._lock:
+                self.calls += 1
+        else:
+            with self._lock:
+                self.coalesced += 1
+            metrics.COALESCED.inc(self.source)
+        return await asyncio.shield(task)
+
+    def _task_done(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here, in case every caller was cancelled
+
+    def stats(self):
+        return {"calls": self.calls, "coalesced": self.coalesced}
+
+
+# ---------------------------------------------------------
+# Stale-while-revalidate reads
+# ---------------------------------------------------------
+class StaleWhileRevalidate:
+    """Serves the last good value of an upstream read according to its age.
+
+    A value younger than `fresh_for` seconds is returned as is. For up to
+    `stale_while_revalidate` seconds after that it is still returned at
+    once, and a background refresh (one per key) replaces it. Older than
+    that, or with nothing stored, the caller refreshes through the circuit
+    breaker; if the upstream is failing (or the breaker is open) a value
+    up to `stale_if_error` seconds past its freshness is returned instead
+    of the error. Every read returns (value, age in seconds).
+
+    Refreshes of one key, in the foreground or background, are coalesced
+    (SingleFlight), so a burst of identical reads makes one upstream call
+    and counts once against the breaker.
+    """
+
+    def __init__(self, source, breaker, fresh_for, stale_while_revalidate=60.0, stale_if_error=3600.0, workers=2):
+        self.source = source
+        self.breaker = breaker
+        self.fresh_for = fresh_for
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.flights = SingleFlight(source)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"revalidate-{source}")
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._tasks = set()
+
+    def is_stale(self, age):
+        return age >= self.fresh_for
+
+    @property
+    def max_age(self):
+        """How long a stored value can still be of use"""
+        return self.fresh_for + max(self.stale_while_revalidate, self.stale_if_error)
+
+    def get(self, key, age, read, refresh, force=False):
+        """(value, age): `age` of the stored value (None if none), `read()` returns it, `refresh()` fetches a new one.
+
+        `force` always refreshes, and reports a failure instead of falling back.
+        """
+        plan = self._plan(age, force)
+        if plan == "revalidate":
+            self._revalidate(key, refresh)
+        if plan != "refresh":
+            return read(), age
+        try:
+            return self.flights.do(key, self.breaker.call, refresh), 0.0
+        except Exception as e:
+            if not self._serve_on_error(age, e, force):
+                raise
+        return self._stale(read, age)
+
+    async def get_async(self, key, age, read, refresh, force=False):
+        """get() for a coroutine function `refresh`; background refreshes run as tasks on the loop"""
+        plan = self._plan(age, force)
+        if plan == "revalidate":
+            self._revalidate_async(key, refresh)
+        if plan != "refresh":
+            return read(), age
+        try:
+            return await self.flights.do_async(key, self.breaker.call_async, refresh), 0.0
+        except Exception as e:
+            if not self._serve_on_error(age, e, force):
+                raise
+        return self._stale(read, age)
+
+    def get_cached(self, cache, key, fetch, force=False):
+        """get() over a cache holding [fetched_at, value] entries (wall clock, so they can be shared)"""
+        entry = cache.get(key)
+
+        def refresh():
+            value = fetch()
+            cache.set(key, [time.time(), value])
+            return value
+        age = max(0.0, time.time() - entry[0]) if entry else None
+        return self.get(key, age, lambda: entry[1], refresh, force)
+
+    async def get_cached_async(self, cache, key, fetch, force=False):
+        """get_cached() through the cache's async API, so a SQLite cache doesn't block the loop"""
+        entry = await cache.get_async(key)
+
+        async def refresh():
+            value = await fetch()
+            await cache.set_async(key, [time.time(), value])
+            return value
+        age = max(0.0, time.time() - entry[0]) if entry else None
+        return await self.get_async(key, age, lambda: entry[1], refresh, force)
+
+    def _plan(self, age, force):
+        if age is None or force:
+            return "refresh"
+        if age < self.fresh_for:
+            return "fresh"
+        if age < self.fresh_for + self.stale_while_revalidate:
+            metrics.STALE_SERVED.inc(self.source, "revalidate")
+            return "revalidate"
+        return "refresh"
+
+    def _stale(self, read, age):
+        logger.debug("serving stale data", extra={"source": self.source, "age": round(age, 1)})
+        metrics.STALE_SERVED.inc(self.source, "error")
+        return read(), age
+
+    def _serve_on_error(self, age, exc, force):
+        return (not force and age is not None and age < self.fresh_for + self.stale_if_error
+                and (isinstance(exc, CircuitOpenError) or self.breaker.is_failure(exc)))
+
+    def _claim(self, key):
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            return True
+
+    def _done(self, key):
+        with self._lock:
+            self._pending.discard(key)
+
+    def _revalidate(self, key, refresh):
+        if self._claim(key):
+            self._executor.submit(self._run_refresh, key, refresh)
+
+    def _run_refresh(self, key, refresh):
+        try:
+            self.flights.do(key, self.breaker.call, refresh)
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            logger.warning("background refresh failed", extra={"source": self.source, "error": str(e)})
+        finally:
+            self._done(key)
+
+    def _revalidate_async(self, key, refresh):
+        if not self._claim(key):
+            return
+        task = asyncio.create_task(self._run_refresh_async(key, refresh))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_refresh_async(self, key, refresh):
+        try:
+            await self.flights.do_async(key, self.breaker.call_async, refresh)
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            logger.warning("background refresh failed", extra={"source": self.source, "error": str(e)})
+        finally:
+            self._done(key)
@@ -0,0 +1,97 @@
+import contextlib
+import heapq
+import threading
+import time
+
+
+class Session:
+    """Conversation state for one user"""
+    __slots__ = ('user_id', 'payment_mode', 'current_payee', 'current_amount', 'last_active', 'expires_at')
+
+    def __init__(self, user_id, now):
+        self.user_id = user_id
+        self.payment_mode = False
+        self.current_payee = None
+        self.current_amount = None
+        self.last_active = now
+        self.expires_at = now  # deadline of this session's expiry-heap entry
+
+    def __lt__(self, other):
+        # Sessions sit in the expiry heap directly, ordered by their deadline
+        return self.expires_at < other.expires_at
+
+
+# ---------------------------------------------------------
+# Session store with heap-scheduled expiry
+# ---------------------------------------------------------
+class SessionStore:
+    """User sessions that expire `ttl` seconds after their last activity.
+
+    Expiry is tracked with a min-heap holding each session once, ordered
+    by `expires_at`. Touching a session only updates `last_active`; when it
+    comes due in the heap it is either evicted or re-queued at its real
+    deadline. Each request therefore pays amortized O(log n) at most, and
+    nothing scans the whole store.
+    """
+
+    def __init__(self, ttl=3600, clock=time.time):
+        self.ttl = ttl
+        self._clock = clock
+        self._sessions = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return the user's session, creating it if needed, and mark it active"""
+        now = self._clock()
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None:
+                session = Session(user_id, now)
+                session.expires_at = now + self.ttl
+                self._sessions[user_id] = session
+                heapq.heappush(self._heap, session)
+            else:
+                session.last_active = now
+            return session
+
+    @contextlib.contextmanager
+    def checkout(self, user_id):
+        """Hold the user's session for the length of one request.
+
+        Sessions live in this process, so changes are visible as soon as they
+        are made; shared backends use this to load and write back the row.
+        """
+        yield self.get(user_id)
+
+    def save(self, session):
+        pass
+
+    def pop(self, user_id):
+        with self._lock:
+            return self._sessions.pop(user_id, None)
+
+    def evict_expired(self):
+        """Drop sessions idle for longer than the ttl; returns how many were evicted"""
+        now = self._clock()
+        evicted = 0
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0].expires_at <= now:
+                session = heapq.heappop(heap)
+                if self._sessions.get(session.user_id) is not session:
+                    continue  # already removed (or replaced)
+                deadline = session.last_active + self.ttl
+                if deadline <= now:
+                    del self._sessions[session.user_id]
+                    evicted += 1
+                else:
+                    session.expires_at = deadline
+                    heapq.heappush(heap, session)
+        return evicted
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, user_id):
+        return user_id in self._sessions
@@ -0,0 +1,169 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from query_parsing import parse_granularity, parse_merchant, parse_period  # noqa: F401 (re-exported)
+
+_EPOCH = date(1970, 1, 1)
+
+
+def _day_number(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return (value - _EPOCH).days
+
+
+def _factorize(values):
+    """(codes, labels): an int32 code per value and the distinct labels in first-seen order"""
+    lookup = {}
+    codes = np.fromiter((lookup.setdefault(v, len(lookup)) for v in values), dtype=np.int32, count=len(values))
+    return codes, list(lookup)
+
+
+# ---------------------------------------------------------
+# Columnar spending analytics
+# ---------------------------------------------------------
+class SpendingAnalytics:
+    """One account's transactions as NumPy columns.
+
+    Amounts, day numbers and merchant/category codes are parallel arrays,
+    and the week and month of each row are precomputed at build time. A
+    summary is then one boolean mask plus `np.bincount` reductions: totals,
+    per-merchant and per-category breakdowns, and daily, weekly and monthly
+    buckets come from the same masked slice, with no Python loop over rows.
+    """
+
+    def __init__(self, days, amounts, merchant_codes, merchants, category_codes, categories):
+        self.days = np.asarray(days, dtype=np.int64)
+        self.amounts = np.asarray(amounts, dtype=np.float64)
+        self.merchant_codes = np.asarray(merchant_codes, dtype=np.int32)
+        self.merchants = merchants
+        self.category_codes = np.asarray(category_codes, dtype=np.int32)
+        self.categories = categories
+
+        # Weeks start on Monday (day 0, 1970-01-01, was a Thursday)
+        self.weeks = (self.days + 3) // 7
+        self.months = self.days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+    @classmethod
+    def from_columns(cls, dates, descriptions, amounts, categories, extract_name=None):
+        """Build from parallel lists; `extract_name` maps a description to its merchant"""
+        # Histories have far fewer distinct dates than rows, so parse each once
+        date_codes, distinct_dates = _factorize(dates)
+        distinct_days = np.array([d[:10] if d else '1970-01-01' for d in distinct_dates], dtype='datetime64[D]')
+        days = distinct_days.astype(np.int64)[date_codes]
+        amounts = np.array([a if a is not None else 0.0 for a in amounts], dtype=np.float64)
+
+        # Names are extracted once per distinct description, not once per row
+        description_codes, distinct = _factorize([d or '' for d in descriptions])
+        if extract_name is not None:
+            distinct = [extract_name(d) or d or 'Unknown' for d in distinct]
+        merchant_lookup, merchants = _factorize(distinct)
+        merchant_codes = merchant_lookup[description_codes]
+
+        category_codes, category_labels = _factorize([c or 'uncategorized' for c in categories])
+        return cls(days, amounts, merchant_codes, merchants, category_codes, category_labels)
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def find_merchant(self, name):
+        """Codes of merchants whose name contains `name` (case-insensitive)"""
+        name = name.lower()
+        return [code for code, merchant in enumerate(self.merchants) if name in merchant.lower()]
+
+    def summary(self, start=None, end=None, merchant=None, top=5):
+        """Spending between `start` and `end` (dates or ISO strings, inclusive).
+
+        `merchant` restricts everything to merchants whose name contains
+        it. Breakdowns list the `top` largest entries; buckets list every
+        period with spending, oldest first. `periods` counts the calendar
+        days, weeks and months the range covers (an open end is bounded by
+        the history), for averages that include periods with no spending.
+        """
+        in_range = np.ones(len(self.amounts), dtype=bool)
+        start_day, end_day = _day_number(start), _day_number(end)
+        if start_day is not None:
+            in_range &= self.days >= start_day
+        if end_day is not None:
+            in_range &= self.days <= end_day
+        merchant_codes = None
+        if merchant:
+            merchant_codes = self.find_merchant(merchant)
+            in_range &= np.isin(self.merchant_codes, merchant_codes)
+
+        expense = in_range & (self.amounts < 0)
+        spent = -self.amounts[expense]
+        merchant_ids = self.merchant_codes[expense]
+        category_ids = self.category_codes[expense]
+
+        return {
+            "start": start.isoformat() if isinstance(start, date) else start,
+            "end": end.isoformat() if isinstance(end, date) else end,
+            "merchant": merchant,
+            "matched_merchants": [self.merchants[c] for c in merchant_codes] if merchant_codes is not None else None,
+            "total_spent": round(float(spent.sum()), 2),
+            "num_expenses": int(spent.size),
+            "total_income": round(float(self.amounts[in_range & (self.amounts > 0)].sum()), 2),
+            "by_merchant": self._breakdown(merchant_ids, spent, self.merchants, "merchant", top),
+            "by_category": self._breakdown(category_ids, spent, self.categories, "category", top),
+            "daily": self._buckets(self.days[expense], spent, _format_day),
+            "weekly": self._buckets(self.weeks[expense], spent, _format_week),
+            "monthly": self._buckets(self.months[expense], spent, _format_month),
+            "periods": self._periods(start_day, end_day),
+        }
+
+    def _periods(self, start_day, end_day):
+        if start_day is None or end_day is None:
+            if not len(self.days):
+                return {"day": 0, "week": 0, "month": 0}
+            start_day = int(self.days.min()) if start_day is None else start_day
+            end_day = int(self.days.max()) if end_day is None else end_day
+        if end_day < start_day:
+            return {"day": 0, "week": 0, "month": 0}
+        return {
+            "day": end_day - start_day + 1,
+            "week": (end_day + 3) // 7 - (start_day + 3) // 7 + 1,
+            "month": _month_number(end_day) - _month_number(start_day) + 1,
+        }
+
+    @staticmethod
+    def _breakdown(codes, spent, labels, key, top):
+        totals = np.bincount(codes, weights=spent, minlength=len(labels))
+        counts = np.bincount(codes, minlength=len(labels))
+        order = np.argsort(-totals, kind='stable')
+        order = order[totals[order] > 0]
+        if top:
+            order = order[:top]
+        return [
+            {key: labels[i], "amount": round(float(totals[i]), 2), "count": int(counts[i])}
+            for i in order
+        ]
+
+    @staticmethod
+    def _buckets(periods, spent, label):
+        if not periods.size:
+            return []
+        first = periods.min()
+        totals = np.bincount(periods - first, weights=spent)
+        nonzero = np.flatnonzero(totals)
+        return [{"period": label(int(first + i)), "amount": round(float(totals[i]), 2)} for i in nonzero]
+
+
+def _month_number(day):
+    return int(np.datetime64(day, 'D').astype('datetime64[M]').astype(np.int64))
+
+
+def _format_day(day):
+    return (_EPOCH + timedelta(days=day)).isoformat()
+
+
+def _format_week(week):
+    # Week n starts on the Monday 7n - 3 days after the epoch
+    return _format_day(week * 7 - 3)
+
+
+def _format_month(month):
+    return f"{1970 + month // 12:04d}-{month % 12 + 1:02d}"
@@ -0,0 +1,52 @@
+import contextlib
+import os
+import sqlite3
+import threading
+
+
+# ---------------------------------------------------------
+# SQLite database shared by threads and worker processes
+# ---------------------------------------------------------
+class SQLiteDatabase:
+    """One SQLite file in WAL mode.
+
+    WAL lets any number of readers (threads or worker processes) proceed
+    while one writer commits. Connections are per thread and per process,
+    so one is never used from two threads or reused across a fork.
+    """
+
+    def __init__(self, path, schema="", busy_timeout=30.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        if schema:
+            self.connection().executescript(schema)
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Write transaction; BEGIN IMMEDIATE takes the write lock up front"""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
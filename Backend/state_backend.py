@@ -0,0 +1,485 @@
+import asyncio
+import contextlib
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+from cache import TTLCache
+from payment_journal import PaymentJournal
+from session_store import Session, SessionStore
+from sqlite_db import SQLiteDatabase
+
+logger = logging.getLogger("banking.state")
+
+_payment_counter = itertools.count(1)
+
+
+def new_payment_id():
+    """Payment id unique across threads and processes (time, pid, counter)"""
+    return f"sim_pay_{time.time_ns()}_{os.getpid()}_{next(_payment_counter)}"
+
+
+def _fund_in_order(records, available, atomic):
+    """Which payments `available` covers, taken in order (all or none if atomic)"""
+    if atomic:
+        covered = sum(r['amount'] for r in records) <= available
+        return [covered] * len(records)
+    accepted = []
+    for record in records:
+        ok = record['amount'] <= available
+        if ok:
+            available -= record['amount']
+        accepted.append(ok)
+    return accepted
+
+
+class LockStripes:
+    """A fixed pool of locks; keys hash onto one, so unrelated keys rarely contend"""
+
+    def __init__(self, stripes=64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def lock_for(self, key):
+        return self._locks[hash(key) % len(self._locks)]
+
+
+# ---------------------------------------------------------
+# In-process state (single worker)
+# ---------------------------------------------------------
+class JournalLedger:
+    """Payment history backed by the snapshot + journal files.
+
+    Keeps every record and a running total of completed payments per
+    account in memory, so it is only correct with one server process.
+    """
+
+    def __init__(self, payments_file, fsync=True, snapshot_every=10000):
+        self.journal = PaymentJournal(payments_file, fsync=fsync, snapshot_every=snapshot_every)
+        self._lock = threading.Lock()
+        self._account_locks = LockStripes()
+        self.load()
+
+    def load(self):
+        """Rebuild history and totals by replaying the snapshot and journal"""
+        try:
+            records = self.journal.load()
+        except Exception as e:
+            logger.warning("could not load payments", extra={"error": str(e)})
+            records = []
+        with self._lock:
+            self.records = records
+            self.completed_totals = {}
+            self._apply_to_totals(records)
+
+    def _apply_to_totals(self, records):
+        for payment in records:
+            if payment.get('status') == 'completed':
+                account_id = payment.get('account_id')
+                self.completed_totals[account_id] = self.completed_totals.get(account_id, 0.0) + float(payment['amount'])
+
+    def append_many(self, records):
+        """Durably journal payments, then add them to the in-memory history"""
+        self.journal.append_many(records)
+        with self._lock:
+            self.records.extend(records)
+            self._apply_to_totals(records)
+
+    def completed_total(self, account_id):
+        return self.completed_totals.get(account_id, 0.0)
+
+    async def completed_total_async(self, account_id):
+        return self.completed_total(account_id)
+
+    def reserve(self, record, real_balance):
+        """Record a payment only if the account can cover it.
+
+        The funds check and the append happen under the account's lock, so
+        concurrent payments from one account can never overdraw it while
+        payments from different accounts proceed in parallel. Returns
+        (accepted, available balance before this payment).
+        """
+        accepted, available = self.reserve_many([record], real_balance)
+        return accepted[0], available
+
+    def reserve_many(self, records, real_balance, atomic=False):
+        """Record a batch of payments from one account in a single journal write.
+
+        Payments are checked in order against the running available balance.
+        With `atomic` either all are recorded or none are. Returns (one
+        accepted flag per record, available balance before the batch).
+        """
+        account_id = records[0].get('account_id') if records else None
+        with self._account_locks.lock_for(account_id):
+            available = real_balance - self.completed_total(account_id)
+            accepted = _fund_in_order(records, available, atomic)
+            self.append_many([r for r, ok in zip(records, accepted) if ok])
+            return accepted, available
+
+    def recent(self, count):
+        """The last `count` payments, oldest first"""
+        with self._lock:
+            return self.records[-count:]
+
+    def __len__(self):
+        return len(self.records)
+
+    def close(self):
+        self.journal.close()
+
+
+class MemoryStateBackend:
+    """Sessions, ledger and caches held in this process (the default)"""
+
+    name = "memory"
+
+    def __init__(self, payments_file="simulated_payments.json", fsync=True, snapshot_every=10000):
+        self.payments_file = payments_file
+        self.fsync = fsync
+        self.snapshot_every = snapshot_every
+
+    def sessions(self, ttl):
+        return SessionStore(ttl=ttl)
+
+    def ledger(self):
+        return JournalLedger(self.payments_file, fsync=self.fsync, snapshot_every=self.snapshot_every)
+
+    def cache(self, namespace, ttl, maxsize):
+        return TTLCache(ttl=ttl, maxsize=maxsize)
+
+    def close(self):
+        pass
+
+
+# ---------------------------------------------------------
+# SQLite (WAL) state shared by every worker on the host
+# ---------------------------------------------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id TEXT PRIMARY KEY,
+    payment_mode INTEGER NOT NULL,
+    current_payee TEXT,
+    current_amount REAL,
+    last_active REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_last_active ON sessions (last_active);
+
+CREATE TABLE IF NOT EXISTS payments (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    account_id TEXT,
+    status TEXT,
+    amount REAL,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS account_totals (
+    account_id TEXT PRIMARY KEY,
+    completed REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (namespace, expires_at);
+"""
+
+
+class SQLiteStateBackend(SQLiteDatabase):
+    """State in one SQLite database in WAL mode.
+
+    Every write is a short transaction, so gunicorn workers on the same
+    host see the same sessions, payments and cached upstream data.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, legacy_payments_file=None, busy_timeout=30.0):
+        super().__init__(path, SCHEMA, busy_timeout=busy_timeout)
+        self.legacy_payments_file = legacy_payments_file
+
+    def sessions(self, ttl):
+        return SQLiteSessionStore(self, ttl=ttl)
+
+    def ledger(self):
+        return SQLiteLedger(self, legacy_payments_file=self.legacy_payments_file)
+
+    def cache(self, namespace, ttl, maxsize):
+        return SQLiteCache(self, namespace, ttl=ttl, maxsize=maxsize)
+
+
+class SQLiteSessionStore:
+    """SessionStore with rows in SQLite.
+
+    A request checks its session out once: the row is read at the start and
+    written back at the end, and nested `get` calls in the same request
+    (thread or task) return the same object.
+    """
+
+    def __init__(self, backend, ttl=3600, clock=time.time, evict_interval=30.0):
+        self.backend = backend
+        self.ttl = ttl
+        self._clock = clock
+        self.evict_interval = evict_interval
+        self._next_eviction = 0.0
+        self._checked_out = contextvars.ContextVar(f"sessions_{id(self)}", default={})
+
+    def _load(self, user_id, now):
+        row = self.backend.connection().execute(
+            "SELECT payment_mode, current_payee, current_amount FROM sessions "
+            "WHERE user_id = ? AND last_active > ?",
+            (user_id, now - self.ttl)
+        ).fetchone()
+        session = Session(user_id, now)
+        session.expires_at = now + self.ttl
+        if row is not None:
+            session.payment_mode = bool(row[0])
+            session.current_payee = row[1]
+            session.current_amount = row[2]
+        return session
+
+    def get(self, user_id):
+        """Return the user's session, creating it if needed, and mark it active"""
+        session = self._checked_out.get().get(user_id)
+        if session is not None:
+            session.last_active = self._clock()
+            return session
+        session = self._load(user_id, self._clock())
+        self.save(session)
+        return session
+
+    @contextlib.contextmanager
+    def checkout(self, user_id):
+        checked_out = self._checked_out.get()
+        if user_id in checked_out:
+            yield self.get(user_id)
+            return
+
+        session = self._load(user_id, self._clock())
+        token = self._checked_out.set({**checked_out, user_id: session})
+        try:
+            yield session
+        finally:
+            self._checked_out.reset(token)
+            if session.expires_at is not None:
+                self.save(session)
+
+    def save(self, session):
+        with self.backend.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)",
+                (session.user_id, int(session.payment_mode), session.current_payee,
+                 session.current_amount, session.last_active)
+            )
+
+    def pop(self, user_id):
+        session = self._checked_out.get().get(user_id)
+        if session is not None:
+            session.expires_at = None  # don't write it back at checkout exit
+        with self.backend.transaction() as conn:
+            conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+        return session
+
+    def evict_expired(self):
+        """Drop sessions idle for longer than the ttl, at most every `evict_interval` seconds"""
+        now = self._clock()
+        if now < self._next_eviction:
+            return 0
+        self._next_eviction = now + self.evict_interval
+        with self.backend.transaction() as conn:
+            return conn.execute("DELETE FROM sessions WHERE last_active <= ?", (now - self.ttl,)).rowcount
+
+    def __len__(self):
+        return self.backend.connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def __contains__(self, user_id):
+        return self.backend.connection().execute(
+            "SELECT 1 FROM sessions WHERE user_id = ?", (user_id,)
+        ).fetchone() is not None
+
+
+class SQLiteLedger:
+    """Payment history in SQLite with per-account completed totals.
+
+    Totals are kept in their own table, updated in the same transaction as
+    the insert, so adjusting a balance is a single-row lookup however many
+    payments exist and whichever worker recorded them.
+    """
+
+    def __init__(self, backend, legacy_payments_file=None):
+        self.backend = backend
+        if legacy_payments_file:
+            self._import_legacy(legacy_payments_file)
+
+    def _import_legacy(self, payments_file):
+        """Seed an empty ledger from the snapshot + journal files (first start only)"""
+        journal = PaymentJournal(payments_file)
+        # A snapshot exists only after compaction; recent payments may be in the journal alone
+        if not journal.exists():
+            return
+        with self.backend.transaction() as conn:
+            if conn.execute("SELECT 1 FROM payments LIMIT 1").fetchone() is not None:
+                return
+            try:
+                records = journal.load()
+            finally:
+                journal.close()
+            self._insert(conn, records)
+        if records:
+            logger.info("imported legacy payments", extra={"payments": len(records), "source": payments_file})
+
+    def _insert(self, conn, records):
+        conn.executemany(
+            "INSERT INTO payments (account_id, status, amount, record) VALUES (?, ?, ?, ?)",
+            [(r.get('account_id'), r.get('status'), float(r.get('amount', 0)), json.dumps(r)) for r in records]
+        )
+        totals = {}
+        for r in records:
+            if r.get('status') == 'completed':
+                account_id = r.get('account_id') or ''
+                totals[account_id] = totals.get(account_id, 0.0) + float(r['amount'])
+        conn.executemany(
+            "INSERT INTO account_totals VALUES (?, ?) "
+            "ON CONFLICT (account_id) DO UPDATE SET completed = completed + excluded.completed",
+            list(totals.items())
+        )
+
+    def append_many(self, records):
+        """Record payments atomically (all or none)"""
+        if not records:
+            return
+        with self.backend.transaction() as conn:
+            self._insert(conn, records)
+
+    def completed_total(self, account_id, conn=None):
+        row = (conn or self.backend.connection()).execute(
+            "SELECT completed FROM account_totals WHERE account_id = ?", (account_id or '',)
+        ).fetchone()
+        return row[0] if row else 0.0
+
+    async def completed_total_async(self, account_id):
+        """completed_total() off the event loop (a SQLite read)"""
+        return await asyncio.to_thread(self.completed_total, account_id)
+
+    def reserve(self, record, real_balance):
+        """Record a payment only if the account can cover it.
+
+        Check and insert share one BEGIN IMMEDIATE transaction, which holds
+        the database write lock, so no other thread or worker can record a
+        payment in between. Returns (accepted, available balance before).
+        """
+        accepted, available = self.reserve_many([record], real_balance)
+        return accepted[0], available
+
+    def reserve_many(self, records, real_balance, atomic=False):
+        """Record a batch of payments from one account in one transaction.
+
+        Same contract as JournalLedger.reserve_many.
+        """
+        account_id = records[0].get('account_id') if records else None
+        with self.backend.transaction() as conn:
+            available = real_balance - self.completed_total(account_id, conn)
+            accepted = _fund_in_order(records, available, atomic)
+            self._insert(conn, [r for r, ok in zip(records, accepted) if ok])
+            return accepted, available
+
+    def recent(self, count):
+        """The last `count` payments, oldest first"""
+        rows = self.backend.connection().execute(
+            "SELECT record FROM payments ORDER BY seq DESC LIMIT ?", (count,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    def __len__(self):
+        return self.backend.connection().execute("SELECT COUNT(*) FROM payments").fetchone()[0]
+
+    def close(self):
+        pass
+
+
+class SQLiteCache:
+    """TTLCache lookalike whose entries are shared through SQLite.
+
+    Keys and values must be JSON-serializable. Expiry uses wall-clock time
+    since it is compared across processes. Hit/miss counters are per
+    process.
+    """
+
+    def __init__(self, backend, namespace, ttl, maxsize=1024, clock=time.time, purge_every=100):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self.purge_every = purge_every
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        row = self.backend.connection().execute(
+            "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (self.namespace, json.dumps(key), self._clock())
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        now = self._clock()
+        with self.backend.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (self.namespace, json.dumps(key), json.dumps(value), now + ttl)
+            )
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                self._purge(conn, now)
+
+    def _purge(self, conn, now):
+        """Drop expired entries, then the soonest-expiring ones beyond maxsize"""
+        conn.execute("DELETE FROM cache WHERE namespace = ? AND expires_at <= ?", (self.namespace, now))
+        conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key IN ("
+            "SELECT key FROM cache WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.maxsize)
+        )
+
+    async def get_async(self, key, default=None):
+        """get() off the event loop: SQLite calls block, writes up to busy_timeout"""
+        return await asyncio.to_thread(self.get, key, default)
+
+    async def set_async(self, key, value, ttl=None):
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    def invalidate(self, key):
+        with self.backend.transaction() as conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, json.dumps(key)))
+
+    def clear(self):
+        with self.backend.transaction() as conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self):
+        return self.backend.connection().execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self),
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
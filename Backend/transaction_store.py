@@ -0,0 +1,273 @@
+import json
+import threading
+import time
+
+from sqlite_db import SQLiteDatabase
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    account_id TEXT NOT NULL,
+    date TEXT,
+    description TEXT,
+    amount REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_account_seq ON transactions (account_id, seq);
+CREATE INDEX IF NOT EXISTS transactions_account_date ON transactions (account_id, date);
+-- NOCASE to serve search()'s case-insensitive description lookups (replaces a case-sensitive one)
+DROP INDEX IF EXISTS transactions_account_description;
+CREATE INDEX IF NOT EXISTS transactions_account_description_nocase
+    ON transactions (account_id, description COLLATE NOCASE);
+-- Pending transactions are re-fetched on every sync until they post
+CREATE INDEX IF NOT EXISTS transactions_pending
+    ON transactions (account_id, seq) WHERE json_extract(data, '$.status') = 'pending';
+
+CREATE TABLE IF NOT EXISTS transaction_sync (
+    account_id TEXT PRIMARY KEY,
+    cursor TEXT,
+    last_sync REAL NOT NULL
+);
+-- Bumped whenever a sync changes stored rows; MAX(seq) and COUNT(*) miss updates and deletes
+CREATE TABLE IF NOT EXISTS transaction_revisions (
+    account_id TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+"""
+
+
+# ---------------------------------------------------------
+# Local transaction store with incremental Teller sync
+# ---------------------------------------------------------
+class TransactionStore(SQLiteDatabase):
+    """Teller transactions mirrored into SQLite.
+
+    Rows keep Teller's JSON verbatim. `seq` follows Teller's order (higher
+    is newer), so reads return exactly what the API would. Each account
+    has a cursor, the id of the newest stored posted transaction. A sync
+    pages through what came after it, and the first sync backfills up to
+    `backfill` rows of history. Sync state is in the database, so worker
+    processes sharing the file don't all hit Teller.
+
+    Each sync also re-reads an overlap window behind the cursor: the
+    newest `overlap` stored rows, extended back to the oldest one still
+    pending. Rows in it that changed upstream are updated and rows that
+    disappeared (a pending charge dropped or re-issued once posted) are
+    deleted. The overlap usually falls in the page a sync fetches anyway.
+    """
+
+    def __init__(self, path, page_size=100, backfill=500, max_pages=20, overlap=20, busy_timeout=30.0):
+        super().__init__(path, SCHEMA, busy_timeout=busy_timeout)
+        self.page_size = page_size
+        self.backfill = backfill
+        self.max_pages = max_pages
+        self.overlap = overlap
+        self._sync_lock = threading.Lock()
+
+    def _claim_sync(self, account_id, max_age):
+        """Mark the account as syncing if it is stale.
+
+        Returns (cursor, previous last_sync), or None if it is fresh.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT cursor, last_sync FROM transaction_sync WHERE account_id = ?", (account_id,)
+            ).fetchone()
+            if row is not None and now - row[1] < max_age:
+                return None
+            conn.execute(
+                "INSERT INTO transaction_sync VALUES (?, ?, ?) "
+                "ON CONFLICT (account_id) DO UPDATE SET last_sync = excluded.last_sync",
+                (account_id, None, now)
+            )
+            return (row[0], row[1]) if row else (None, 0)
+
+    def sync(self, account_id, fetch_page, max_age=0):
+        """Store transactions newer than the account's cursor, and reconcile the overlap window.
+
+        `fetch_page(count, from_id)` returns transactions newest first,
+        starting after `from_id` when given (Teller's pagination contract).
+        Nothing is fetched if another thread or worker synced within
+        `max_age` seconds. Returns the number of transactions fetched ahead
+        of the cursor (still-pending ones included).
+        """
+        with self._sync_lock:
+            claim = self._claim_sync(account_id, max_age)
+            if claim is None:
+                return 0
+            cursor, previous = claim
+            try:
+                window = self._overlap_window(account_id) if cursor is not None else 0
+                fetched, new_count = self._fetch_since(fetch_page, cursor, window)
+            except Exception:
+                # Put back the last successful sync: the data's age stays
+                # honest, and (being stale) the next request retries
+                with self.transaction() as conn:
+                    conn.execute("UPDATE transaction_sync SET last_sync = ? WHERE account_id = ?",
+                                 (previous, account_id))
+                raise
+
+            with self.transaction() as conn:
+                # Oldest first, so newer transactions get higher seq
+                changed = conn.executemany(
+                    "INSERT INTO transactions (id, account_id, date, description, amount, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET date = excluded.date, "
+                    "description = excluded.description, amount = excluded.amount, data = excluded.data "
+                    "WHERE data != excluded.data",
+                    [(t['id'], account_id, t.get('date'), t.get('description'), _amount(t), json.dumps(t))
+                     for t in reversed(fetched)]
+                ).rowcount
+                if new_count < len(fetched):
+                    changed += self._delete_missing(conn, account_id, fetched)
+                if changed:
+                    conn.execute(
+                        "INSERT INTO transaction_revisions VALUES (?, 1) "
+                        "ON CONFLICT (account_id) DO UPDATE SET revision = revision + 1",
+                        (account_id,)
+                    )
+                # Pending rows can vanish upstream, so the cursor is the newest posted one
+                anchor = next((t for t in fetched if t.get('status') != 'pending'), None)
+                if anchor is not None:
+                    conn.execute("UPDATE transaction_sync SET cursor = ? WHERE account_id = ?",
+                                 (anchor['id'], account_id))
+            return new_count
+
+    def _overlap_window(self, account_id):
+        """How many of the newest stored rows to re-read: `overlap`, or back to the oldest pending one"""
+        conn = self.connection()
+        stored = conn.execute("SELECT COUNT(*) FROM transactions WHERE account_id = ?", (account_id,)).fetchone()[0]
+        pending = conn.execute(
+            "SELECT COUNT(*) FROM transactions WHERE account_id = ? AND seq >= ("
+            "SELECT MIN(seq) FROM transactions WHERE account_id = ? AND json_extract(data, '$.status') = 'pending')",
+            (account_id, account_id)
+        ).fetchone()[0]
+        return max(min(self.overlap, stored), pending)
+
+    def _fetch_since(self, fetch_page, cursor, window):
+        """(fetched, new count): rows newer than `cursor`, then `window` rows from the cursor back.
+
+        Newest first. Without a cursor, up to `backfill` rows (all new).
+        """
+        limit = self.backfill if cursor is None else self.page_size * self.max_pages
+        fetched = []
+        found = None  # position of the cursor in `fetched`
+        from_id = None
+        while len(fetched) < limit:
+            page = fetch_page(min(self.page_size, limit - len(fetched)), from_id)
+            for transaction in page:
+                if found is None and cursor is not None and transaction.get('id') == cursor:
+                    found = len(fetched)
+                fetched.append(transaction)
+            if found is not None and len(fetched) - found >= window:
+                break
+            if len(page) < self.page_size or not page:
+                break
+            from_id = page[-1].get('id')
+        if found is None:
+            return fetched, len(fetched)
+        return fetched[:found + window], found
+
+    def _delete_missing(self, conn, account_id, fetched):
+        """Delete stored rows from the oldest fetched one up that Teller no longer returns"""
+        oldest = conn.execute("SELECT seq FROM transactions WHERE id = ?", (fetched[-1]['id'],)).fetchone()
+        if oldest is None:
+            return 0
+        ids = {t['id'] for t in fetched}
+        stale = [row[0] for row in conn.execute(
+            "SELECT id FROM transactions WHERE account_id = ? AND seq >= ?", (account_id, oldest[0])
+        ) if row[0] not in ids]
+        conn.executemany("DELETE FROM transactions WHERE id = ?", [(i,) for i in stale])
+        return len(stale)
+
+    def last_sync(self, account_id):
+        """When the account was last synced (or claimed for a sync), None until a sync has stored anything.
+
+        The claim counts so that a sync in progress isn't repeated; the
+        first one does not, since until it finishes there is nothing to read.
+        """
+        row = self.connection().execute(
+            "SELECT last_sync, cursor FROM transaction_sync WHERE account_id = ?", (account_id,)
+        ).fetchone()
+        return row[0] if row and row[0] and row[1] is not None else None
+
+    def recent(self, account_id, count):
+        """The newest `count` transactions, newest first"""
+        return self.page(account_id, count)
+
+    def page(self, account_id, count, from_id=None):
+        """`count` transactions newest first, older than `from_id` if given (same contract as Teller)"""
+        conn = self.connection()
+        if from_id is None:
+            rows = conn.execute(
+                "SELECT data FROM transactions WHERE account_id = ? ORDER BY seq DESC LIMIT ?",
+                (account_id, count)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT data FROM transactions WHERE account_id = ? AND seq < "
+                "(SELECT seq FROM transactions WHERE id = ?) ORDER BY seq DESC LIMIT ?",
+                (account_id, from_id, count)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def search(self, account_id, count, start=None, end=None, description=None):
+        """Up to `count` transactions dated within [start, end] whose description contains `description`.
+
+        Newest first. Any filter may be None; the description match ignores
+        case, like the spending analytics' merchant filter. Matching
+        descriptions are found by scanning the description index alone, then
+        rows are looked up through the description or date index.
+        """
+        conn = self.connection()
+        where = ["account_id = ?"]
+        params = [account_id]
+        if start is not None:
+            where.append("date >= ?")
+            params.append(str(start))
+        if end is not None:
+            where.append("date <= ?")
+            params.append(str(end))
+        if description:
+            names = [row[0] for row in conn.execute(
+                "SELECT DISTINCT description COLLATE NOCASE FROM transactions "
+                "WHERE account_id = ? AND instr(lower(description), ?) > 0",
+                (account_id, description.lower())
+            )]
+            if not names:
+                return []
+            where.append(f"description COLLATE NOCASE IN ({', '.join('?' * len(names))})")
+            params.extend(names)
+        rows = conn.execute(
+            f"SELECT data FROM transactions WHERE {' AND '.join(where)} ORDER BY seq DESC LIMIT ?",
+            (*params, count)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def columns(self, account_id):
+        """(dates, descriptions, amounts, categories) for every stored transaction, oldest first"""
+        rows = self.connection().execute(
+            "SELECT date, description, amount, json_extract(data, '$.details.category') "
+            "FROM transactions WHERE account_id = ? ORDER BY seq",
+            (account_id,)
+        ).fetchall()
+        if not rows:
+            return [], [], [], []
+        return tuple(list(column) for column in zip(*rows))
+
+    def version(self, account_id):
+        """Changes whenever the account's stored transactions do"""
+        return self.connection().execute(
+            "SELECT MAX(seq), COUNT(*), "
+            "(SELECT revision FROM transaction_revisions WHERE account_id = ?) "
+            "FROM transactions WHERE account_id = ?", (account_id, account_id)
+        ).fetchone()
+
+
+def _amount(transaction):
+    try:
+        return float(transaction.get('amount'))
+    except (TypeError, ValueError):
+        return None